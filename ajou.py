@@ -1,101 +1,146 @@
 import requests
-from bs4 import BeautifulSoup
 import time
 from urllib.parse import urljoin, parse_qs, urlparse
 import re
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
 from utils.utils import save_to_json, save_to_excel
+from utils.engine import defer_on_failure, fetch, run_stage
+from utils.metrics import save_metrics, timed
+from utils.cli import parse_args
+from utils.incremental import IncrementalState
+from utils.checkpoint import Checkpoint
+from utils.jsonl import open_output, finish_output, drop_records
+from utils.parquet import open_parquet
+from utils.store import open_store
+from utils.workqueue import open_queue, serve_queue
+from utils.ratelimit import get_limiter
+from utils.config import resolve_url
+from utils.archive import render_pages
+from utils.html import parse, strainer, css
+
+# 상세 팝업에서는 모바일용 학력/경력 영역만 파싱
+CAREER_AREA = strainer('div', id='careerMobArea')
+CAREER_SECTIONS = css("ul.detailsBox_txt_list > li")
+CAREER_TITLE = css("p.tit span.t")
+CAREER_ITEMS = css("ul.list_basic.list_dot > li")
 
 
 def get_all_departments_selenium(base_urls):
-    """Selenium을 사용하여 동적으로 로드되는 모든 부서 목록을 수집합니다."""
+    """
+    Selenium을 사용하여 동적으로 로드되는 모든 부서 목록을 수집합니다.
+    - 공유 브라우저 풀에서 헤드리스 크롬을 재사용하고, 카테고리 페이지를 탭으로 동시에 열어
+      부서 링크(a.x_tag)가 나타날 때까지만 기다림
+    """
+    def render(urls):
+        # selenium은 불러오는 데 시간이 걸리므로 브라우저가 실제로 필요할 때만 import (--reparse에서는 브라우저를 띄우지 않음)
+        from utils.browser import get_browser_pool
+        return get_browser_pool().render(
+            [resolve_url(url) for url in urls], wait_css="a.x_tag",
+            before_load=lambda url: get_limiter('hosp.ajoumc.or.kr').acquire())
+
     all_departments = []
     print("🎯 1단계: Selenium으로 전체 부서 목록 수집을 시작합니다...")
+    start = time.perf_counter()
 
     try:
-        options = Options()
-        options.add_argument("--headless")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36")
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=options)
+        pages = render_pages(list(base_urls.values()), render)
     except Exception as e:
         print(f"❌ Selenium 드라이버 설정 중 오류 발생: {e}")
         return []
 
-    try:
-        for category, url in base_urls.items():
-            print(f"   - [{category}] 페이지 접속 및 분석 중...")
-            driver.get(url)
-            time.sleep(2)
-            
-            soup = BeautifulSoup(driver.page_source, 'html.parser')
-            dept_links = soup.select("a.x_tag")
-            
-            count = 0
-            for link in dept_links:
-                href = link.get('href')
-                if not href or 'javascript:' in href: continue
-                full_url = urljoin(url, href)
-                dept_name = link.get('title', '').strip() or link.get_text(strip=True).replace('# ', '')
-                if dept_name and dept_name != '전체':
-                    all_departments.append({'category': category, 'name': dept_name, 'url': full_url})
-                    count += 1
-            print(f"     -> {count}개 부서 수집 완료.")
-    except Exception as e:
-        print(f"   - 페이지 처리 중 오류 발생: {e}")
-    finally:
-        driver.quit()
-        print("\n✅ Selenium 드라이버 종료.")
+    for (category, url), html in zip(base_urls.items(), pages):
+        if html is None:
+            continue
+        departments = parse_department_links(html, category, url)
+        all_departments.extend(departments)
+        print(f"   - [{category}] {len(departments)}개 부서 수집 완료.")
             
-    print(f"\n✅ 1단계 완료: 총 {len(all_departments)}개의 부서 링크(중복 포함)를 찾았습니다.")
+    print(f"\n✅ 1단계 완료: 총 {len(all_departments)}개의 부서 링크(중복 포함)를 찾았습니다. ({time.perf_counter() - start:.1f}초)")
     return all_departments
 
-def fetch_doctors_from_department(department, headers):
-    """주어진 부서 페이지에서 모든 의료진 정보를 추출합니다."""
-    dept_name = department['name']
-    category = department['category']
-    url = department['url']
-    
-    parsed_url = urlparse(url)
-    query_params = parse_qs(parsed_url.query)
-    dept_no = query_params.get('deptNo', [None])[0]
+@timed('ajou.departments')
+def parse_department_links(html, category, page_url):
+    """렌더링된 진료과 목록 페이지 HTML에서 부서 이름과 링크를 추출합니다."""
+    soup = parse(html)
+    departments = []
+    for link in soup.select("a.x_tag"):
+        href = link.get('href')
+        if not href or 'javascript:' in href: continue
+        full_url = urljoin(page_url, href)
+        dept_name = link.get('title', '').strip() or link.get_text(strip=True).replace('# ', '')
+        if dept_name and dept_name != '전체':
+            departments.append({'category': category, 'name': dept_name, 'url': full_url})
+    return departments
 
+@timed('ajou.doctor_list')
+def parse_doctor_list(content, department):
+    """부서 페이지 HTML(bytes)에서 의료진 기본 정보 목록을 추출합니다. deptNo는 부서 URL의 쿼리에서 가져옵니다."""
+    dept_no = parse_qs(urlparse(department['url']).query).get('deptNo', [None])[0]
+    soup = parse(content)
+    
     doctors = []
+    for item in soup.select("ul.c_doc_list > li.doc_blk"):
+        name_tag = item.select_one("p.tit span.t")
+        name = name_tag.get_text(strip=True) if name_tag else "이름 정보 없음"
+        
+        specialty_tag = item.select_one("dl.txt dd.link")
+        specialty = specialty_tag.get_text(strip=True) if specialty_tag else "전문분야 정보 없음"
+        
+        prof_no = "ID 없음"
+        link_tag = item.select_one("div.btn_w a[href*='openDoctorView']")
+        if link_tag:
+            href_attr = link_tag.get('href', '')
+            match = re.search(r"openDoctorView\(\s*'.*?',\s*'([^']*)'\s*\)", href_attr)
+            if match:
+                prof_no = match.group(1)
+
+        doctors.append({
+            '소속분류': department['category'], '소속부서': department['name'], '이름': name,
+            '전문분야': specialty, 'deptNo': dept_no, 'profNo': prof_no
+        })
+    return doctors
+
+def fetch_doctors_from_department(department, headers):
+    """주어진 부서 페이지에서 모든 의료진 정보를 추출합니다."""
     try:
-        response = requests.get(url, headers=headers, timeout=15)
+        response = fetch('GET', department['url'], headers=headers, timeout=15)
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        doctor_items = soup.select("ul.c_doc_list > li.doc_blk")
-        for item in doctor_items:
-            name_tag = item.select_one("p.tit span.t")
-            name = name_tag.get_text(strip=True) if name_tag else "이름 정보 없음"
-            
-            specialty_tag = item.select_one("dl.txt dd.link")
-            specialty = specialty_tag.get_text(strip=True) if specialty_tag else "전문분야 정보 없음"
-            
-            prof_no = "ID 없음"
-            link_tag = item.select_one("div.btn_w a[href*='openDoctorView']")
-            if link_tag:
-                href_attr = link_tag.get('href', '')
-                match = re.search(r"openDoctorView\(\s*'.*?',\s*'([^']*)'\s*\)", href_attr)
-                if match:
-                    prof_no = match.group(1)
-
-            doctors.append({
-                '소속분류': category, '소속부서': dept_name, '이름': name,
-                '전문분야': specialty, 'deptNo': dept_no, 'profNo': prof_no
-            })
-        return doctors
+        return parse_doctor_list(response.content, department)
     except requests.exceptions.RequestException as e:
-        print(f"       - {dept_name} 의료진 정보 처리 중 에러: {e}")
+        print(f"       - {department['name']} 의료진 정보 처리 중 에러: {e}")
         return []
 
+@timed('ajou.doctor_detail')
+def parse_doctor_details(content):
+    """팝업 HTML(bytes)에서 숨겨진 mobile용 div의 학력/경력 정보를 추출합니다."""
+    details = {"학력": "정보 없음", "경력": "정보 없음"}
+    soup = parse(content, only=CAREER_AREA)
+    
+    career_area = soup.find('div', id='careerMobArea')
+    if career_area:
+        sections = career_area.select(CAREER_SECTIONS)
+        for section in sections:
+            title_tag = section.select_one(CAREER_TITLE)
+            if not title_tag: continue
+            
+            title = title_tag.get_text(strip=True)
+            items = []
+            for li in section.select(CAREER_ITEMS):
+                item_text = ' '.join(li.find('span').find_all(string=True, recursive=False)).strip()
+                item_text = re.sub(r'\s+', ' ', item_text)
+                items.append(item_text)
+            
+            if items:
+                if '학력' in title:
+                    details['학력'] = "\n".join(items)
+                elif '경력' in title:
+                    details['경력'] = "\n".join(items)
+    return details
+
+def doctor_key(doctor):
+    """3단계 상세 수집 단위를 구분하는 의료진 키 (profNo)"""
+    prof_no = doctor.get('profNo')
+    return prof_no if prof_no and prof_no != "ID 없음" else None
+
 def fetch_doctor_details(doctor, headers):
     """requests로 팝업 HTML에 숨겨진 학력/경력 정보를 수집합니다."""
     dept_no = doctor.get('deptNo')
@@ -105,40 +150,19 @@ def fetch_doctor_details(doctor, headers):
         return {"학력": "상세 정보 조회 불가", "경력": "상세 정보 조회 불가"}
         
     detail_url = f"https://hosp.ajoumc.or.kr/doctor/profViewPop.do?deptNo={dept_no}&profNo={prof_no}"
-    details = {"학력": "정보 없음", "경력": "정보 없음"}
     
     try:
-        response = requests.get(detail_url, headers=headers, timeout=15)
+        response = fetch('GET', detail_url, headers=headers, timeout=15)
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # 숨겨진 mobile용 div에서 정보 추출
-        career_area = soup.select_one("div#careerMobArea")
-        if career_area:
-            sections = career_area.select("ul.detailsBox_txt_list > li")
-            for section in sections:
-                title_tag = section.select_one("p.tit span.t")
-                if not title_tag: continue
-                
-                title = title_tag.get_text(strip=True)
-                items = []
-                for li in section.select("ul.list_basic.list_dot > li"):
-                    item_text = ' '.join(li.find('span').find_all(string=True, recursive=False)).strip()
-                    item_text = re.sub(r'\s+', ' ', item_text)
-                    items.append(item_text)
-                
-                if items:
-                    if '학력' in title:
-                        details['학력'] = "\n".join(items)
-                    elif '경력' in title:
-                        details['경력'] = "\n".join(items)
-
+        return parse_doctor_details(response.content)
     except requests.exceptions.RequestException as e:
         print(f"     [Error] 상세 정보 수집 중 에러: {e}")
     
-    return details
+    return {"학력": "정보 없음", "경력": "정보 없음"}
 
-if __name__ == "__main__":
+def main(argv=None):
+    """전체 수집을 실행하고 최종 저장한 의료진 수를 반환합니다. (crawl.py에서 병원별 프로세스로도 호출)"""
+    args = parse_args("아주대학교병원 의료진 크롤러", argv)
     base_urls = {
         "진료과": "https://hosp.ajoumc.or.kr/doctor/profDeptList.do",
         "전문센터": "https://hosp.ajoumc.or.kr/doctor/profCenterList.do",
@@ -154,6 +178,20 @@ if __name__ == "__main__":
     json_output_file = 'ajou_doctors_with_details.json'
     excel_output_file = 'ajou_doctors_with_details.xlsx'
     
+    file_name = '아주대학교병원_ajou'
+    fetch_details = lambda doc: fetch_doctor_details(doc, headers)
+    state = IncrementalState(file_name, args.max_age_days) if args.incremental else None
+    if state:
+        fetch_details = state.wrap(fetch_details, doctor_key)
+
+    def collect_details(doc):
+        details = fetch_details(doc)
+        # 목록 행은 그대로 두고 새 레코드로 반환 (결과를 파일에만 쓸 때 목록 쪽에 상세 정보가 쌓이지 않게 함)
+        return {**doc, '학력': details['학력'], '경력': details['경력']}
+
+    if args.queue_worker:
+        return serve_queue(file_name, 'ajou', args, collect_details)
+
     departments = get_all_departments_selenium(base_urls)
     
     if departments:
@@ -165,17 +203,10 @@ if __name__ == "__main__":
         unique_departments = list(unique_checker_dept.values())
         print(f"\n✅ 중복 제거 후, 최종 {len(unique_departments)}개의 부서를 대상으로 2단계를 시작합니다.")
 
-        all_doctors = []
         print("\n🎯 2단계: 각 부서별 의료진 목록 수집을 시작합니다...")
-        for i, dept in enumerate(unique_departments):
-            print(f"   - ({i+1}/{len(unique_departments)}) {dept['name']} ({dept['category']}) 의료진 수집 중...")
-            doctors_in_dept = fetch_doctors_from_department(dept, headers)
-            if doctors_in_dept:
-                print(f"     -> {len(doctors_in_dept)}명 수집 완료.")
-                all_doctors.extend(doctors_in_dept)
-            else:
-                print("     -> 의료진 정보 없음.")
-            time.sleep(0.3)
+        results = run_stage("2단계", unique_departments, lambda dept: fetch_doctors_from_department(dept, headers),
+                            label=lambda d: f"{d['name']} ({d['category']})")
+        all_doctors = [doc for doctors_in_dept in results if doctors_in_dept for doc in doctors_in_dept]
             
         print(f"\n✅ 2단계 완료: 수집된 의료진 정보는 총 {len(all_doctors)}건 입니다.")
         
@@ -183,23 +214,48 @@ if __name__ == "__main__":
         print(f"✅ 중복 제거 후, 최종 {len(unique_doctors)}명의 의료진 정보를 대상으로 3단계를 시작합니다.")
 
         print("\n🎯 3단계: 각 의료진의 상세 정보(학력/경력) 수집을 시작합니다...")
-        final_data = []
-        for i, doc in enumerate(unique_doctors):
-            print(f"   - ({i+1}/{len(unique_doctors)}) {doc['이름']} 의료진 상세 정보 수집 중...")
-            details = fetch_doctor_details(doc, headers)
-            doc['학력'] = details['학력']
-            doc['경력'] = details['경력']
-            final_data.append(doc)
-            time.sleep(0.3)
+        checkpoint = Checkpoint(file_name, args.resume)
+        output = open_output(file_name, args)
+        queue = open_queue(file_name, args)
+        worker = queue.wrap(collect_details, doctor_key, unique_doctors) if queue else collect_details
+        worker = defer_on_failure(worker)
+        worker = checkpoint.wrap(worker, doctor_key)
+        if output:
+            worker = output.wrap(worker)
+        parquet = open_parquet(file_name, 'ajou', args)
+        if parquet:
+            worker = parquet.wrap(worker)
+        store = open_store('ajou', args)
+        if store:
+            worker = store.wrap(worker)
+        if output:
+            # 결과 레코드는 파일에만 남기고 메모리에는 모으지 않음
+            worker = drop_records(worker)
+        final_data = [doc for doc in run_stage("3단계", unique_doctors, worker, label=lambda d: d['이름']) if doc]
 
         print(f"\n✅ 3단계 완료: 최종적으로 {len(final_data)}명의 상세 정보를 수집했습니다.")
         
+        if state:
+            state.save()
+        
         # 🔽 utils.py의 함수를 사용하여 파일 저장
-
-        file_name = '아주대학교병원_ajou'
-
-        save_to_json(final_data, file_name)
-        save_to_excel(final_data, file_name)
+        if parquet:
+            parquet.close()
+        if store:
+            store.close()
+        if output:
+            finish_output(output, file_name, args)
+        else:
+            save_to_json(final_data, file_name)
+        save_to_excel(output.path if output else final_data, file_name)
+        save_metrics(file_name, 'ajou', args)
+        checkpoint.finish()
+        return len(final_data)
         
     else:
         print("\n❌ 1단계 부서 수집에 실패하여 프로그램을 종료합니다.")
+        return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -1,68 +1,111 @@
 # app.py
 
-import requests
-from bs4 import BeautifulSoup
 import re
-import time
 from utils.utils import save_to_excel, save_to_json
+from utils.engine import defer_on_failure, fetch, run_stage
+from utils.metrics import save_metrics, timed
+from utils.cli import parse_args
+from utils.incremental import IncrementalState
+from utils.checkpoint import Checkpoint
+from utils.jsonl import open_output, finish_output, drop_records
+from utils.parquet import open_parquet
+from utils.store import open_store
+from utils.workqueue import open_queue, serve_queue
+from utils.html import parse, strainer, css
+
+# 상세 페이지에서는 학력/경력이 들어 있는 dl.textList2.new만 파싱
+PROFILE_LIST = strainer('dl', class_='textList2')
+PROFILE_RECORDS = css('ul.textListCon li')
+
+@timed('amc.departments')
+def parse_departments(content):
+    """전체 진료과 팝업 HTML(bytes)에서 진료과 이름과 코드를 추출합니다."""
+    soup = parse(content)
+    departments = []
+    for a_tag in soup.select("a[onclick*='fnSelectDeptPopup']"):
+        dept_name = a_tag.get_text(strip=True)
+        onclick_attr = a_tag.get('onclick', '')
+        match = re.search(r"fnSelectDeptPopup\('([^']*)'\)", onclick_attr)
+        if match:
+            dept_code = match.group(1)
+            departments.append({'name': dept_name, 'code': dept_code})
+    return departments
 
 def get_asan_departments(headers):
     """서울아산병원 전체 진료과 팝업에서 진료과 목록을 수집합니다."""
     popup_url = "https://www.amc.seoul.kr/asan/common/dept/allDept.do?drUseYn=Y&cmeUseYn=N&thUseYn=N&allowDept=N&deptFunc=fnSelectDeptPopup"
     try:
-        response = requests.get(popup_url, headers=headers)
+        response = fetch('GET', popup_url, headers=headers)
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        departments = []
-        for a_tag in soup.select("a[onclick*='fnSelectDeptPopup']"):
-            dept_name = a_tag.get_text(strip=True)
-            onclick_attr = a_tag.get('onclick', '')
-            match = re.search(r"fnSelectDeptPopup\('([^']*)'\)", onclick_attr)
-            if match:
-                dept_code = match.group(1)
-                departments.append({'name': dept_name, 'code': dept_code})
-        return departments
+        return parse_departments(response.content)
     except Exception as e:
         print(f"진료과 목록 수집 중 에러: {e}")
         return []
 
+@timed('amc.doctor_list')
+def parse_doctor_list(content, department):
+    """부서 의료진 목록 페이지 HTML(bytes)에서 의료진 기본 정보를 추출합니다."""
+    soup = parse(content)
+    
+    doctors = []
+    for li in soup.select('ul.serchlist_boxwrap li'):
+        name_tag = li.select_one('p.doctor_name a')
+        dept_th = li.find('th', scope='row', string='진료과')
+        field_th = li.find('th', scope='row', string='전문분야')
+        detail_button = li.select_one("a[onclick*='fnDrDetail']")
+        onclick_attr = detail_button.get('onclick', '') if detail_button else ''
+        match = re.search(r"fnDrDetail\('([^']*)'", onclick_attr)
+        dr_emp_id = match.group(1) if match else ''
+        
+        if dept_th:
+            raw_dept_text = dept_th.find_next_sibling('td').get_text()
+            cleaned_depts = ', '.join([part.strip() for part in raw_dept_text.split(',') if part.strip()])
+        else:
+            cleaned_depts = department['name']
+
+        doctor_info = {
+            'name': name_tag.get_text(strip=True) if name_tag else '',
+            'department': cleaned_depts,
+            'fields': field_th.find_next_sibling('td').get_text(strip=True) if field_th else '',
+            'drEmpId': dr_emp_id,
+            'deptCode': department['code']
+        }
+        doctors.append(doctor_info)
+    return doctors
+
 def get_asan_doctors_by_dept(department, headers):
     """주어진 부서의 의료진 목록 페이지를 파싱하여 기본 정보를 추출합니다."""
     dept_url = f"https://www.amc.seoul.kr/asan/staff/base/staffBaseInfoList.do?searchHpCd={department['code']}"
     try:
-        response = requests.get(dept_url, headers=headers)
+        response = fetch('GET', dept_url, headers=headers)
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        doctors = []
-        for li in soup.select('ul.serchlist_boxwrap li'):
-            name_tag = li.select_one('p.doctor_name a')
-            dept_th = li.find('th', scope='row', string='진료과')
-            field_th = li.find('th', scope='row', string='전문분야')
-            detail_button = li.select_one("a[onclick*='fnDrDetail']")
-            onclick_attr = detail_button.get('onclick', '') if detail_button else ''
-            match = re.search(r"fnDrDetail\('([^']*)'", onclick_attr)
-            dr_emp_id = match.group(1) if match else ''
-            
-            if dept_th:
-                raw_dept_text = dept_th.find_next_sibling('td').get_text()
-                cleaned_depts = ', '.join([part.strip() for part in raw_dept_text.split(',') if part.strip()])
-            else:
-                cleaned_depts = department['name']
-
-            doctor_info = {
-                'name': name_tag.get_text(strip=True) if name_tag else '',
-                'department': cleaned_depts,
-                'fields': field_th.find_next_sibling('td').get_text(strip=True) if field_th else '',
-                'drEmpId': dr_emp_id,
-                'deptCode': department['code']
-            }
-            doctors.append(doctor_info)
-        return doctors
+        return parse_doctor_list(response.content, department)
     except Exception as e:
         print(f"  - {department['name']} 의료진 처리 중 에러: {e}")
         return []
 
+@timed('amc.doctor_detail')
+def parse_doctor_details(content):
+    """상세 페이지 HTML(bytes)에서 학력/경력 정보를 추출합니다."""
+    soup = parse(content, only=PROFILE_LIST)
+    
+    profile_data = {}
+    dl_tag = soup.select_one("dl.textList2.new")
+    if not dl_tag: return {}
+        
+    for dt_tag in dl_tag.find_all('dt', recursive=False):
+        title = dt_tag.get_text(strip=True)
+        if title in ['학력', '경력']:
+            dd_tag = dt_tag.find_next_sibling('dd')
+            if dd_tag:
+                records = [' '.join(li.get_text().split()) for li in dd_tag.select(PROFILE_RECORDS)]
+                profile_data[title] = records
+    return profile_data
+
+def doctor_key(doctor_info):
+    """3단계 상세 수집 단위를 구분하는 의료진 키 (drEmpId)"""
+    return doctor_info.get('drEmpId') or None
+
 def get_doctor_details(doctor_info, headers):
     """의료진 상세 페이지에 접속하여 학력/경력 정보를 스크래핑합니다."""
     dr_emp_id = doctor_info.get('drEmpId')
@@ -71,33 +114,35 @@ def get_doctor_details(doctor_info, headers):
         
     detail_url = f"https://www.amc.seoul.kr/asan/staff/base/staffBaseInfoDetail.do?drEmpId={dr_emp_id}&searchHpCd={dept_code}&tabIndex1=3"
     try:
-        response = requests.get(detail_url, headers=headers)
+        response = fetch('GET', detail_url, headers=headers)
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        profile_data = {}
-        dl_tag = soup.select_one("dl.textList2.new")
-        if not dl_tag: return {}
-            
-        for dt_tag in dl_tag.find_all('dt', recursive=False):
-            title = dt_tag.get_text(strip=True)
-            if title in ['학력', '경력']:
-                dd_tag = dt_tag.find_next_sibling('dd')
-                if dd_tag:
-                    records = [' '.join(li.get_text().split()) for li in dd_tag.select('ul.textListCon li')]
-                    profile_data[title] = records
-        return profile_data
+        return parse_doctor_details(response.content)
     except Exception as e:
         print(f"      - 상세 정보 처리 중 에러 (ID: {dr_emp_id}): {e}")
         return {}
 
 # --- 메인 실행 로직 ---
-if __name__ == "__main__":
+def main(argv=None):
+    """전체 수집을 실행하고 최종 저장한 의료진 수를 반환합니다. (crawl.py에서 병원별 프로세스로도 호출)"""
+    args = parse_args("서울아산병원 의료진 크롤러", argv)
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36',
         'Referer': 'https://www.amc.seoul.kr/asan/staff/staffList.do'
     }
     
+    file_name = '서울아산병원_amc'
+    fetch_details = lambda doctor: get_doctor_details(doctor, headers)
+    state = IncrementalState(file_name, args.max_age_days) if args.incremental else None
+    if state:
+        fetch_details = state.wrap(fetch_details, doctor_key)
+
+    def collect_details(doctor):
+        # 목록 행은 그대로 두고 새 레코드로 반환 (결과를 파일에만 쓸 때 목록 쪽에 상세 정보가 쌓이지 않게 함)
+        return {**doctor, 'profile': fetch_details(doctor)}
+
+    if args.queue_worker:
+        return serve_queue(file_name, 'amc', args, collect_details)
+
     # 1단계
     print("1단계: 서울아산병원 진료과 목록 수집을 시작합니다...")
     department_list = get_asan_departments(headers)
@@ -106,14 +151,9 @@ if __name__ == "__main__":
         print(f"\n✅ 1단계 완료: 총 {len(department_list)}개 부서 수집.")
         
         # 2단계
-        all_doctors_list = []
         print("\n2단계: 각 부서별 의료진 목록 수집 시작...")
-        for i, dept in enumerate(department_list):
-            print(f"  - ({i+1}/{len(department_list)}) {dept['name']} 수집 중...")
-            doctors = get_asan_doctors_by_dept(dept, headers)
-            if doctors:
-                all_doctors_list.extend(doctors)
-            time.sleep(0.2)
+        results = run_stage("2단계", department_list, lambda dept: get_asan_doctors_by_dept(dept, headers), label=lambda d: d['name'])
+        all_doctors_list = [doc for doctors in results if doctors for doc in doctors]
         
         print(f"\n✅ 2단계 완료: 총 {len(all_doctors_list)}개의 의료진 항목 수집.")
 
@@ -123,17 +163,46 @@ if __name__ == "__main__":
         
         print(f"\n3단계: 중복을 제외한 {len(unique_doctors_list)}명의 고유 의료진 상세 정보 수집 시작...")
 
-        for i, doctor in enumerate(unique_doctors_list):
-            print(f"  - ({i+1}/{len(unique_doctors_list)}) {doctor['name']} 상세 정보 수집 중...")
-            profile = get_doctor_details(doctor, headers)
-            doctor['profile'] = profile
-            time.sleep(0.2)
+        checkpoint = Checkpoint(file_name, args.resume)
+        output = open_output(file_name, args)
+        queue = open_queue(file_name, args)
+        worker = queue.wrap(collect_details, doctor_key, unique_doctors_list) if queue else collect_details
+        worker = defer_on_failure(worker)
+        worker = checkpoint.wrap(worker, doctor_key)
+        if output:
+            worker = output.wrap(worker)
+        parquet = open_parquet(file_name, 'amc', args)
+        if parquet:
+            worker = parquet.wrap(worker)
+        store = open_store('amc', args)
+        if store:
+            worker = store.wrap(worker)
+        if output:
+            # 결과 레코드는 파일에만 남기고 메모리에는 모으지 않음
+            worker = drop_records(worker)
+        unique_doctors_list = [doc for doc in run_stage("3단계", unique_doctors_list, worker, label=lambda d: d['name']) if doc]
+        if state:
+            state.save()
             
         # 4단계: 최종 저장
         print(f"\n✅ 3단계 완료! 최종 데이터를 파일로 저장합니다.")
 
-        file_name = '서울아산병원_amc'
-        save_to_json(unique_doctors_list, file_name)
-        save_to_excel(unique_doctors_list, file_name)
+        if parquet:
+            parquet.close()
+        if store:
+            store.close()
+        if output:
+            finish_output(output, file_name, args)
+        else:
+            save_to_json(unique_doctors_list, file_name)
+        save_to_excel(output.path if output else unique_doctors_list, file_name)
+        save_metrics(file_name, 'amc', args)
+        checkpoint.finish()
+        return len(unique_doctors_list)
     else:
-        print("\n❌ 1단계 부서 목록 수집에 실패했습니다.")
\ No newline at end of file
+        print("\n❌ 1단계 부서 목록 수집에 실패했습니다.")
+        return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+오프라인 파서 벤치마크
+- bench/fixtures/{병원}/ 에 저장해 둔 목록/상세 페이지로 각 병원의 파싱 함수만 반복 실행 (실제 사이트 요청 없음)
+- 케이스별 처리량(pages/sec)과 페이지 하나를 파싱하는 동안의 최대 메모리 할당량(tracemalloc 기준 KiB)을 출력
+- --save로 결과를 JSON으로 남기고, --compare로 이전 커밋의 결과와 비교해 처리량이 떨어진 케이스를 표시
+
+사용 예:
+    python bench/bench_parsers.py
+    python bench/bench_parsers.py --save bench_results/base.json
+    python bench/bench_parsers.py --compare bench_results/base.json --threshold 0.10
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from functools import lru_cache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, 'bench', 'fixtures')
+sys.path.insert(0, ROOT)
+
+import ajou
+import amc
+import cmc
+import gs
+import smc
+import snubh
+import snuh
+import ys
+from utils.html import PARSER
+
+
+def _snuh_detail_merge(content, ajax_body):
+    """snuh 상세 수집의 HTML 경로(ajax_first=False 또는 AJAX 실패 시)와 같은 순서로 정적 HTML 파싱 -> AJAX 파싱 -> 목록 병합을 실행합니다."""
+    career = snuh.parse_career_html(content)
+    ajax_education, ajax_experience = snuh.parse_career_ajax(ajax_body)
+    return (snuh.merge_careers(career['학력'], ajax_education),
+            snuh.merge_careers(career['경력'], ajax_experience))
+
+
+# (케이스 이름, 픽스처 파일, 파싱 함수(content) -> 결과)
+CASES = [
+    ('ajou.departments', 'ajou/departments.html',
+     lambda c: ajou.parse_department_links(c.decode('utf-8'), '진료과', 'https://hosp.ajoumc.or.kr/doctor/list.do')),
+    ('ajou.doctor_list', 'ajou/doctor_list.html',
+     lambda c: ajou.parse_doctor_list(c, {'category': '진료과', 'name': '내과', 'url': 'https://hosp.ajoumc.or.kr/doctor/list.do?deptNo=101'})),
+    ('ajou.doctor_detail', 'ajou/doctor_detail.html', ajou.parse_doctor_details),
+    ('amc.departments', 'amc/departments.html', amc.parse_departments),
+    ('amc.doctor_list', 'amc/doctor_list.html', lambda c: amc.parse_doctor_list(c, {'name': '내과', 'code': 'D001'})),
+    ('amc.doctor_detail', 'amc/doctor_detail.html', amc.parse_doctor_details),
+    ('cmc.doctor_list', 'cmc/doctor_list.json', lambda c: cmc.parse_doctor_list(c, {'name': '내과', 'code': 'IM'})),
+    ('cmc.doctor_detail', 'cmc/doctor_detail.json', cmc.parse_doctor_details),
+    ('gs.doctor_list', 'gs/doctor_list.json', gs.parse_doctor_page),
+    ('gs.doctor_detail', 'gs/doctor_detail.html', gs.parse_profile_details),
+    ('smc.departments', 'smc/departments.html', lambda c: smc.parse_departments(c, {'type': 'O', 'name': '진료과'})),
+    ('smc.doctor_list', 'smc/doctor_list.html', lambda c: smc.parse_doctor_list(c, {'dept_name': '내과'})),
+    ('smc.doctor_detail', 'smc/doctor_detail.html', smc.parse_doctor_profile),
+    ('snubh.departments', 'snubh/departments.html',
+     lambda c: snubh.parse_department_links(c, 'https://www.snubh.org/medical/drMedicalTeam2.do')),
+    ('snubh.doctor_list', 'snubh/doctor_list.html',
+     lambda c: snubh.parse_doctor_list(c, 'https://www.snubh.org/medical/drMedicalTeam2.do?DP_TP=O&DP_CD=NR')),
+    ('snubh.doctor_detail', 'snubh/doctor_detail.html', snubh.parse_doctor_details),
+    ('snuh.departments', 'snuh/departments.html', snuh.parse_departments),
+    ('snuh.doctor_list', 'snuh/doctor_list.html', lambda c: snuh.parse_doctor_list(c, '내과')),
+    ('snuh.career_ajax', 'snuh/career_ajax.json', snuh.parse_career_ajax),
+    ('snuh.doctor_detail', 'snuh/doctor_detail.html',
+     lambda c: _snuh_detail_merge(c, _read('snuh/career_ajax.json'))),
+    ('ys.doctor_list', 'ys/doctor_list.json', ys.parse_doctor_page),
+    ('ys.doctor_detail', 'ys/doctor_detail.html', ys.parse_doctor_details),
+]
+
+
+@lru_cache(maxsize=None)
+def _read(fixture):
+    with open(os.path.join(FIXTURES, fixture), 'rb') as f:
+        return f.read()
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(func, content, min_time=0.5, min_runs=5):
+    """
+    파싱 함수 하나를 min_time초 이상(최소 min_runs회) 반복 실행해 처리량을 재고,
+    한 번 더 tracemalloc으로 실행해 페이지 하나를 파싱하는 동안의 최대 할당량을 잽니다.
+    (파서의 디버그 print는 측정에서 제외하기 위해 버림)
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        func(content)  # 준비 실행 (선택자 컴파일 등 1회성 비용 제외)
+        runs = 0
+        start = time.perf_counter()
+        while True:
+            func(content)
+            runs += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time and runs >= min_runs:
+                break
+
+        gc.collect()
+        tracemalloc.start()
+        func(content)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        'pages_per_sec': runs / elapsed,
+        'ms_per_page': elapsed / runs * 1000,
+        'peak_kib': peak / 1024,
+        'bytes': len(content),
+    }
+
+
+def run(cases, min_time):
+    results = {}
+    print(f"{'case':<22}{'pages/s':>10}{'ms/page':>10}{'peak KiB':>11}")
+    for name, fixture, func in cases:
+        result = measure(func, _read(fixture), min_time=min_time)
+        results[name] = result
+        print(f"{name:<22}{result['pages_per_sec']:>10.1f}{result['ms_per_page']:>10.2f}"
+              f"{result['peak_kib']:>11.1f}")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """이전 결과와 처리량을 비교합니다. threshold(비율)보다 느려진 케이스 목록을 반환합니다."""
+    print(f"\n📊 기준 결과와 비교 (commit {baseline.get('commit')}, parser {baseline.get('parser')})")
+    regressions = []
+    for name, result in results.items():
+        base = baseline['results'].get(name)
+        if not base:
+            print(f"  {name:<22} (기준 없음)")
+            continue
+        change = result['pages_per_sec'] / base['pages_per_sec'] - 1
+        mark = ''
+        if change < -threshold:
+            mark = '  ⚠️ 느려짐'
+            regressions.append(name)
+        print(f"  {name:<22}{base['pages_per_sec']:>10.1f} -> {result['pages_per_sec']:>8.1f} pages/s ({change:+.1%}){mark}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="병원별 파서 오프라인 벤치마크")
+    parser.add_argument('-k', dest='pattern', help="이름에 이 문자열이 들어간 케이스만 실행 (예: snuh, doctor_detail)")
+    parser.add_argument('--min-time', type=float, default=0.5, help="케이스별 최소 측정 시간(초, 기본 0.5)")
+    parser.add_argument('--save', help="결과를 JSON 파일로 저장")
+    parser.add_argument('--compare', help="이전에 --save로 저장한 결과와 처리량 비교")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="--compare에서 이 비율 이상 느려지면 실패로 종료 (기본 0.10 = 10%%)")
+    args = parser.parse_args(argv)
+
+    cases = [case for case in CASES if not args.pattern or args.pattern in case[0]]
+    commit = _git_commit()
+    print(f"🧪 파서 벤치마크: {len(cases)}개 케이스 (commit {commit}, parser {PARSER}, Python {platform.python_version()})\n")
+    results = run(cases, args.min_time)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'commit': commit, 'parser': PARSER, 'python': platform.python_version(),
+                       'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 결과를 '{args.save}'에 저장했습니다.")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)}개 케이스의 처리량이 {args.threshold:.0%} 넘게 떨어졌습니다: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
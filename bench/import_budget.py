@@ -0,0 +1,80 @@
+"""
+스크래퍼 import 시간 예산 검사
+- 각 스크래퍼 모듈을 새 인터프리터에서 `python -X importtime`으로 불러와 누적 import 시간을 측정 (여러 번 중 최솟값)
+- 예산(--budget-ms)을 넘거나, 필요할 때만 불러와야 하는 무거운 패키지(openpyxl, selenium 등)가
+  import 시점에 로드되면 실패로 종료하고 가장 오래 걸린 import 목록을 보여줌
+
+사용 예:
+    python bench/import_budget.py
+    python bench/import_budget.py --budget-ms 300 --runs 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRAPERS = ['ajou', 'amc', 'cmc', 'gs', 'smc', 'snubh', 'snuh', 'ys']
+
+# 실제로 쓰는 코드 경로(Excel 저장, Selenium 부서 수집, Parquet 저장)에서만 불러와야 하는 패키지
+LAZY_MODULES = ['openpyxl', 'selenium', 'webdriver_manager', 'pandas', 'pyarrow']
+
+
+def import_time(module):
+    """module을 새 인터프리터에서 불러오고 (누적 import 시간(ms), 오래 걸린 하위 import 목록)을 반환합니다."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace('import time:', '|', 1).split('|'))
+        rows.append((name, int(cumulative_us) / 1000))
+    total = next(ms for name, ms in reversed(rows) if name == module)
+    return total, sorted(rows, key=lambda row: row[1], reverse=True)
+
+
+def loaded_lazy_modules(module):
+    """module을 불러온 직후 이미 로드된 LAZY_MODULES 목록을 반환합니다."""
+    code = (f"import sys, json, {module}; "
+            f"print(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))")
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="스크래퍼 import 시간 예산 검사")
+    parser.add_argument('modules', nargs='*', default=SCRAPERS, help="검사할 모듈 (기본: 모든 스크래퍼)")
+    parser.add_argument('--budget-ms', type=float, default=400.0, help="모듈별 누적 import 시간 예산(ms, 기본 400)")
+    parser.add_argument('--runs', type=int, default=3, help="모듈별 측정 횟수 (최솟값 사용, 기본 3)")
+    args = parser.parse_args(argv)
+
+    print(f"⏱️ import 시간 예산: {args.budget_ms:.0f}ms (Python {sys.version.split()[0]}, {args.runs}회 중 최솟값)\n")
+    failures = []
+    for module in args.modules:
+        measurements = [import_time(module) for _ in range(args.runs)]
+        total, rows = min(measurements, key=lambda m: m[0])
+        lazy = loaded_lazy_modules(module)
+        problems = []
+        if total > args.budget_ms:
+            problems.append(f"예산 초과 {total - args.budget_ms:.0f}ms")
+        if lazy:
+            problems.append(f"import 시점에 로드됨: {', '.join(lazy)}")
+        status = '❌ ' + ' / '.join(problems) if problems else '✅'
+        print(f"  {module:<8}{total:>8.1f}ms  {status}")
+        if problems:
+            failures.append(module)
+            for name, ms in rows[1:6]:
+                print(f"      {ms:>8.1f}ms  {name}")
+
+    if failures:
+        print(f"\n❌ {len(failures)}개 모듈이 import 예산을 지키지 못했습니다: {', '.join(failures)}")
+        return 1
+    print("\n✅ 모든 모듈이 import 예산 안에 있습니다.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,386 @@
+"""
+로컬 가짜 병원 서버 (처리량/동시성 튜닝용)
+- 스크래퍼가 사용하는 모든 엔드포인트를 '/{원래 호스트}/{원래 경로}' 아래에서 흉내냄
+  (목록/페이지네이션은 진료과 수와 의료진 수에 맞춰 생성, 상세 페이지는 bench/fixtures의 파일을 사용)
+- 응답 지연 분포, 500 에러 비율, 429 응답 비율, 느리게 흘려보내는(slow-drip) 응답 비율을 설정 가능
+- 주기적으로 초당 처리 요청 수와 상태 코드별 건수를 출력
+
+사용 예:
+    python bench/mock_server.py --latency lognormal:80:0.6 --error-rate 0.02 --throttle-rate 0.05
+    python snuh.py --base-url http://127.0.0.1:8800
+"""
+import argparse
+import json
+import math
+import os
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+SURNAMES = '김이박최정강조윤장임한오서신권황안송류홍'
+GIVEN_NAMES = ['민준', '서연', '도윤', '하은', '시우', '지호', '수아', '예준', '지민', '서준', '유진', '현우']
+DEPARTMENTS = ['내과', '외과', '소아청소년과', '신경과', '정형외과', '피부과', '안과', '이비인후과', '영상의학과',
+               '마취통증의학과', '산부인과', '비뇨의학과', '재활의학과', '가정의학과', '흉부외과', '성형외과']
+
+HTML = 'text/html; charset=utf-8'
+JSON = 'application/json; charset=utf-8'
+
+
+def _fixture(path):
+    with open(os.path.join(FIXTURES, path), 'rb') as f:
+        return f.read()
+
+
+def _page(body):
+    return f'<!DOCTYPE html><html lang="ko"><head><meta charset="utf-8"></head><body>{body}</body></html>'
+
+
+def _json(data):
+    return json.dumps(data, ensure_ascii=False)
+
+
+class Hospital:
+    """
+    진료과 수(departments) x 진료과당 의료진 수(doctors)만큼의 가짜 의료진 목록
+    - shared: 진료과마다 앞쪽 shared명은 모든 진료과에 함께 소속된 같은 의료진 (같은 ID/이름)
+    - page_cap: 목록 API가 허용하는 최대 페이지 크기 (요청한 pagePerNum이 더 크면 이 크기로 잘라 응답, 0이면 제한 없음)
+    """
+
+    def __init__(self, departments, doctors, shared=0, page_cap=0):
+        self.departments = departments
+        self.doctors = doctors
+        self.shared = shared
+        self.page_cap = page_cap
+
+    def dept_name(self, d):
+        name = DEPARTMENTS[d % len(DEPARTMENTS)]
+        return name if d < len(DEPARTMENTS) else f"{name}{d // len(DEPARTMENTS) + 1}"
+
+    def doctor_id(self, d, i):
+        return i if i < self.shared else d * 1000 + i
+
+    def doctor_name(self, d, i):
+        n = self.doctor_id(d, i)
+        return SURNAMES[n % len(SURNAMES)] + GIVEN_NAMES[(n // len(SURNAMES)) % len(GIVEN_NAMES)]
+
+    def dept_index(self, value):
+        """'D003', 'IM3', '3' 같은 진료과 코드에서 번호를 꺼냅니다. 범위를 벗어나면 None."""
+        digits = ''.join(ch for ch in str(value) if ch.isdigit())
+        index = int(digits) if digits else -1
+        return index if 0 <= index < self.departments else None
+
+    def page(self, d, page, per_page):
+        start = (page - 1) * per_page
+        return range(start, min(start + per_page, self.doctors))
+
+
+# --- 병원별 응답 생성 (반환: (상태 코드, Content-Type, 본문)) ---
+
+def ajou(h, method, path, query, form):
+    if path.startswith('/doctor/prof') and path.endswith('List.do'):
+        links = ''.join(f'<a class="x_tag" href="/doctor/profList.do?deptNo={d}" title="{h.dept_name(d)}"># {h.dept_name(d)}</a>'
+                        for d in range(h.departments))
+        return 200, HTML, _page(f'<div class="tag_list">{links}<a class="x_tag" href="javascript:void(0)">전체</a></div>')
+    if path == '/doctor/profList.do':
+        d = h.dept_index(query.get('deptNo', ''))
+        if d is None:
+            return 200, HTML, _page('<ul class="c_doc_list"></ul>')
+        items = ''.join(f'<li class="doc_blk"><p class="tit"><span class="t">{h.doctor_name(d, i)}</span></p>'
+                        f'<dl class="txt"><dd class="link">전문분야 {i}</dd></dl><div class="btn_w">'
+                        f'<a href="javascript:openDoctorView(\'{d}\', \'{h.doctor_id(d, i)}\')">상세</a></div></li>'
+                        for i in range(h.doctors))
+        return 200, HTML, _page(f'<ul class="c_doc_list">{items}</ul>')
+    if path == '/doctor/profViewPop.do':
+        return 200, HTML, _fixture('ajou/doctor_detail.html')
+
+
+def amc(h, method, path, query, form):
+    if path == '/asan/common/dept/allDept.do':
+        links = ''.join(f'<a href="#" onclick="fnSelectDeptPopup(\'D{d:03d}\')">{h.dept_name(d)}</a>' for d in range(h.departments))
+        return 200, HTML, _page(links)
+    if path == '/asan/staff/base/staffBaseInfoList.do':
+        d = h.dept_index(query.get('searchHpCd', ''))
+        items = '' if d is None else ''.join(
+            f'<li><p class="doctor_name"><a href="#">{h.doctor_name(d, i)}</a></p><table><tbody>'
+            f'<tr><th scope="row">진료과</th><td>{h.dept_name(d)}</td></tr><tr><th scope="row">전문분야</th><td>전문분야 {i}</td></tr>'
+            f'</tbody></table><a href="#" onclick="fnDrDetail(\'{h.doctor_id(d, i)}\', \'D{d:03d}\')">상세</a></li>'
+            for i in range(h.doctors))
+        return 200, HTML, _page(f'<ul class="serchlist_boxwrap">{items}</ul>')
+    if path == '/asan/staff/base/staffBaseInfoDetail.do':
+        return 200, HTML, _fixture('amc/doctor_detail.html')
+
+
+def cmc(h, method, path, query, form):
+    if path == '/api/department':
+        group = query.get('deptClsf', 'A')
+        return 200, JSON, _json([{'deptNm': h.dept_name(d), 'deptCd': f'{group}{d}', 'exposeYn': 'Y'}
+                                 for d in range(h.departments) if 'ABC'[d % 3] == group])
+    if path == '/api/doctor':
+        d = h.dept_index(query.get('deptCd', ''))
+        return 200, JSON, _json([] if d is None else [
+            {'drName': h.doctor_name(d, i), 'nuHptlJobTitle': '교수', 'drNo': str(h.doctor_id(d, i)),
+             'deptCd': query['deptCd'], 'doctorDept': {'special': f'전문분야 {i}'}} for i in range(h.doctors)])
+    if path.startswith('/api/doctor/'):
+        return 200, JSON, _fixture('cmc/doctor_detail.json')
+
+
+def severance(h, method, path, query, form, detail_fixture):
+    """gs/ys가 함께 쓰는 세브란스 API (진료과 목록 POST, 의료진 목록 GET 페이지네이션, 상세 페이지)"""
+    if path == '/api/department/list.do':
+        # 센터(DP020401) / 클리닉(DP020402) / 진료과로 진료과를 나눠 보여줌
+        group = {'DP020401': 0, 'DP020402': 1}.get(form.get('seCode'), 2)
+        return 200, JSON, _json({'data': {'list': [
+            {'deptNm': h.dept_name(d), 'tyCode': form.get('tyCode', 'DP010100'), 'seCode': form.get('seCode', ''), 'seq': d}
+            for d in range(h.departments) if d % 3 == group]}})
+    if path == '/api/doctor/list.do':
+        page = int(query.get('page', 1))
+        per_page = int(query.get('pagePerNum', 20))
+        if h.page_cap:
+            per_page = min(per_page, h.page_cap)
+        if 'seq' in query:
+            d = h.dept_index(query['seq'])
+            total = 0 if d is None else h.doctors
+            rows = [] if d is None else [(d, i) for i in h.page(d, page, per_page)]
+        else:
+            # gs는 진료과 구분 없이 전체 의사를 한 목록으로 조회
+            total = h.departments * h.doctors
+            rows = [divmod(n, h.doctors) for n in range((page - 1) * per_page, min(page * per_page, total))]
+        doctors = [{'nm': h.doctor_name(d, i), 'nmEn': 'Doctor', 'empNo': f'E{h.doctor_id(d, i)}', 'deptSeq': d,
+                    'deptNm': h.dept_name(d), 'ofcps': '교수', 'clnicRealm': f'전문분야 {i}'} for d, i in rows]
+        return 200, JSON, _json({'data': {'list': doctors, 'pagenation': {
+            'totalCount': total, 'totalPage': max(1, math.ceil(total / per_page))}}})
+    if path.endswith('/doctor/doctor-view.do'):
+        return 200, HTML, _fixture(detail_fixture)
+
+
+def gs(h, method, path, query, form):
+    return severance(h, method, path, query, form, 'gs/doctor_detail.html')
+
+
+def ys(h, method, path, query, form):
+    return severance(h, method, path, query, form, 'ys/doctor_detail.html')
+
+
+def smc(h, method, path, query, form):
+    if path == '/home/reservation/DoctorScheduleGubun.do':
+        group = query.get('dp_type', 'O')
+        options = ''.join(f'<option value="{group}{d}">{h.dept_name(d)}</option>'
+                          for d in range(h.departments) if 'OCN'[d % 3] == group)
+        return 200, HTML, f'<select><option value="">선택</option>{options}</select>'
+    if path == '/home/reservation/doctorInfoLists.do':
+        d = h.dept_index(query.get('DP_CODE', ''))
+        items = '' if d is None else ''.join(
+            f'<li class="card-item doctor-profile"><section class="card-item-inner">'
+            f'<a href="/home/doctor/profile.do?DR_NO={h.doctor_id(d, i)}"><div class="card-content-img"><img src="/img/{i}.jpg"></div></a>'
+            f'<h3 class="card-content-title"><span name="fullName">{h.doctor_name(d, i)}</span> 교수 [{h.dept_name(d)}]</h3>'
+            f'<p class="card-content-text">전문분야 {i}</p></section></li>' for i in range(h.doctors))
+        return 200, HTML, _page(f'<ul class="masonry">{items}</ul>')
+    if path == '/home/doctor/profile.do':
+        return 200, HTML, _fixture('smc/doctor_detail.html')
+
+
+def snubh(h, method, path, query, form):
+    if path == '/medical/drMedicalTeam2.do':
+        if 'DP_CD' not in query:
+            items = ''.join(f'<li id="pos_{d}"><a class="dept_tit" href="/medical/drMedicalTeam2.do?DP_TP=O&amp;DP_CD=D{d}">'
+                            f'{h.dept_name(d)}</a></li>' for d in range(h.departments))
+            return 200, HTML, _page(f'<ul>{items}</ul>')
+        d = h.dept_index(query['DP_CD'])
+        items = '' if d is None else ''.join(
+            f'<li class="bh_bookmark_list3"><div class="bh_doctor_name_n"><strong>{h.doctor_name(d, i)}<em>교수</em></strong></div>'
+            f'<dl class="bh_doctor_dept_n"><dd>전문분야 {i}</dd></dl><input type="button" class="bh_doctor_btn_intro" '
+            f'onclick="fnDrIntroduce({{\'sDrSid\' : \'{h.doctor_id(d, i)}\', \'sDrStfNo\' : \'S{i}\', \'sDpTp\' : \'O\', '
+            f'\'sDpCdDtl\' : \'D{d}\'}})"></li>' for i in range(h.doctors))
+        return 200, HTML, _page(f'<ul>{items}</ul>')
+    if path == '/medical/drIntroduce.do':
+        return 200, HTML, _fixture('snubh/doctor_detail.html')
+
+
+SNUH_PAGE_SIZE = 10
+
+
+def snuh(h, method, path, query, form):
+    if path == '/reservation/meddept/main.do':
+        items = ''.join(f'<div class="treatItemWrap"><span>{h.dept_name(d)}</span>'
+                        f'<a href="javascript:goDetail(\'D{d}\', \'doctor\')">의료진</a></div>' for d in range(h.departments))
+        return 200, HTML, _page(items)
+    if path.endswith('/mainDoctor.do'):
+        d = h.dept_index(path.split('/')[-2])
+        if d is None:
+            return 200, HTML, _page('<ul class="doctorSchedule"></ul>')
+        pages = max(1, math.ceil(h.doctors / SNUH_PAGE_SIZE))
+        page = int(form.get('pageIndex', 1))
+        # 실제 사이트처럼 마지막 페이지를 넘기면 첫 페이지를 다시 보여줌
+        page = page if page <= pages else 1
+        items = ''.join(f'<li><a class="doctorNameWrap" href="#"><strong>{h.doctor_name(d, i)}</strong></a>'
+                        f'<div class="doctor-concentration-wrap"><p>세부전공</p><p>전문분야 {i}</p></div>'
+                        f'<a class="doctor-view-button" href="https://www.snuh.org/blog/{h.doctor_id(d, i):05d}/philosophy.do">상세</a></li>'
+                        for i in h.page(d, page, SNUH_PAGE_SIZE))
+        return 200, HTML, _page(f'<ul class="doctorSchedule">{items}</ul>')
+    if path.endswith('/ajaxMobileCareer.do'):
+        return 200, JSON, _fixture('snuh/career_ajax.json')
+    if path.startswith('/blog/'):
+        return 200, HTML, _fixture('snuh/doctor_detail.html')
+
+
+ROUTES = {
+    'hosp.ajoumc.or.kr': ajou,
+    'www.amc.seoul.kr': amc,
+    'www.cmcseoul.or.kr': cmc,
+    'gs.severance.healthcare': gs,
+    'sev.severance.healthcare': ys,
+    'www.samsunghospital.com': smc,
+    'www.snubh.org': snubh,
+    'www.snuh.org': snuh,
+}
+
+
+def parse_latency(spec):
+    """
+    지연 분포 문자열을 (초 단위 값을 뽑는 함수)로 바꿉니다.
+    - fixed:MS / uniform:MIN_MS:MAX_MS / lognormal:MEDIAN_MS:SIGMA
+    """
+    kind, *values = spec.split(':')
+    values = [float(v) for v in values]
+    if kind == 'fixed':
+        return lambda rng: values[0] / 1000
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == 'lognormal':
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1]) / 1000
+    raise argparse.ArgumentTypeError(f"알 수 없는 지연 분포: {spec} (fixed:MS, uniform:MIN:MAX, lognormal:MEDIAN:SIGMA)")
+
+
+class Stats:
+    """응답 상태 코드별 건수와 처리량 집계"""
+
+    def __init__(self):
+        self.statuses = Counter()
+        self.bytes = 0
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record(self, status, size):
+        with self._lock:
+            self.statuses[status] += 1
+            self.bytes += size
+
+    def report(self, since=None):
+        with self._lock:
+            total = sum(self.statuses.values())
+            statuses = ' '.join(f"{status}:{count}" for status, count in sorted(self.statuses.items()))
+            size = self.bytes
+        elapsed = time.perf_counter() - self.started
+        rate = total / elapsed if elapsed > 0 else 0.0
+        print(f"📡 {total}건 / {elapsed:.0f}초 ({rate:.1f} req/s, {size / 1024 / 1024:.1f}MB) [{statuses}]", flush=True)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'MockHospital/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+    def _handle(self):
+        options = self.server.options
+        rng = self.server.rng
+        length = int(self.headers.get('Content-Length') or 0)
+        form = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode('utf-8')).items()} if length else {}
+
+        time.sleep(options.latency(rng))
+        roll = rng.random()
+        if roll < options.throttle_rate:
+            return self._send(429, 'text/plain', b'Too Many Requests', {'Retry-After': '1'})
+        if roll < options.throttle_rate + options.error_rate:
+            return self._send(500, 'text/plain', b'Internal Server Error')
+
+        parsed = urlparse(self.path)
+        host, _, path = parsed.path.lstrip('/').partition('/')
+        query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        route = ROUTES.get(host)
+        result = route(self.server.hospital, self.command, '/' + path, query, form) if route else None
+        if result is None:
+            return self._send(404, 'text/plain', b'Not Found')
+        status, content_type, body = result
+        body = body.encode('utf-8') if isinstance(body, str) else body
+        drip = rng.random() < options.drip_rate
+        self._send(status, content_type, body, drip_bps=options.drip_bps if drip else None)
+
+    def _send(self, status, content_type, body, extra_headers=None, drip_bps=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if drip_bps:
+            # slow-drip: 본문을 작은 조각으로 나눠 초당 drip_bps 바이트 속도로 흘려보냄
+            chunk = max(1, drip_bps // 10)
+            for start in range(0, len(body), chunk):
+                self.wfile.write(body[start:start + chunk])
+                self.wfile.flush()
+                time.sleep(0.1)
+        else:
+            self.wfile.write(body)
+        self.server.stats.record(status, len(body))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="로컬 가짜 병원 서버 (스크래퍼는 --base-url http://HOST:PORT 로 실행)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--departments', type=int, default=20, help="병원별 진료과 수 (기본 20)")
+    parser.add_argument('--doctors', type=int, default=12, help="진료과별 의료진 수 (기본 12)")
+    parser.add_argument('--shared-doctors', type=int, default=0,
+                        help="모든 진료과에 함께 소속된 의료진 수 (진료과마다 앞쪽 N명, 기본 0)")
+    parser.add_argument('--page-cap', type=int, default=0,
+                        help="세브란스(gs/ys) 목록 API의 최대 페이지 크기 (더 크게 요청하면 잘라서 응답, 기본 제한 없음)")
+    parser.add_argument('--latency', type=parse_latency, default='fixed:0',
+                        help="응답 지연 분포: fixed:MS, uniform:MIN:MAX, lognormal:MEDIAN:SIGMA (기본 fixed:0)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="500 응답 비율 (0~1)")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="429 응답(Retry-After: 1) 비율 (0~1)")
+    parser.add_argument('--drip-rate', type=float, default=0.0, help="본문을 느리게 흘려보낼 응답 비율 (0~1)")
+    parser.add_argument('--drip-bps', type=int, default=20000, help="slow-drip 응답의 초당 전송 바이트 (기본 20000)")
+    parser.add_argument('--report-every', type=float, default=5.0, help="처리량 출력 주기(초)")
+    parser.add_argument('--seed', type=int, help="에러/지연 난수 시드 (재현용)")
+    options = parser.parse_args(argv)
+
+    server = ThreadingHTTPServer((options.host, options.port), MockHandler)
+    server.daemon_threads = True
+    server.options = options
+    server.rng = random.Random(options.seed)
+    server.hospital = Hospital(options.departments, options.doctors, options.shared_doctors, options.page_cap)
+    server.stats = Stats()
+
+    def report_loop():
+        while True:
+            time.sleep(options.report_every)
+            server.stats.report()
+
+    threading.Thread(target=report_loop, daemon=True).start()
+    print(f"🏥 가짜 병원 서버 시작: http://{options.host}:{options.port} "
+          f"(병원당 진료과 {options.departments}개 x 의료진 {options.doctors}명)")
+    print(f"   스크래퍼 실행 예: python snuh.py --base-url http://{options.host}:{options.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.stats.report()
+
+
+if __name__ == '__main__':
+    main()
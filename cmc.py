@@ -1,10 +1,20 @@
-import requests
 from requests.adapters import HTTPAdapter
 import ssl
-import time
+import json
 
 # utils.py의 함수들은 그대로 사용
 from utils.utils import save_to_excel, save_to_json
+from utils.engine import defer_on_failure, fetch, run_stage
+from utils.metrics import save_metrics, timed
+from utils.cli import parse_args
+from utils.incremental import IncrementalState
+from utils.singleflight import SingleFlight
+from utils.checkpoint import Checkpoint
+from utils.jsonl import open_output, finish_output, drop_records
+from utils.parquet import open_parquet
+from utils.store import open_store
+from utils.workqueue import open_queue, serve_queue
+from utils.sessions import get_session, register_adapter
 
 # --- SSL 에러 우회용 커스텀 어댑터 ---
 class LegacyCipherAdapter(HTTPAdapter):
@@ -23,7 +33,7 @@ def get_all_departments(session, headers):
         print(f"   - 그룹 '{code}' 목록 수집 중...")
         api_url = f"https://www.cmcseoul.or.kr/api/department?deptClsf={code}"
         try:
-            response = session.get(api_url, headers=headers)
+            response = fetch('GET', api_url, session=session, headers=headers)
             response.raise_for_status()
             api_data = response.json()
             for item in api_data:
@@ -31,42 +41,70 @@ def get_all_departments(session, headers):
                     all_depts.append({
                         'group_code': code, 'name': item.get('deptNm'), 'code': item.get('deptCd')
                     })
-            time.sleep(0.3)
         except Exception as e:
             print(f"   - API 요청 실패 (그룹: {code}): {e}")
     return all_depts
 
+@timed('cmc.doctor_list')
+def parse_doctor_list(body, department):
+    """의료진 API 응답(JSON bytes)에서 필요한 정보만 추출하여 간소화된 딕셔너리 리스트를 반환합니다."""
+    cleaned_doctors = []
+    for doc in json.loads(body):
+        # 필요한 정보만 선택하여 새로운 딕셔너리 생성
+        cleaned_info = {
+            "이름": doc.get('drName'),
+            "직위": doc.get('nuHptlJobTitle'),
+            "소속": department['name'],
+            "진료분야": doc.get('doctorDept', {}).get('special'),
+            # 상세 정보 조회를 위해 drNo와 deptCd는 유지
+            "drNo": doc.get('drNo'),
+            "deptCd": doc.get('deptCd')
+        }
+        cleaned_doctors.append(cleaned_info)
+    return cleaned_doctors
+
 # --- 기능 함수 2: 특정 부서의 의료진 가져오기 (⭐️ 핵심 수정 부분) ---
 def get_doctors_by_dept(session, headers, department):
     """API 응답에서 필요한 정보만 추출하여 간소화된 딕셔너리 리스트를 반환합니다."""
     api_url = "https://www.cmcseoul.or.kr/api/doctor"
     params = {'deptClsf': department['group_code'], 'deptCd': department['code']}
     
-    cleaned_doctors = []
     try:
-        response = session.get(api_url, params=params, headers=headers)
+        response = fetch('GET', api_url, session=session, params=params, headers=headers)
         response.raise_for_status()
-        doctors_data = response.json()
-        
-        for doc in doctors_data:
-            # 필요한 정보만 선택하여 새로운 딕셔너리 생성
-            cleaned_info = {
-                "이름": doc.get('drName'),
-                "직위": doc.get('nuHptlJobTitle'),
-                "소속": department['name'],
-                "진료분야": doc.get('doctorDept', {}).get('special'),
-                # 상세 정보 조회를 위해 drNo와 deptCd는 유지
-                "drNo": doc.get('drNo'),
-                "deptCd": doc.get('deptCd')
-            }
-            cleaned_doctors.append(cleaned_info)
-        return cleaned_doctors
+        return parse_doctor_list(response.content, department)
         
     except Exception as e:
         print(f"   - 의료진 API 요청 실패 (부서: {department['name']}): {e}")
         return []
 
 # --- 기능 함수 3: 의료진 상세 정보 가져오기 (학력/경력) ---
+@timed('cmc.doctor_detail')
+def parse_doctor_details(content):
+    """상세 API 응답(JSON bytes)에서 학력/경력 목록을 추출합니다."""
+    detail_data = json.loads(content)
+
+    profile = {"학력": [], "경력": []}
+    record_list = detail_data.get('doctorDetail', {}).get('doctorRecordList', [])
+    for record in record_list:
+        record_type = record.get('recordType')
+        record_content = record.get('recordContent')
+        if record_type == 'A' and record_content:
+            profile['학력'].append(record_content)
+        elif record_type == 'B' and record_content:
+            profile['경력'].append(record_content)
+    return profile
+
+def doctor_key(doctor_info):
+    """3단계 상세 수집 단위를 구분하는 의료진 키 (deptCd/drNo, 상세 API 경로와 동일)"""
+    doctor_id = doctor_info.get('drNo')
+    dept_cd = doctor_info.get('deptCd')
+    return f"{dept_cd}/{doctor_id}" if doctor_id and dept_cd else None
+
+def detail_key(doctor_info):
+    """여러 진료과에 소속된 같은 의사를 묶는 키 (drNo, 상세 요청은 의사마다 한 번만 보냄)"""
+    return doctor_info.get('drNo') or None
+
 def get_doctor_details(session, headers, doctor_info):
     """의사 정보(딕셔너리)를 받아 상세 프로필을 API로 가져옵니다."""
     doctor_id = doctor_info.get('drNo')
@@ -78,30 +116,20 @@ def get_doctor_details(session, headers, doctor_info):
     api_url = f"https://www.cmcseoul.or.kr/api/doctor/{dept_cd}/{doctor_id}"
     
     try:
-        response = session.get(api_url, headers=headers)
+        response = fetch('GET', api_url, session=session, headers=headers)
         response.raise_for_status()
-        detail_data = response.json()
-
-        profile = {"학력": [], "경력": []}
-        record_list = detail_data.get('doctorDetail', {}).get('doctorRecordList', [])
-        for record in record_list:
-            record_type = record.get('recordType')
-            record_content = record.get('recordContent')
-            if record_type == 'A' and record_content:
-                profile['학력'].append(record_content)
-            elif record_type == 'B' and record_content:
-                profile['경력'].append(record_content)
-        return profile
+        return parse_doctor_details(response.content)
 
     except Exception as e:
         print(f"     - 상세 정보 요청 실패 (ID: {doctor_id}): {e}")
         return None
 
 # --- 메인 실행 로직 ---
-if __name__ == "__main__":
-    session = requests.Session()
-    adapter = LegacyCipherAdapter()
-    session.mount('https://', adapter)
+def main(argv=None):
+    """전체 수집을 실행하고 최종 저장한 의료진 수를 반환합니다. (crawl.py에서 병원별 프로세스로도 호출)"""
+    args = parse_args("가톨릭대학교 서울성모병원 의료진 크롤러", argv)
+    register_adapter('www.cmcseoul.or.kr', LegacyCipherAdapter)
+    session = get_session('www.cmcseoul.or.kr')
 
     headers = {
         'Accept': 'application/json, text/javascript, */*; q=0.01',
@@ -110,43 +138,81 @@ if __name__ == "__main__":
         'X-Requested-With': 'XMLHttpRequest',
     }
     
+    file_name = '가톨릭대학교_서울성모병원_cmc'
+    fetch_details = lambda doctor: get_doctor_details(session, headers, doctor)
+    details_once = SingleFlight()
+    fetch_details = details_once.wrap(fetch_details, detail_key)
+    state = IncrementalState(file_name, args.max_age_days) if args.incremental else None
+    if state:
+        fetch_details = state.wrap(fetch_details, doctor_key)
+
+    def collect_details(doctor):
+        details = fetch_details(doctor)
+
+        # 상세 정보 조회를 위해 사용했던 부서 코드는 최종 결과에서 제외 (목록 행은 그대로 두고 새 레코드로 반환)
+        # drNo는 의료진 ID로 남겨 둠 (SQLite 저장소/병원 간 매칭의 doctor_id)
+        doctor = {key: value for key, value in doctor.items() if key != 'deptCd'}
+
+        if details:
+            doctor['profile'] = details
+        return doctor
+
+    if args.queue_worker:
+        return serve_queue(file_name, 'cmc', args, collect_details)
+
     department_list = get_all_departments(session, headers)
     if not department_list:
         print("\n❌ 1단계 부서 목록 수집에 실패하여 프로그램을 종료합니다.")
+        return 0
     else:
         print(f"\n✅ 1단계 완료: 총 {len(department_list)}개의 부서 목록을 수집했습니다.")
         
-        all_doctors_list = []
         print("\n2단계: 각 부서별 의료진 정보 수집을 시작합니다...")
-        for i, dept in enumerate(department_list):
-            print(f"   - ({i+1}/{len(department_list)}) {dept['name']} 의료진 정보 수집 중...")
-            doctors = get_doctors_by_dept(session, headers, dept)
-            if doctors:
-                all_doctors_list.extend(doctors)
-            time.sleep(0.3)
+        results = run_stage("2단계", department_list, lambda dept: get_doctors_by_dept(session, headers, dept), label=lambda d: d['name'])
+        all_doctors_list = [doc for doctors in results if doctors for doc in doctors]
         
         print(f"\n✅ 2단계 완료: 총 {len(all_doctors_list)}명의 의료진 목록을 수집했습니다.")
 
         print("\n3단계: 각 의료진의 상세 프로필 정보 수집을 시작합니다...")
-        final_data = []
-        for i, doctor in enumerate(all_doctors_list):
-            # ⭐️ 키가 'drName'에서 '이름'으로 변경됨
-            print(f"   - ({i+1}/{len(all_doctors_list)}) {doctor.get('이름')} 교수님 상세 정보 추가 중...")
-            
-            details = get_doctor_details(session, headers, doctor)
+        # ⭐️ 키가 'drName'에서 '이름'으로 변경됨
+        checkpoint = Checkpoint(file_name, args.resume)
+        output = open_output(file_name, args)
+        queue = open_queue(file_name, args)
+        worker = queue.wrap(collect_details, doctor_key, all_doctors_list) if queue else collect_details
+        worker = defer_on_failure(worker)
+        worker = checkpoint.wrap(worker, doctor_key)
+        if output:
+            worker = output.wrap(worker)
+        parquet = open_parquet(file_name, 'cmc', args)
+        if parquet:
+            worker = parquet.wrap(worker)
+        store = open_store('cmc', args)
+        if store:
+            worker = store.wrap(worker)
+        if output:
+            # 결과 레코드는 파일에만 남기고 메모리에는 모으지 않음
+            worker = drop_records(worker)
+        final_data = [doc for doc in run_stage("3단계", all_doctors_list, worker, label=lambda d: f"{d.get('이름')} 교수님") if doc]
             
-            # 상세 정보 조회를 위해 사용했던 ID값들은 최종 결과에서 제외
-            doctor.pop('drNo', None)
-            doctor.pop('deptCd', None)
-            
-            if details:
-                doctor['profile'] = details
-            
-            final_data.append(doctor)
-            time.sleep(0.3)
+        if state:
+            state.save()
+        details_once.report()
             
         print(f"\n✅ 3단계 완료: 모든 정보가 통합되었습니다. 최종 데이터를 저장합니다.")
 
-        file_name = '가톨릭대학교_서울성모병원_cmc'
-        save_to_json(final_data, file_name)
-        save_to_excel(final_data, file_name)
+        if parquet:
+            parquet.close()
+        if store:
+            store.close()
+        if output:
+            finish_output(output, file_name, args)
+        else:
+            save_to_json(final_data, file_name)
+        save_to_excel(output.path if output else final_data, file_name)
+        save_metrics(file_name, 'cmc', args)
+        checkpoint.finish()
+        return len(final_data)
+
+
+if __name__ == "__main__":
+    main()
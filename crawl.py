@@ -0,0 +1,317 @@
+"""
+여러 병원 스크래퍼를 한 번에 실행하는 진입점
+- 병원마다 별도 프로세스에서 main(argv)를 실행하므로 한 병원이 에러/크래시로 죽어도 나머지는 계속 수집
+- 동시에 띄우는 프로세스 수는 --max-workers로 제한하고, 남은 병원은 자리가 날 때마다 시작
+- 병원별 출력은 {log-dir}/{병원}.log에 저장하고, 끝나면 병원별 수집 건수/에러/소요 시간 요약을 출력 (summary.json도 저장)
+- run 뒤에 붙인 나머지 옵션(--cache, --jsonl, --base-url 등)은 모든 스크래퍼에 그대로 전달
+- reparse: --archive로 저장한 보관본에 응답이 있는 병원을 모두 찾아, 병원마다 프로세스를 띄워 네트워크 없이 다시 파싱 (utils.archive)
+- resolve: 모든 병원의 결과 파일(여러 스냅샷)을 읽어 병원을 옮긴 같은 의료진을 클러스터로 묶음 (utils.matching)
+- index / search: 모든 병원 결과의 이름/진료과/전문분야/학력/경력을 SQLite FTS5로 색인하고 검색 (utils.search)
+
+사용 예:
+    python crawl.py run --hospitals all
+    python crawl.py run --hospitals snuh,ys,gs --max-workers 2 --cache --jsonl
+    python crawl.py run --archive                # 응답 원본을 crawl_archive/runs/{오늘 날짜}에 보관
+    python crawl.py reparse 250101 --jsonl       # 보관본 250101을 현재 파서로 다시 파싱 (결과: reparse_250101/)
+    python crawl.py resolve                      # 저장된 결과 파일에서 병원 간 같은 의료진 찾기
+    python crawl.py index && python crawl.py search 존스홉킨스 --field career
+"""
+import argparse
+import contextlib
+import importlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from multiprocessing.connection import wait
+
+from utils.records import HOSPITALS, find_snapshots, iter_snapshot_records
+
+
+def _run_hospital(hospital, argv, log_path, conn):
+    """(자식 프로세스) 병원 스크래퍼의 main(argv)를 실행하고 결과 요약을 conn으로 보냅니다. 출력은 모두 log_path로 보냄"""
+    with open(log_path, 'w', encoding='utf-8', buffering=1) as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            records = importlib.import_module(hospital).main(argv)
+            result = {'status': 'ok', 'records': records or 0}
+        except (Exception, SystemExit) as e:
+            traceback.print_exc()
+            result = {'status': 'error', 'records': 0, 'error': f"{type(e).__name__}: {e}"}
+
+        from utils import engine
+        result.update(engine.stats())
+    conn.send(result)
+    conn.close()
+
+
+def _finish(job, now):
+    """(내부 헬퍼 함수) 끝난(또는 시간 초과로 종료시킨) 프로세스의 결과를 정리합니다."""
+    process, conn = job['process'], job['conn']
+    process.join()
+    result = conn.recv() if conn.poll() else None
+    conn.close()
+    if result is None:
+        # 결과를 보내기 전에 프로세스가 죽음 (segfault, 메모리 부족, 시간 초과 등)
+        reason = '시간 초과로 종료' if job.get('timed_out') else f'프로세스 비정상 종료 (exit code {process.exitcode})'
+        result = {'status': 'crashed', 'records': 0, 'error': reason}
+    result['seconds'] = now - job['start']
+    result['log'] = job['log']
+    return result
+
+
+def run_hospitals(hospitals, argv, max_workers, log_dir, timeout=None):
+    """
+    hospitals의 스크래퍼를 최대 max_workers개 프로세스로 동시에 실행하고, {병원: 결과 요약}을 반환합니다.
+    - timeout(초)이 있으면 그 시간을 넘긴 병원 프로세스는 종료시키고 실패로 기록
+    """
+    os.makedirs(log_dir, exist_ok=True)
+    ctx = multiprocessing.get_context('spawn')  # 부모의 스레드/세션/브라우저 상태를 물려받지 않도록 새 인터프리터에서 시작
+    pending = list(hospitals)
+    running = {}
+    results = {}
+
+    while pending or running:
+        while pending and len(running) < max_workers:
+            hospital = pending.pop(0)
+            log_path = os.path.join(log_dir, f'{hospital}.log')
+            recv_conn, send_conn = ctx.Pipe(duplex=False)
+            process = ctx.Process(target=_run_hospital, args=(hospital, argv, log_path, send_conn),
+                                  name=f'crawl-{hospital}')
+            process.start()
+            send_conn.close()
+            running[process.sentinel] = {'hospital': hospital, 'process': process, 'conn': recv_conn,
+                                         'log': log_path, 'start': time.perf_counter()}
+            print(f"🚀 {hospital} ({HOSPITALS[hospital]}) 수집 시작 - 로그: {log_path}")
+
+        finished = wait(list(running), timeout=1.0)
+        now = time.perf_counter()
+        if timeout:
+            for sentinel, job in running.items():
+                if sentinel not in finished and now - job['start'] > timeout:
+                    job['timed_out'] = True
+                    job['process'].terminate()
+                    finished.append(sentinel)
+
+        for sentinel in finished:
+            job = running.pop(sentinel)
+            result = results[job['hospital']] = _finish(job, now)
+            mark = '✅' if result['status'] == 'ok' else '❌'
+            print(f"{mark} {job['hospital']} 종료: {result['records']}건 / {result['seconds']:.1f}초"
+                  + (f" - {result['error']}" if result.get('error') else ''))
+    return results
+
+
+def print_summary(results, wall_time):
+    """병원별 수집 건수, 요청/에러 수, 단계 끝 재시도 후에도 실패한 작업 수, 소요 시간을 표로 출력합니다."""
+    print(f"\n📋 수집 요약 (전체 {wall_time:.1f}초)")
+    print(f"  {'병원':<8}{'상태':<9}{'기록':>7}{'요청':>8}{'실패 요청':>10}{'작업 에러':>10}{'최종 실패':>10}{'시간(초)':>10}")
+    for hospital, r in results.items():
+        print(f"  {hospital:<8}{r['status']:<9}{r['records']:>7}{r.get('requests', '-'):>8}"
+              f"{r.get('failed_requests', '-'):>10}{r.get('task_errors', '-'):>10}{r.get('dead_letters', '-'):>10}"
+              f"{r['seconds']:>10.1f}")
+    total = sum(r['records'] for r in results.values())
+    failed = [hospital for hospital, r in results.items() if r['status'] != 'ok' or not r['records']]
+    print(f"  {'합계':<8}{'':<9}{total:>7}")
+    if failed:
+        print(f"\n⚠️ 실패했거나 수집 결과가 없는 병원: {', '.join(failed)} (각 병원의 로그 파일을 확인하세요)")
+    return failed
+
+
+def run_command(args, scraper_argv, parser):
+    hospitals = list(HOSPITALS) if args.hospitals == 'all' else [h.strip() for h in args.hospitals.split(',') if h.strip()]
+    unknown = [h for h in hospitals if h not in HOSPITALS]
+    if unknown:
+        parser.error(f"알 수 없는 병원 코드: {', '.join(unknown)} (가능: {', '.join(HOSPITALS)})")
+
+    max_workers = max(1, args.max_workers)
+    print(f"🏥 {len(hospitals)}개 병원 수집 시작 (동시 프로세스 최대 {max_workers}개, 스크래퍼 옵션: {' '.join(scraper_argv) or '없음'})\n")
+    start = time.perf_counter()
+    results = run_hospitals(hospitals, scraper_argv, max_workers, args.log_dir, args.timeout)
+    wall_time = time.perf_counter() - start
+
+    failed = print_summary(results, wall_time)
+    summary_path = os.path.join(args.log_dir, 'summary.json')
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump({'wall_time': wall_time, 'argv': scraper_argv, 'hospitals': results}, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 요약을 '{summary_path}'에 저장했습니다.")
+    return 1 if failed else 0
+
+
+def reparse_command(args, scraper_argv, parser):
+    from utils.archive import archived_hosts
+    from utils.config import load_config
+
+    hosts = archived_hosts(args.archive_dir, args.run)
+    if not hosts:
+        print(f"❌ 보관본 '{os.path.join(args.archive_dir, 'runs', args.run)}'에 기록된 응답이 없습니다.")
+        return 1
+    config = load_config().get('hospitals', {})
+    archived = [h for h in HOSPITALS if hosts & set(config.get(h, {}).get('hosts', []))]
+    if args.hospitals:
+        requested = [h.strip() for h in args.hospitals.split(',') if h.strip()]
+        unknown = [h for h in requested if h not in archived]
+        if unknown:
+            parser.error(f"보관본에 없는 병원 코드: {', '.join(unknown)} (보관된 병원: {', '.join(archived)})")
+        archived = requested
+    args.hospitals = ','.join(archived)
+    args.log_dir = args.log_dir or f'reparse_{args.run}'
+    return run_command(args, ['--reparse', args.run, '--archive-dir', args.archive_dir, *scraper_argv], parser)
+
+
+def store_records(store):
+    """SQLite 저장소의 현재 레코드를 결과 파일과 같은 형식(snapshot = 마지막 수집일 'yymmdd')으로 돌려줍니다."""
+    for row in store.find():
+        row['snapshot'] = row['last_seen'][2:10].replace('-', '')
+        row['source'] = store.path
+        yield row
+
+
+def load_records(files, store_path=None):
+    """결과 파일(glob 패턴)과 SQLite 저장소(--sqlite로 만든 파일)에서 공통 스키마 레코드를 읽어 리스트로 반환합니다."""
+    paths = find_snapshots(files)
+    records = list(iter_snapshot_records(paths))
+    if store_path:
+        from utils.store import DoctorStore
+        store = DoctorStore(store_path)
+        records.extend(store_records(store))
+        store.close()
+    print(f"📂 결과 파일 {len(paths)}개{' + SQLite 저장소' if store_path else ''}에서 레코드 {len(records)}건을 읽었습니다.")
+    return records
+
+
+def resolve_command(args):
+    from utils.matching import resolve
+
+    records = load_records(args.files, args.store)
+    start = time.perf_counter()
+    results, stats = resolve(records, threshold=args.threshold)
+    elapsed = time.perf_counter() - start
+    print(f"🔗 의료진 {stats['doctors']}명 / 비교한 후보 쌍 {stats['candidate_pairs']}개 -> "
+          f"클러스터 {stats['clusters']}개 (여러 병원에 걸친 클러스터 {stats['multi_hospital_clusters']}개), {elapsed:.2f}초")
+
+    clusters = {}
+    for row in results:
+        clusters.setdefault(row['cluster_id'], []).append(row)
+    shown = 0
+    for cluster_id, members in clusters.items():
+        if len({m['hospital'] for m in members}) < 2 or shown >= args.show:
+            continue
+        shown += 1
+        print(f"  {cluster_id}: " + ', '.join(f"{m['name']}({m['hospital']}/{m['department']}, {m['confidence']:.2f})"
+                                              for m in members))
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'stats': stats, 'threshold': args.threshold, 'doctors': results}, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 클러스터 결과를 '{args.output}'에 저장했습니다.")
+    return 0
+
+
+def index_command(args):
+    from utils.search import SearchIndex
+
+    index = SearchIndex(args.index)
+    start = time.perf_counter()
+    added = skipped = 0
+    for path in find_snapshots(args.files):
+        stat = os.stat(path)
+        if index.is_indexed(path, stat.st_mtime, stat.st_size):
+            skipped += 1
+            continue
+        added += sum(index.add(row) for row in iter_snapshot_records([path]))
+        index.mark_indexed(path, stat.st_mtime, stat.st_size)
+        index.commit()
+    if args.store:
+        from utils.store import DoctorStore
+        store = DoctorStore(args.store)
+        added += sum(index.add(row) for row in store_records(store))
+        store.close()
+    index.optimize()
+    print(f"🗂️ 검색 색인 '{args.index}': 새 문서 {added}건 추가 (변경 없는 파일 {skipped}개 건너뜀), "
+          f"전체 {index.count()}건, {time.perf_counter() - start:.1f}초")
+    index.close()
+    return 0
+
+
+def search_command(args):
+    from utils.search import SearchIndex
+
+    if not os.path.exists(args.index):
+        print(f"❌ 검색 색인 '{args.index}'이 없습니다. 먼저 'python crawl.py index'를 실행하세요.")
+        return 1
+    index = SearchIndex(args.index)
+    start = time.perf_counter()
+    results = index.search(' '.join(args.query), hospital=args.hospital, field=args.field, limit=args.limit,
+                           all_versions=args.all_versions)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    index.close()
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return 0
+    print(f"🔍 '{' '.join(args.query)}': {len(results)}건 ({elapsed_ms:.1f}ms)\n")
+    for r in results:
+        period = r['first_snapshot'] if r['first_snapshot'] == r['last_snapshot'] else f"{r['first_snapshot']}~{r['last_snapshot']}"
+        print(f"  {r['name']} ({HOSPITALS.get(r['hospital'], r['hospital'])} / {r['department']}) [{period}]")
+        for line in r['lines'][:3]:
+            print(f"      - {line}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="여러 병원 의료진 크롤러를 병렬로 실행하고 결과를 모아 처리")
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help="스크래퍼 실행 (나머지 옵션은 각 스크래퍼에 전달)")
+    run_parser.add_argument('--hospitals', default='all',
+                            help=f"실행할 병원 코드 (쉼표로 구분, 기본: all = {','.join(HOSPITALS)})")
+    run_parser.add_argument('--max-workers', type=int, default=min(len(HOSPITALS), os.cpu_count() or 1),
+                            help="동시에 실행할 병원 프로세스 수 상한 (기본: 병원 수와 CPU 수 중 작은 값)")
+    run_parser.add_argument('--timeout', type=float, help="병원 하나의 최대 실행 시간(초), 넘으면 종료하고 실패로 기록")
+    run_parser.add_argument('--log-dir', default='crawl_logs', help="병원별 로그와 summary.json 저장 폴더 (기본: crawl_logs)")
+
+    reparse_parser = commands.add_parser('reparse', help="보관본의 응답으로 네트워크 없이 다시 파싱 (나머지 옵션은 각 스크래퍼에 전달)")
+    reparse_parser.add_argument('run', help="보관본 이름 (--archive로 저장한 실행, 예: 250101)")
+    reparse_parser.add_argument('--hospitals', help="다시 파싱할 병원 코드 (쉼표로 구분, 기본: 보관본에 응답이 있는 모든 병원)")
+    reparse_parser.add_argument('--archive-dir', default='crawl_archive', help="보관본 폴더 (기본: crawl_archive)")
+    reparse_parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1,
+                                help="동시에 실행할 병원 프로세스 수 상한 (기본: CPU 수, 네트워크를 기다리지 않으므로 CPU를 모두 사용)")
+    reparse_parser.add_argument('--timeout', type=float, help="병원 하나의 최대 실행 시간(초)")
+    reparse_parser.add_argument('--log-dir', help="병원별 로그와 summary.json 저장 폴더 (기본: reparse_{run})")
+
+    resolve_parser = commands.add_parser('resolve', help="여러 병원/스냅샷 결과에서 같은 의료진을 찾아 클러스터로 묶음")
+    resolve_parser.add_argument('files', nargs='*', help="결과 파일 glob 패턴 (기본: 현재 폴더의 모든 *_crawling_* 파일)")
+    resolve_parser.add_argument('--store', help="--sqlite로 만든 SQLite 저장소도 함께 읽음")
+    resolve_parser.add_argument('--threshold', type=float, default=0.5, help="같은 사람으로 볼 최소 점수 (0~1, 기본 0.5)")
+    resolve_parser.add_argument('--output', default='doctor_clusters.json', help="결과 저장 파일 (기본: doctor_clusters.json)")
+    resolve_parser.add_argument('--show', type=int, default=10, help="화면에 보여줄 병원 간 클러스터 수 (기본 10)")
+
+    index_parser = commands.add_parser('index', help="결과 파일로 학력/경력 전문 검색 색인을 만들거나 갱신")
+    index_parser.add_argument('files', nargs='*', help="결과 파일 glob 패턴 (기본: 현재 폴더의 모든 *_crawling_* 파일)")
+    index_parser.add_argument('--store', help="--sqlite로 만든 SQLite 저장소도 함께 색인")
+    index_parser.add_argument('--index', default='doctor_search.sqlite', help="색인 파일 (기본: doctor_search.sqlite)")
+
+    search_parser = commands.add_parser('search', help="이름/진료과/전문분야/학력/경력 전문 검색")
+    search_parser.add_argument('query', nargs='+', help="검색어 (띄어쓴 검색어는 모두 포함하는 의료진만)")
+    search_parser.add_argument('--hospital', choices=list(HOSPITALS), help="이 병원에서만 검색")
+    search_parser.add_argument('--field', choices=['name', 'department', 'specialty', 'education', 'career'],
+                               help="이 필드에서만 검색")
+    search_parser.add_argument('--limit', type=int, default=20, help="최대 결과 수 (기본 20)")
+    search_parser.add_argument('--all-versions', action='store_true', help="같은 의료진의 이전 스냅샷 버전도 모두 표시")
+    search_parser.add_argument('--json', action='store_true', help="결과를 JSON으로 출력")
+    search_parser.add_argument('--index', default='doctor_search.sqlite', help="색인 파일 (기본: doctor_search.sqlite)")
+
+    args, extra = parser.parse_known_args(argv)
+    if args.command == 'run':
+        return run_command(args, extra, parser)
+    if args.command == 'reparse':
+        return reparse_command(args, extra, parser)
+    if extra:
+        parser.error(f"알 수 없는 옵션: {' '.join(extra)}")
+    handlers = {'resolve': resolve_command, 'index': index_command, 'search': search_command}
+    return handlers[args.command](args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,62 @@
 # main.py
 
-from bs4 import BeautifulSoup
 import requests
-import math
-import time
+import json
 from utils.utils import save_to_json, save_to_excel
+from utils.engine import defer_on_failure, fetch, mark_failed, run_stage
+from utils.metrics import save_metrics, timed
+from utils.pagination import fetch_pages, page_count
+from utils.cli import parse_args
+from utils.incremental import IncrementalState, no_error
+from utils.singleflight import SingleFlight
+from utils.checkpoint import Checkpoint
+from utils.jsonl import open_output, finish_output, drop_records
+from utils.parquet import open_parquet
+from utils.store import open_store
+from utils.workqueue import open_queue, serve_queue
+from utils.html import parse, strainer, css
+
+# 상세 페이지에서는 dt.text-title/dd 쌍이 들어 있는 dl만 파싱
+PROFILE_LISTS = strainer('dl')
+PROFILE_TITLES = css('dt.text-title')
+
+# 목록 API 한 페이지의 의사 수 (ys와 같은 세브란스 목록 API, 크게 요청해 페이지 요청 수를 줄임)
+PAGE_PER_NUM = 100
+
+@timed('gs.doctor_detail')
+def parse_profile_details(content):
+    """상세 페이지 HTML(bytes)에서 학력/경력 목록을 추출하는 함수"""
+    soup = parse(content, only=PROFILE_LISTS)
+    
+    profile_data = {}
+    for dt in soup.select(PROFILE_TITLES):
+        title = dt.get_text(strip=True)
+        if title in ['학력', '경력']:
+            dd = dt.find_next_sibling('dd')
+            if dd:
+                details = [li.get_text(strip=True) for li in dd.select('li')]
+                profile_data[title] = details
+    return profile_data
+
+@timed('gs.doctor_list')
+def parse_doctor_page(body):
+    """의사 목록 API 응답(JSON bytes) 한 페이지에서 (의사 목록, 전체 페이지 수)를 추출합니다."""
+    data = json.loads(body).get('data', {})
+    if 'pagenation' not in data:
+        raise KeyError("'data' 또는 'pagenation' 키를 찾을 수 없습니다.")
+    doctors = data.get('list', [])
+    # 서버가 PAGE_PER_NUM보다 작게 잘라 보내도 모든 페이지를 요청하도록 실제로 받은 의사 수로 페이지 수를 계산
+    return doctors, page_count(data['pagenation']['totalCount'], doctors)
+
+def doctor_key(doctor):
+    """상세 수집 단위를 구분하는 의료진 키 (empNo/deptSeq, 상세 페이지 파라미터와 동일)"""
+    empNo = doctor.get('empNo')
+    deptSeq = doctor.get('deptSeq')
+    return f"{empNo}/{deptSeq}" if empNo and deptSeq else None
+
+def detail_key(doctor):
+    """여러 진료과에 소속된 같은 의사를 묶는 키 (empNo, 상세 요청은 의사마다 한 번만 보냄)"""
+    return doctor.get('empNo') or None
 
 def get_profile_details(empNo, deptSeq):
     """empNo와 deptSeq를 받아 상세 페이지에서 학력/경력을 스크래핑하는 함수"""
@@ -14,88 +66,123 @@ def get_profile_details(empNo, deptSeq):
     }
     
     try:
-        response = requests.get(detail_url, headers=headers, timeout=10) # 타임아웃 추가
+        response = fetch('GET', detail_url, headers=headers, timeout=10) # 타임아웃 추가
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        profile_data = {}
-        for dt in soup.select('dt.text-title'):
-            title = dt.get_text(strip=True)
-            if title in ['학력', '경력']:
-                dd = dt.find_next_sibling('dd')
-                if dd:
-                    details = [li.get_text(strip=True) for li in dd.select('li')]
-                    profile_data[title] = details
-        return profile_data
+        return parse_profile_details(response.content)
     except requests.exceptions.RequestException:
         return {"error": "페이지를 가져올 수 없습니다."}
     except Exception:
         return {"error": "프로필 처리 중 알 수 없는 에러 발생"}
 
-def scrape_gangnam_severance():
-    """강남세브란스병원 의료진 정보를 스크래핑하는 메인 함수"""
+def scrape_gangnam_severance(args):
+    """
+    강남세브란스병원 의료진 정보를 스크래핑하는 메인 함수
+    - args: utils.cli.parse_args()로 읽은 실행 옵션 (--incremental, --resume, --jsonl 등)
+    - 반환: 최종 저장한 의료진 수 (중간에 실패하면 0)
+    """
     
     # 1. 모든 의사 기본 목록 가져오기
     base_url = "https://gs.severance.healthcare/api/doctor/list.do"
-    page_per_num = 50
-    params = {'insttCode': '4', 'tyCode': 'DP010100', 'page': 1, 'pagePerNum': page_per_num}
+    params = {'insttCode': '4', 'tyCode': 'DP010100', 'pagePerNum': PAGE_PER_NUM}
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36',
         'Referer': 'https://gs.severance.healthcare/gs/doctor/doctor.do',
         'X-Requested-With': 'XMLHttpRequest'
     }
     
+    file_name = '강남세브란스병원_gs'
+    fetch_profile = lambda doctor: get_profile_details(doctor.get('empNo'), doctor.get('deptSeq'))
+    details_once = SingleFlight()
+    fetch_profile = details_once.wrap(fetch_profile, detail_key, is_valid=no_error)
+    state = IncrementalState(file_name, args.max_age_days) if args.incremental else None
+    if state:
+        fetch_profile = state.wrap(fetch_profile, doctor_key, is_valid=no_error)
+
+    def collect_profile(doctor):
+        # 목록 행은 그대로 두고 새 레코드로 반환 (결과를 파일에만 쓸 때 목록 쪽에 상세 정보가 쌓이지 않게 함)
+        if doctor_key(doctor):
+            return {**doctor, 'profile': fetch_profile(doctor)}
+        return doctor
+
+    if args.queue_worker:
+        return serve_queue(file_name, 'gs', args, collect_profile)
+
     try:
         print("1단계: 전체 의사 목록 수집을 시작합니다...")
-        response = requests.get(base_url, params=params, headers=headers)
-        response.raise_for_status()
-        first_page_data = response.json()
-        
-        if 'data' not in first_page_data or 'pagenation' not in first_page_data['data']:
-            raise KeyError("'data' 또는 'pagenation' 키를 찾을 수 없습니다.")
-
-        total_count = first_page_data['data']['pagenation']['totalCount']
-        total_pages = math.ceil(total_count / page_per_num)
-        print(f"총 의료진: {total_count}명, 총 페이지: {total_pages}페이지")
-
-        all_doctors_list = []
-        for page in range(1, total_pages + 1):
-            params['page'] = page
-            print(f"  - 목록 {page}/{total_pages} 페이지 요청 중...")
-            response = requests.get(base_url, params=params, headers=headers)
-            page_data = response.json()
-            doctors_on_page = page_data.get('data', {}).get('list', [])
-            if doctors_on_page:
-                all_doctors_list.extend(doctors_on_page)
-            time.sleep(0.3)
-        
+
+        # 첫 페이지 응답의 전체 의료진 수로 페이지 수를 계산하고 나머지 페이지는 동시에 요청 (utils.pagination)
+        def fetch_page(page):
+            response = fetch('GET', base_url, params={**params, 'page': page}, headers=headers)
+            response.raise_for_status()
+            return response.content
+
+        def collect_list(_):
+            # 첫 페이지 요청이 재시도 후에도 실패하거나 응답 형식이 깨졌으면 run_stage가 단계 끝에서 한 번 더 시도
+            try:
+                return fetch_pages(fetch_page, parse_doctor_page, name="전체 의사 목록")
+            except requests.exceptions.RequestException as e:
+                print(f"    - 의사 목록 1페이지 처리 중 에러: {e}")
+            except (ValueError, KeyError) as e:
+                print(f"    - 의사 목록 1페이지 응답 처리 중 에러: {e}")
+                mark_failed()
+            return []
+
+        all_doctors_list = run_stage("1단계", [1], collect_list)[0] or []
+        if not all_doctors_list:
+            print("\n❌ 의사 목록을 가져오지 못했습니다. 종료합니다.")
+            return 0
+
         print(f"기본 목록 수집 완료. 총 {len(all_doctors_list)}명")
         
         # 2. 각 의사의 상세 정보 스크래핑하여 추가
         print("\n2단계: 각 의사의 상세 정보 스크래핑을 시작합니다...")
-        for i, doctor in enumerate(all_doctors_list):
-            empNo = doctor.get('empNo')
-            deptSeq = doctor.get('deptSeq')
-            doctor_name = doctor.get('nm')
-
-            if not empNo or not deptSeq:
-                continue
-
-            print(f"  - {i+1}/{len(all_doctors_list)}: {doctor_name} 의사 정보 가져오는 중...")
-            profile_details = get_profile_details(empNo, deptSeq)
-            doctor['profile'] = profile_details
-            time.sleep(0.3)
+        checkpoint = Checkpoint(file_name, args.resume)
+        output = open_output(file_name, args)
+        queue = open_queue(file_name, args)
+        worker = queue.wrap(collect_profile, doctor_key, all_doctors_list) if queue else collect_profile
+        worker = defer_on_failure(worker)
+        worker = checkpoint.wrap(worker, doctor_key)
+        if output:
+            worker = output.wrap(worker)
+        parquet = open_parquet(file_name, 'gs', args)
+        if parquet:
+            worker = parquet.wrap(worker)
+        store = open_store('gs', args)
+        if store:
+            worker = store.wrap(worker)
+        if output:
+            # 결과 레코드는 파일에만 남기고 메모리에는 모으지 않음
+            worker = drop_records(worker)
+        all_doctors_list = [doc for doc in run_stage("2단계", all_doctors_list, worker, label=lambda d: f"{d.get('nm')} 의사") if doc]
+        if state:
+            state.save()
+        details_once.report()
             
         # 3. 최종 데이터 파일로 저장
         print("\n3단계: 모든 정보를 파일에 저장합니다...")
 
-        file_name = '강남세브란스병원_gs'
-        save_to_json(all_doctors_list, file_name)
-        save_to_excel(all_doctors_list, file_name)
+        if parquet:
+            parquet.close()
+        if store:
+            store.close()
+        if output:
+            finish_output(output, file_name, args)
+        else:
+            save_to_json(all_doctors_list, file_name)
+        save_to_excel(output.path if output else all_doctors_list, file_name)
+        save_metrics(file_name, 'gs', args)
+        checkpoint.finish()
+        return len(all_doctors_list)
 
     except Exception as e:
         print(f"\n❌ 전체 프로세스 중단. 에러: {e}")
+        return 0
+
+
+def main(argv=None):
+    """명령행 옵션(argv)을 읽어 수집을 실행합니다. (crawl.py에서 병원별 프로세스로도 호출)"""
+    return scrape_gangnam_severance(parse_args("강남세브란스병원 의료진 크롤러", argv))
 
 # 이 스크립트가 직접 실행될 때만 scrape_gangnam_severance() 함수를 호출
 if __name__ == "__main__":
-    scrape_gangnam_severance()
\ No newline at end of file
+    main()
@@ -1,11 +1,38 @@
 # app.py
 
-import requests
-from bs4 import BeautifulSoup
 import time
 import json
+from urllib.parse import parse_qs, urlparse
 
 from utils.utils import save_to_excel, save_to_json
+from utils.engine import defer_on_failure, fetch, run_stage
+from utils.metrics import save_metrics, timed
+from utils.pagination import fetch_pages, page_count_from_links
+from utils.cli import parse_args
+from utils.incremental import IncrementalState, no_error
+from utils.singleflight import SingleFlight
+from utils.checkpoint import Checkpoint
+from utils.jsonl import open_output, finish_output, drop_records
+from utils.parquet import open_parquet
+from utils.store import open_store
+from utils.workqueue import open_queue, serve_queue
+from utils.html import parse, css
+
+PROFILE_TITLES = css('h2.doctor-paper-career-title')
+PROFILE_ROWS = css('tbody tr')
+
+@timed('smc.departments')
+def parse_departments(content, group):
+    """부서 선택 목록 HTML(bytes)의 option에서 부서 이름과 코드를 추출합니다."""
+    soup = parse(content)
+    departments = []
+    for option in soup.select('option'):
+        if dept_code := option.get('value'):
+            departments.append({
+                'group_name': group['name'], 'group_code': group['type'],
+                'dept_name': option.get_text(strip=True), 'dept_code': dept_code
+            })
+    return departments
 
 # --- 기능 함수 1: 모든 부서 목록 가져오기 ---
 def get_smc_departments(headers):
@@ -19,125 +46,198 @@ def get_smc_departments(headers):
         print(f"  - 그룹 '{group['name']}({group['type']})' 목록 수집 중...")
         params = {'dp_type': group['type'], '_': int(time.time() * 1000)}
         try:
-            response = requests.get(base_url, params=params, headers=headers)
+            response = fetch('GET', base_url, params=params, headers=headers)
             response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-            for option in soup.select('option'):
-                if dept_code := option.get('value'):
-                    all_departments.append({
-                        'group_name': group['name'], 'group_code': group['type'],
-                        'dept_name': option.get_text(strip=True), 'dept_code': dept_code
-                    })
-            time.sleep(0.3)
+            all_departments.extend(parse_departments(response.content, group))
         except Exception as e:
             print(f"  - 요청 실패 (그룹: {group['type']}): {e}")
     return all_departments
 
+@timed('smc.doctor_list')
+def parse_doctor_list(content, department):
+    """부서 의료진 목록 HTML(bytes)에서 의료진 기본 정보를 추출합니다."""
+    soup = parse(content)
+
+    doctors_in_dept = []
+    for item in soup.select('ul.masonry li.card-item.doctor-profile'):
+        name_tag = item.select_one('span[name="fullName"]')
+        name = name_tag.get_text(strip=True) if name_tag else ''
+
+        # h3 태그에서 직위와 소속과 추출
+        title_tag = item.select_one('h3.card-content-title')
+        full_title_text = title_tag.get_text(strip=True) if title_tag else ''
+        position = full_title_text.replace(name, '').split('[')[0].strip()
+
+        # --- 👇 네가 알려준 '진료분야' 선택자 정확하게 반영 ---
+        fields_tag = item.select_one('p.card-content-text')
+        fields = fields_tag.get_text(strip=True) if fields_tag else ''
+
+        img_tag = item.select_one('div.card-content-img img')
+        img_url = f"https://www.samsunghospital.com{img_tag['src']}" if img_tag and img_tag.has_attr('src') else ''
+
+        link_tag = item.select_one('section.card-item-inner > a')
+        detail_url = f"https://www.samsunghospital.com{link_tag['href']}" if link_tag and link_tag.has_attr('href') else ''
+
+        doctors_in_dept.append({
+            "소속": department['dept_name'],
+            "이름": name,
+            "직위": position,
+            "진료분야": fields,
+            "이미지URL": img_url,
+            "상세정보URL": detail_url
+        })
+    return doctors_in_dept
+
 # --- 기능 함수 2: 특정 부서의 의료진 정보 가져오기 (최종 수정) ---
 def get_smc_doctors_by_dept(headers, department):
-    """주어진 부서의 의료진 목록 HTML을 파싱하여 상세 정보를 추출합니다."""
+    """
+    주어진 부서의 의료진 목록 HTML을 파싱하여 상세 정보를 추출합니다.
+    - 첫 페이지에 페이지 이동 링크(cPage)가 있으면 나머지 페이지도 동시에 요청 (없으면 한 페이지)
+    """
     base_url = "https://www.samsunghospital.com/home/reservation/doctorInfoLists.do"
-    params = {'cPage': 1, 'DP_CODE': department['dept_code'], 'DP_TYPE': department['group_code'], '_': int(time.time() * 1000)}
-    try:
-        response = requests.get(base_url, params=params, headers=headers)
+    params = {'DP_CODE': department['dept_code'], 'DP_TYPE': department['group_code'], '_': int(time.time() * 1000)}
+
+    def fetch_page(page):
+        response = fetch('GET', base_url, params={**params, 'cPage': page}, headers=headers)
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        doctors_in_dept = []
-        for item in soup.select('ul.masonry li.card-item.doctor-profile'):
-            name_tag = item.select_one('span[name="fullName"]')
-            name = name_tag.get_text(strip=True) if name_tag else ''
-            
-            # h3 태그에서 직위와 소속과 추출
-            title_tag = item.select_one('h3.card-content-title')
-            full_title_text = title_tag.get_text(strip=True) if title_tag else ''
-            position = full_title_text.replace(name, '').split('[')[0].strip()
-            
-            # --- 👇 네가 알려준 '진료분야' 선택자 정확하게 반영 ---
-            fields_tag = item.select_one('p.card-content-text')
-            fields = fields_tag.get_text(strip=True) if fields_tag else ''
-            
-            img_tag = item.select_one('div.card-content-img img')
-            img_url = f"https://www.samsunghospital.com{img_tag['src']}" if img_tag and img_tag.has_attr('src') else ''
-
-            link_tag = item.select_one('section.card-item-inner > a')
-            detail_url = f"https://www.samsunghospital.com{link_tag['href']}" if link_tag and link_tag.has_attr('href') else ''
-
-            doctors_in_dept.append({
-                "소속": department['dept_name'],
-                "이름": name,
-                "직위": position,
-                "진료분야": fields,
-                "이미지URL": img_url,
-                "상세정보URL": detail_url
-            })
-        return doctors_in_dept
+        return response.content
+
+    def parse_page(content):
+        return parse_doctor_list(content, department), page_count_from_links(content, 'cPage') or 1
+
+    try:
+        return fetch_pages(fetch_page, parse_page, name=department['dept_name'])
     except Exception as e:
         print(f"    - {department['dept_name']} 처리 중 에러: {e}")
         return []
 
 # --- 기능 함수 3: 의료진 상세 정보 가져오기 (학력/경력) ---
+@timed('smc.doctor_detail')
+def parse_doctor_profile(html):
+    """상세 페이지 HTML(bytes)에서 학력/경력 표를 추출합니다."""
+    soup = parse(html)
+    
+    profile_data = {}
+    for title_tag in soup.select(PROFILE_TITLES):
+        title = title_tag.get_text(strip=True)
+        if title in ['학력', '경력']:
+            table_div = title_tag.find_next_sibling('div', class_='table-wrapper')
+            if table_div:
+                records = []
+                for row in table_div.select(PROFILE_ROWS):
+                    date = row.select_one('th').get_text(strip=True)
+                    content = row.select_one('td').get_text(strip=True)
+                    records.append(f"{date} {content}")
+                profile_data[title] = records
+    return profile_data
+
+def doctor_key(doctor):
+    """
+    3단계 상세 수집 단위를 구분하는 의료진 키 (상세정보URL|소속)
+    - 상세정보URL은 부서와 상관없이 같으므로 부서를 붙여 부서 행마다 증분 상태가 덮어써지지 않게 함
+    """
+    detail_url = doctor.get('상세정보URL')
+    return f"{detail_url}|{doctor.get('소속', '')}" if detail_url else None
+
+def doctor_id(doctor):
+    """상세정보URL의 의사 ID(DR_NO)를 반환합니다. (없으면 None)"""
+    return parse_qs(urlparse(doctor.get('상세정보URL') or '').query).get('DR_NO', [None])[0]
+
+def detail_key(doctor):
+    """여러 부서에 소속된 같은 의사를 묶는 키 (상세정보URL의 DR_NO, 없으면 URL 전체)"""
+    return doctor_id(doctor) or doctor.get('상세정보URL') or None
+
 def get_doctor_profile(detail_url, headers):
     """상세 페이지 URL을 받아 학력/경력 정보를 스크래핑합니다."""
     if not detail_url:
         return {}
     try:
-        response = requests.get(detail_url, headers=headers)
+        response = fetch('GET', detail_url, headers=headers)
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        profile_data = {}
-        for title_tag in soup.select('h2.doctor-paper-career-title'):
-            title = title_tag.get_text(strip=True)
-            if title in ['학력', '경력']:
-                table_div = title_tag.find_next_sibling('div', class_='table-wrapper')
-                if table_div:
-                    records = []
-                    for row in table_div.select('tbody tr'):
-                        date = row.select_one('th').get_text(strip=True)
-                        content = row.select_one('td').get_text(strip=True)
-                        records.append(f"{date} {content}")
-                    profile_data[title] = records
-        return profile_data
+        return parse_doctor_profile(response.content)
     except Exception as e:
         print(f"      - 상세 정보 처리 중 에러: {e}")
-        return {}
+        # 학력/경력이 없는 빈 결과({})와 구분되도록 실패는 'error'로 표시 (실패한 결과는 기억하지 않고 다시 시도)
+        return {"error": "상세 정보를 가져올 수 없습니다."}
 
 # --- 메인 실행 로직 ---
-if __name__ == "__main__":
+def main(argv=None):
+    """전체 수집을 실행하고 최종 저장한 의료진 수를 반환합니다. (crawl.py에서 병원별 프로세스로도 호출)"""
+    args = parse_args("삼성서울병원 의료진 크롤러", argv)
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36',
         'Referer': 'https://www.samsunghospital.com/home/reservation/deptAndDr.do',
         'X-Requested-With': 'XMLHttpRequest'
     }
     
+    file_name = '삼성서울병원_smc'
+    fetch_profile = lambda doctor: get_doctor_profile(doctor.get('상세정보URL'), headers)
+    details_once = SingleFlight()
+    fetch_profile = details_once.wrap(fetch_profile, detail_key, is_valid=no_error)
+    state = IncrementalState(file_name, args.max_age_days) if args.incremental else None
+    if state:
+        fetch_profile = state.wrap(fetch_profile, doctor_key, is_valid=no_error)
+
+    def collect_profile(doctor):
+        # 목록 행은 그대로 두고 새 레코드로 반환 (결과를 파일에만 쓸 때 목록 쪽에 상세 정보가 쌓이지 않게 함)
+        # 저장소/Parquet이 부서 행을 의사 한 명으로 묶을 수 있게 의사 ID(DR_NO)를 함께 남김
+        return {**doctor, 'DR_NO': doctor_id(doctor), 'profile': fetch_profile(doctor)}
+
+    if args.queue_worker:
+        return serve_queue(file_name, 'smc', args, collect_profile)
+
     departments = get_smc_departments(headers)
     if not departments:
         print("\n❌ 1단계 실패. 종료합니다.")
+        return 0
     else:
         print(f"\n✅ 1단계 완료: 총 {len(departments)}개 부서 수집.")
-        all_doctors = []
         print("\n2단계: 각 부서별 의료진 목록 수집 시작...")
-        for i, dept in enumerate(departments):
-            print(f"  - ({i+1}/{len(departments)}) {dept['dept_name']} 수집 중...")
-            doctors = get_smc_doctors_by_dept(headers, dept)
-            if doctors:
-                all_doctors.extend(doctors)
-            time.sleep(0.2)
+        results = run_stage("2단계", departments, lambda dept: get_smc_doctors_by_dept(headers, dept), label=lambda d: d['dept_name'])
+        all_doctors = [doc for doctors in results if doctors for doc in doctors]
         
         print(f"\n✅ 2단계 완료: 총 {len(all_doctors)}명 의료진 목록 수집.")
 
         print("\n3단계: 각 의료진의 상세 프로필(학력/경력) 수집 시작...")
-        for i, doctor in enumerate(all_doctors):
-            print(f"  - ({i+1}/{len(all_doctors)}) {doctor['이름']} 상세 정보 수집 중...")
-            profile = get_doctor_profile(doctor.get('상세정보URL'), headers)
-            doctor['profile'] = profile
-            time.sleep(0.2)
+        checkpoint = Checkpoint(file_name, args.resume)
+        output = open_output(file_name, args)
+        queue = open_queue(file_name, args)
+        worker = queue.wrap(collect_profile, doctor_key, all_doctors) if queue else collect_profile
+        worker = defer_on_failure(worker)
+        worker = checkpoint.wrap(worker, doctor_key)
+        if output:
+            worker = output.wrap(worker)
+        parquet = open_parquet(file_name, 'smc', args)
+        if parquet:
+            worker = parquet.wrap(worker)
+        store = open_store('smc', args)
+        if store:
+            worker = store.wrap(worker)
+        if output:
+            # 결과 레코드는 파일에만 남기고 메모리에는 모으지 않음
+            worker = drop_records(worker)
+        all_doctors = [doc for doc in run_stage("3단계", all_doctors, worker, label=lambda d: d['이름']) if doc]
+        if state:
+            state.save()
+        details_once.report()
             
         print(f"\n✅ 3단계 완료: 모든 정보 통합. 최종 데이터를 저장합니다.")
 
-        file_name = '삼성서울병원_smc'
-        save_to_json(all_doctors, file_name)
+        if parquet:
+            parquet.close()
+        if store:
+            store.close()
+        if output:
+            finish_output(output, file_name, args)
+        else:
+            save_to_json(all_doctors, file_name)
 
         # 2. utils.py의 함수를 이용해 Excel 파일로 저장
-        save_to_excel(all_doctors, file_name)
\ No newline at end of file
+        save_to_excel(output.path if output else all_doctors, file_name)
+        save_metrics(file_name, 'smc', args)
+        checkpoint.finish()
+        return len(all_doctors)
+
+
+if __name__ == "__main__":
+    main()
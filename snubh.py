@@ -1,144 +1,221 @@
 import requests
-from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlencode, urlparse, parse_qs
-import time
 import re
 
 # utils.py의 파일 저장 함수들을 가져옴
 # 이 코드를 실행하려면 프로젝트 폴더에 utils/utils.py 파일이 있어야 합니다.
 from utils.utils import save_to_json, save_to_excel
+from utils.engine import defer_on_failure, fetch, run_stage
+from utils.metrics import save_metrics, timed
+from utils.cli import parse_args
+from utils.incremental import IncrementalState, no_error
+from utils.singleflight import SingleFlight
+from utils.checkpoint import Checkpoint
+from utils.jsonl import open_output, finish_output, drop_records
+from utils.parquet import open_parquet
+from utils.store import open_store
+from utils.workqueue import open_queue, serve_queue
+from utils.html import parse, css
+
+DOCTOR_NAME = css('p.bh_doctor_name')
+DOCTOR_POSITION = css('p.bh_doctor_dept')
+PROFILE_TITLES = css('h6.tit_h4')
+
+@timed('snubh.departments')
+def parse_department_links(content, base_url):
+    """전체 의료진 페이지 HTML(bytes)에서 부서/센터 이름과 링크를 추출합니다."""
+    soup = parse(content)
+    departments = []
+    for item in soup.select('li[id^="pos_"]'):
+        a_tag = item.select_one('a.dept_tit')
+        if a_tag and a_tag.has_attr('href'):
+            dept_name = a_tag.get_text(strip=True)
+            relative_url = a_tag['href']
+            full_url = urljoin(base_url, relative_url)
+            departments.append({'name': dept_name, 'url': full_url})
+    return departments
 
 def scrape_department_links(base_url, headers):
     """
     1단계: 전체 의료진 페이지에서 각 부서/센터 페이지로 연결되는 링크와 이름을 수집합니다.
     """
     print("1단계: 전체 부서 링크 수집을 시작합니다...")
-    departments = []
     try:
-        response = requests.get(base_url, headers=headers)
+        response = fetch('GET', base_url, headers=headers)
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        department_list_items = soup.select('li[id^="pos_"]')
-        print(f"-> 총 {len(department_list_items)}개의 부서/센터를 찾았습니다.")
-
-        for item in department_list_items:
-            a_tag = item.select_one('a.dept_tit')
-            if a_tag and a_tag.has_attr('href'):
-                dept_name = a_tag.get_text(strip=True)
-                relative_url = a_tag['href']
-                full_url = urljoin(base_url, relative_url)
-                departments.append({'name': dept_name, 'url': full_url})
+        departments = parse_department_links(response.content, base_url)
+        print(f"-> 총 {len(departments)}개의 부서/센터를 찾았습니다.")
         return departments
     except requests.exceptions.RequestException as e:
         print(f"❌ 페이지 요청 중 에러 발생: {e}")
         return []
 
+@timed('snubh.doctor_list')
+def parse_doctor_list(content, department_url):
+    """
+    부서 페이지 HTML(bytes)에서 의사 기본 정보를 추출합니다.
+    - 상세 페이지 URL은 부서 URL의 쿼리와 '소개' 버튼 onclick의 파라미터를 합쳐 만듦
+    """
+    soup = parse(content)
+
+    parsed_dept_url = urlparse(department_url)
+    base_params = {k: v[0] for k, v in parse_qs(parsed_dept_url.query).items()}
+
+    doctors = []
+
+    for item in soup.select('li.bh_bookmark_list3'):
+        name_strong_tag = item.select_one('div.bh_doctor_name_n > strong')
+
+        name = '이름 정보 없음'
+        position_from_list = ''
+
+        if name_strong_tag:
+            position_em_tag = name_strong_tag.find('em')
+            if position_em_tag:
+                position_from_list = position_em_tag.get_text(strip=True)
+                position_em_tag.extract()
+            name = name_strong_tag.get_text(strip=True)
+
+        fields_dd_tag = item.select_one('dl.bh_doctor_dept_n > dd')
+        fields = fields_dd_tag.get_text(strip=True) if fields_dd_tag else '전문분야 정보 없음'
+
+        intro_button = item.select_one('input.bh_doctor_btn_intro')
+        detail_url = ''
+        if intro_button and intro_button.has_attr('onclick'):
+            onclick_attr = intro_button['onclick']
+
+            onclick_params = {}
+            sDrSid_match = re.search(r"'sDrSid'\s*:\s*'([^']*)'", onclick_attr)
+            sDrStfNo_match = re.search(r"'sDrStfNo'\s*:\s*'([^']*)'", onclick_attr)
+            sDpTp_match = re.search(r"'sDpTp'\s*:\s*'([^']*)'", onclick_attr)
+            sDpCdDtl_match = re.search(r"'sDpCdDtl'\s*:\s*'([^']*)'", onclick_attr)
+
+            if sDrSid_match: onclick_params['sDrSid'] = sDrSid_match.group(1)
+            if sDrStfNo_match: onclick_params['sDrStfNo'] = sDrStfNo_match.group(1)
+            if sDpTp_match: onclick_params['sDpTp'] = sDpTp_match.group(1)
+            if sDpCdDtl_match: onclick_params['sDpCdDtl'] = sDpCdDtl_match.group(1)
+
+            final_params = {**base_params, **onclick_params}
+
+            if final_params:
+                base_detail_url = "https://www.snubh.org/medical/drIntroduce.do"
+                detail_url = f"{base_detail_url}?{urlencode(final_params)}"
+
+        doctor_info = {
+            'name': name,
+            'position_from_list': position_from_list,
+            'fields': fields,
+            'detail_url': detail_url
+        }
+        doctors.append(doctor_info)
+    return doctors
+
 def scrape_doctors_from_dept(department_url, headers):
     """
     2단계: 각 부서 페이지에서 소속된 의사들의 기본 정보를 수집합니다.
     """
-    doctors = []
     try:
-        response = requests.get(department_url, headers=headers)
+        response = fetch('GET', department_url, headers=headers)
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        parsed_dept_url = urlparse(department_url)
-        base_params = {k: v[0] for k, v in parse_qs(parsed_dept_url.query).items()}
-
-        for item in soup.select('li.bh_bookmark_list3'):
-            name_strong_tag = item.select_one('div.bh_doctor_name_n > strong')
-            
-            name = '이름 정보 없음'
-            position_from_list = ''
-
-            if name_strong_tag:
-                position_em_tag = name_strong_tag.find('em')
-                if position_em_tag:
-                    position_from_list = position_em_tag.get_text(strip=True)
-                    position_em_tag.extract()
-                name = name_strong_tag.get_text(strip=True)
-
-            fields_dd_tag = item.select_one('dl.bh_doctor_dept_n > dd')
-            fields = fields_dd_tag.get_text(strip=True) if fields_dd_tag else '전문분야 정보 없음'
-            
-            intro_button = item.select_one('input.bh_doctor_btn_intro')
-            detail_url = ''
-            if intro_button and intro_button.has_attr('onclick'):
-                onclick_attr = intro_button['onclick']
-                
-                onclick_params = {}
-                sDrSid_match = re.search(r"'sDrSid'\s*:\s*'([^']*)'", onclick_attr)
-                sDrStfNo_match = re.search(r"'sDrStfNo'\s*:\s*'([^']*)'", onclick_attr)
-                sDpTp_match = re.search(r"'sDpTp'\s*:\s*'([^']*)'", onclick_attr)
-                sDpCdDtl_match = re.search(r"'sDpCdDtl'\s*:\s*'([^']*)'", onclick_attr)
-
-                if sDrSid_match: onclick_params['sDrSid'] = sDrSid_match.group(1)
-                if sDrStfNo_match: onclick_params['sDrStfNo'] = sDrStfNo_match.group(1)
-                if sDpTp_match: onclick_params['sDpTp'] = sDpTp_match.group(1)
-                if sDpCdDtl_match: onclick_params['sDpCdDtl'] = sDpCdDtl_match.group(1)
-                
-                final_params = {**base_params, **onclick_params}
-                
-                if final_params:
-                    base_detail_url = "https://www.snubh.org/medical/drIntroduce.do"
-                    detail_url = f"{base_detail_url}?{urlencode(final_params)}"
-
-            doctor_info = {
-                'name': name,
-                'position_from_list': position_from_list,
-                'fields': fields,
-                'detail_url': detail_url
-            }
-            doctors.append(doctor_info)
-        return doctors
+        return parse_doctor_list(response.content, department_url)
     except Exception as e:
         print(f"   - 의료진 목록 처리 중 에러: {e}")
         return []
 
-def scrape_doctor_details(detail_url, headers):
+@timed('snubh.doctor_detail')
+def parse_doctor_details(content):
     """
-    3단계: 의사 상세 정보 페이지에서 이름, 직함, 학력, 경력 정보를 수집합니다.
+    상세 페이지 HTML(bytes)에서 이름, 직함, 학력, 경력 정보를 추출합니다.
     (⭐️ 핵심 수정: 제목 텍스트를 정확하게 추출하도록 변경)
     """
     details = {}
-    try:
-        response = requests.get(detail_url, headers=headers)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
+    soup = parse(content)
+
+    # 공통 정보: 이름과 직함(소속) 정보 추출
+    name_tag = soup.select_one(DOCTOR_NAME)
+    if name_tag:
+        details['name'] = name_tag.get_text(strip=True)
+    
+    position_tag = soup.select_one(DOCTOR_POSITION)
+    if position_tag:
+        details['position'] = position_tag.get_text(strip=True)
 
-        # 공통 정보: 이름과 직함(소속) 정보 추출
-        name_tag = soup.select_one('p.bh_doctor_name')
-        if name_tag:
-            details['name'] = name_tag.get_text(strip=True)
+    # 학력 및 경력 정보 추출
+    for title_tag in soup.select(PROFILE_TITLES):
+        # ⭐️ .contents[0]를 사용해 <span> 태그를 제외한 순수 텍스트만 가져옴
+        title = title_tag.contents[0].strip()
         
-        position_tag = soup.select_one('p.bh_doctor_dept')
-        if position_tag:
-            details['position'] = position_tag.get_text(strip=True)
-
-        # 학력 및 경력 정보 추출
-        for title_tag in soup.select('h6.tit_h4'):
-            # ⭐️ .contents[0]를 사용해 <span> 태그를 제외한 순수 텍스트만 가져옴
-            title = title_tag.contents[0].strip()
-            
-            if title == '학력' or title == '경력':
-                ul_tag = title_tag.find_next_sibling('ul')
-                if ul_tag:
-                    records = [' '.join(li.get_text().split()) for li in ul_tag.find_all('li')]
-                    details[title] = records
-                        
-        return details
+        if title == '학력' or title == '경력':
+            ul_tag = title_tag.find_next_sibling('ul')
+            if ul_tag:
+                records = [' '.join(li.get_text().split()) for li in ul_tag.find_all('li')]
+                details[title] = records
+                    
+    return details
+
+def doctor_key(doctor):
+    """3단계 상세 수집 단위를 구분하는 의료진 키 (detail_url)"""
+    return doctor.get('detail_url') or None
+
+def doctor_id(doctor):
+    """detail_url의 의사 ID(sDrSid)를 반환합니다. (없으면 None)"""
+    return parse_qs(urlparse(doctor.get('detail_url') or '').query).get('sDrSid', [None])[0]
+
+def detail_key(doctor):
+    """
+    여러 부서에 소속된 같은 의사를 묶는 키 (detail_url의 sDrSid, 없으면 URL 전체)
+    - detail_url에는 부서 파라미터가 들어 있어 같은 의사도 부서마다 URL이 다름
+    """
+    return doctor_id(doctor) or doctor.get('detail_url') or None
+
+def scrape_doctor_details(detail_url, headers):
+    """
+    3단계: 의사 상세 정보 페이지에서 이름, 직함, 학력, 경력 정보를 수집합니다.
+    """
+    try:
+        response = fetch('GET', detail_url, headers=headers)
+        response.raise_for_status()
+        return parse_doctor_details(response.content)
     except Exception as e:
         print(f"     - 상세 정보 처리 중 에러: {e}")
-        return {}
+        # 학력/경력이 없는 빈 결과({})와 구분되도록 실패는 'error'로 표시 (실패한 결과는 기억하지 않고 다시 시도)
+        return {"error": "상세 정보를 가져올 수 없습니다."}
 
-if __name__ == "__main__":
+def main(argv=None):
+    """전체 수집을 실행하고 최종 저장한 의료진 수를 반환합니다. (crawl.py에서 병원별 프로세스로도 호출)"""
+    args = parse_args("분당서울대학교병원 의료진 크롤러", argv)
     target_url = "https://www.snubh.org/medical/drMedicalTeam2.do"
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36'
     }
 
+    file_base_name = '분당서울대학교병원_의료진'
+    fetch_details = lambda doctor: scrape_doctor_details(doctor['detail_url'], headers)
+    details_once = SingleFlight()
+    fetch_details = details_once.wrap(fetch_details, detail_key, is_valid=no_error)
+    state = IncrementalState(file_base_name, args.max_age_days) if args.incremental else None
+    if state:
+        fetch_details = state.wrap(fetch_details, doctor_key, is_valid=no_error)
+
+    def collect_details(doctor):
+        # 상세 정보 스크래핑
+        details = fetch_details(doctor)
+
+        # 2단계 정보와 3단계 정보를 합침
+        return {
+            '이름': details.get('name', doctor.get('name')),
+            '직위/소속': details.get('position', doctor.get('position_from_list')),
+            '전문분야': doctor.get('fields'),
+            '학력': details.get('학력', []),
+            '경력': details.get('경력', []),
+            '상세정보URL': doctor.get('detail_url'),
+            # 상세정보URL은 부서마다 달라지므로 저장소/Parquet의 의료진 ID로 쓸 수 있게 의사 ID를 따로 남김
+            'sDrSid': doctor_id(doctor)
+        }
+
+    if args.queue_worker:
+        return serve_queue(file_base_name, 'snubh', args, collect_details)
+
     # 1단계: 부서 목록 수집
     departments = scrape_department_links(target_url, headers)
     
@@ -146,13 +223,10 @@ if __name__ == "__main__":
         print(f"\n✅ 1단계 완료: 총 {len(departments)}개 부서 수집.")
         
         # 2단계: 모든 부서의 의료진 목록 수집
-        all_doctors_list = []
         print("\n2단계: 각 부서별 의료진 목록 수집을 시작합니다...")
-        for i, dept in enumerate(departments):
-            print(f"  - ({i+1}/{len(departments)}) {dept['name']} 의료진 목록 수집 중...")
-            doctors = scrape_doctors_from_dept(dept['url'], headers)
-            all_doctors_list.extend(doctors)
-            time.sleep(0.2)
+        results = run_stage("2단계", departments, lambda dept: scrape_doctors_from_dept(dept['url'], headers),
+                            label=lambda d: f"{d['name']} 의료진 목록")
+        all_doctors_list = [doc for doctors in results if doctors for doc in doctors]
         
         print(f"\n✅ 2단계 완료! 총 {len(all_doctors_list)}개의 의료진 항목을 수집했습니다.")
 
@@ -161,30 +235,48 @@ if __name__ == "__main__":
         unique_doctors_list = list(unique_doctors_map.values())
 
         print(f"\n3단계: 중복을 제외한 {len(unique_doctors_list)}명의 고유 의료진 상세 정보 수집 시작...")
-        final_data = []
-        for i, doctor in enumerate(unique_doctors_list):
-            print(f"  - ({i+1}/{len(unique_doctors_list)}) {doctor.get('name', '이름없음')} 교수님 상세 정보 수집 중...")
-            
-            # 상세 정보 스크래핑
-            details = scrape_doctor_details(doctor['detail_url'], headers)
-            
-            # 2단계 정보와 3단계 정보를 합침
-            final_doctor_info = {
-                '이름': details.get('name', doctor.get('name')),
-                '직위/소속': details.get('position', doctor.get('position_from_list')),
-                '전문분야': doctor.get('fields'),
-                '학력': details.get('학력', []),
-                '경력': details.get('경력', []),
-                '상세정보URL': doctor.get('detail_url')
-            }
-            final_data.append(final_doctor_info)
-            time.sleep(0.2)
+        checkpoint = Checkpoint(file_base_name, args.resume)
+        output = open_output(file_base_name, args)
+        queue = open_queue(file_base_name, args)
+        worker = queue.wrap(collect_details, doctor_key, unique_doctors_list) if queue else collect_details
+        worker = defer_on_failure(worker)
+        worker = checkpoint.wrap(worker, doctor_key)
+        if output:
+            worker = output.wrap(worker)
+        parquet = open_parquet(file_base_name, 'snubh', args)
+        if parquet:
+            worker = parquet.wrap(worker)
+        store = open_store('snubh', args)
+        if store:
+            worker = store.wrap(worker)
+        if output:
+            # 결과 레코드는 파일에만 남기고 메모리에는 모으지 않음
+            worker = drop_records(worker)
+        final_data = [doc for doc in run_stage("3단계", unique_doctors_list, worker, label=lambda d: f"{d.get('name', '이름없음')} 교수님") if doc]
+
+        if state:
+            state.save()
+        details_once.report()
 
         print(f"\n✅ 3단계 완료! 최종 데이터를 파일로 저장합니다.")
 
         # 4단계: 최종 데이터 저장
-        file_base_name = '분당서울대학교병원_의료진'
-        save_to_json(final_data, file_base_name)
-        save_to_excel(final_data, file_base_name)
+        if parquet:
+            parquet.close()
+        if store:
+            store.close()
+        if output:
+            finish_output(output, file_base_name, args)
+        else:
+            save_to_json(final_data, file_base_name)
+        save_to_excel(output.path if output else final_data, file_base_name)
+        save_metrics(file_base_name, 'snubh', args)
+        checkpoint.finish()
+        return len(final_data)
     else:
         print("\n❌ 1단계 부서 목록 수집에 실패하여 프로그램을 종료합니다.")
+        return 0
+
+
+if __name__ == "__main__":
+    main()
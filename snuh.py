@@ -1,12 +1,43 @@
 # app.py
 
 import requests
-from bs4 import BeautifulSoup
 import re
 import json
-import time
 
 from utils.utils import save_to_excel, save_to_json
+from utils.engine import allow_failure, defer_on_failure, fetch, run_stage
+from utils.metrics import save_metrics, timed
+from utils.pagination import fetch_pages, page_count_from_links
+from utils.cli import parse_args
+from utils.incremental import IncrementalState
+from utils.singleflight import SingleFlight
+from utils.checkpoint import Checkpoint
+from utils.jsonl import open_output, finish_output, drop_records
+from utils.parquet import open_parquet
+from utils.store import open_store
+from utils.workqueue import open_queue, serve_queue
+from utils.html import parse
+
+# HTML 페이지 없이 AJAX로 바로 요청할 때의 경력 항목 수 (HTML의 totalCareerCount를 모르므로 넉넉하게)
+AJAX_CAREER_LIMIT = 500
+
+@timed('snuh.departments')
+def parse_departments(content):
+    """진료과 메인 페이지 HTML(bytes)에서 '의료진' 링크가 있는 진료과 이름과 코드를 추출합니다."""
+    soup = parse(content)
+    department_list = []
+    for item in soup.select("div.treatItemWrap"):
+        dept_name_tag = item.select_one("span")
+        if not dept_name_tag: continue
+        dept_name = dept_name_tag.get_text(strip=True)
+        doctor_link_tag = item.find('a', string='의료진')
+        if doctor_link_tag:
+            href_attr = doctor_link_tag.get('href', '')
+            match = re.search(r"goDetail\('([^']*)'", href_attr)
+            if match:
+                dept_code = match.group(1)
+                department_list.append({'진료과명': dept_name, '진료과코드': dept_code})
+    return department_list
 
 def get_snuh_department_codes():
     """서울대학교병원 메인 페이지에서 진료과 이름과 코드를 추출합니다."""
@@ -14,311 +45,411 @@ def get_snuh_department_codes():
     headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36'}
     try:
         print("1단계: 전체 부서 코드 수집 중...")
-        response = requests.get(main_url, headers=headers, timeout=15)
+        response = fetch('GET', main_url, headers=headers, timeout=15)
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        department_list = []
-        treat_items = soup.select("div.treatItemWrap")
-        for item in treat_items:
-            dept_name_tag = item.select_one("span")
-            if not dept_name_tag: continue
-            dept_name = dept_name_tag.get_text(strip=True)
-            doctor_link_tag = item.find('a', string='의료진')
-            if doctor_link_tag:
-                href_attr = doctor_link_tag.get('href', '')
-                match = re.search(r"goDetail\('([^']*)'", href_attr)
-                if match:
-                    dept_code = match.group(1)
-                    department_list.append({'진료과명': dept_name, '진료과코드': dept_code})
+        department_list = parse_departments(response.content)
         print(f"✅ 1단계 완료: '의료진' 정보가 있는 {len(department_list)}개의 부서 코드를 수집했습니다.")
         return department_list
     except requests.exceptions.RequestException as e:
         print(f"페이지를 가져오는 중 에러 발생: {e}")
         return []
 
+@timed('snuh.doctor_list')
+def parse_doctor_list(content, dept_name):
+    """의료진 목록 한 페이지의 HTML(bytes)에서 의료진 기본 정보를 추출합니다."""
+    soup = parse(content)
+    doctors = []
+    for item in soup.select("ul.doctorSchedule > li"):
+        name_tag = item.select_one("a.doctorNameWrap > strong")
+        name = name_tag.get_text(strip=True) if name_tag else "이름 정보 없음"
+        specialty = "세부전공 정보 없음"
+        specialty_wrap = item.select_one(".doctor-concentration-wrap")
+        if specialty_wrap and specialty_wrap.select_one("p:nth-of-type(2)"):
+            specialty = specialty_wrap.select_one("p:nth-of-type(2)").get_text(strip=True).replace(', &nbsp', ',')
+        link_tag = item.select_one("a.doctor-view-button")
+        detail_link = link_tag['href'] if link_tag and link_tag.has_attr('href') else "링크 없음"
+        doctors.append({'소속진료과': dept_name, '이름': name, '세부전공': specialty, '상세정보링크': detail_link})
+    return doctors
+
 def fetch_doctors_from_department(department, headers):
-    """Form 제출을 시뮬레이션하여 모든 의료진 정보를 수집합니다."""
+    """
+    Form 제출을 시뮬레이션하여 모든 의료진 정보를 수집합니다.
+    - 첫 페이지의 페이지 이동 링크로 전체 페이지 수를 알아내고 나머지 페이지는 동시에 요청 (utils.pagination)
+    - 링크가 없으면 한 페이지씩 요청하고, 첫 페이지보다 짧은 페이지(마지막 페이지)나 첫 페이지와 같은 페이지가 나오면 멈춤
+    """
     dept_code = department['진료과코드']
     dept_name = department['진료과명']
     doctor_list_url = f"https://www.snuh.org/reservation/meddept/{dept_code}/mainDoctor.do"
-    all_doctors_in_dept = []
-    page_index = 1
-    with requests.Session() as s:
-        s.headers.update(headers)
-        while True:
-            try:
-                payload = {'pageIndex': str(page_index)}
-                response = s.post(doctor_list_url, data=payload, timeout=15)
-                response.raise_for_status()
-                soup = BeautifulSoup(response.text, 'html.parser')
-                doctor_items = soup.select("ul.doctorSchedule > li")
-                if not doctor_items: break
-                current_first_doctor_name_tag = doctor_items[0].select_one("a.doctorNameWrap > strong")
-                if current_first_doctor_name_tag:
-                    current_first_doctor = current_first_doctor_name_tag.get_text(strip=True)
-                    if page_index > 1 and all_doctors_in_dept and current_first_doctor == all_doctors_in_dept[0]['이름']:
-                        break
-                for item in doctor_items:
-                    name_tag = item.select_one("a.doctorNameWrap > strong")
-                    name = name_tag.get_text(strip=True) if name_tag else "이름 정보 없음"
-                    specialty = "세부전공 정보 없음"
-                    specialty_wrap = item.select_one(".doctor-concentration-wrap")
-                    if specialty_wrap and specialty_wrap.select_one("p:nth-of-type(2)"):
-                        specialty = specialty_wrap.select_one("p:nth-of-type(2)").get_text(strip=True).replace(', &nbsp', ',')
-                    link_tag = item.select_one("a.doctor-view-button")
-                    detail_link = link_tag['href'] if link_tag and link_tag.has_attr('href') else "링크 없음"
-                    all_doctors_in_dept.append({'소속진료과': dept_name, '이름': name, '세부전공': specialty, '상세정보링크': detail_link})
-                page_index += 1
-                time.sleep(0.3)
-            except requests.exceptions.RequestException as e:
-                print(f"      - {dept_name} {page_index}페이지 처리 중 에러: {e}")
-                break
+
+    def fetch_page(page_index):
+        response = fetch('POST', doctor_list_url, headers=headers, data={'pageIndex': str(page_index)}, timeout=15)
+        response.raise_for_status()
+        return response.content
+
+    def parse_page(content):
+        return parse_doctor_list(content, dept_name), page_count_from_links(content, 'pageIndex')
+
+    try:
+        all_doctors_in_dept = fetch_pages(fetch_page, parse_page, name=dept_name)
+    except requests.exceptions.RequestException as e:
+        print(f"      - {dept_name} 1페이지 처리 중 에러: {e}")
+        return []
     unique_doctors = [dict(t) for t in {tuple(d.items()) for d in all_doctors_in_dept}]
     return unique_doctors
 
-def fetch_doctor_details(detail_url, headers):
-    """의료진 상세 페이지에서 학력/경력 정보를 추출하는 함수"""
-    details = {"학력": "정보 없음", "경력": "정보 없음"}
-    if not detail_url or "javascript" in detail_url or detail_url == "링크 없음":
-        return details
+@timed('snuh.doctor_detail')
+def parse_career_html(content):
+    """
+    블로그 상세 페이지 HTML(bytes)에서 학력/경력 목록과 AJAX 추가 수집에 필요한 정보를 추출합니다.
+    - 반환: {'학력': [...], '경력': [...], 'has_more': 더보기 버튼 여부, 'dr_cd': JS 변수의 의사 ID, 'total_count': 전체 경력 수}
+    """
+    soup = parse(content)
+    page_text = content.decode('utf-8', errors='replace') if isinstance(content, bytes) else content
+    
+    education_list = []
+    experience_list = []
 
-    try:
-        # Step 1: 메인 페이지에서 기본 정보 수집
-        response = requests.get(detail_url, headers=headers, timeout=15)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Step 2: 먼저 정적 HTML에서 기본 학력/경력 정보 수집
-        education_list = []
-        experience_list = []
-        
-        # 학력/경력 섹션 찾기 (id="career")
-        career_section = soup.find('div', {'id': 'career'})
-        if career_section:
-            print(f"        [DEBUG] career 섹션 발견")
-            
-            # 학력/경력이 하나의 ul 안에 h3로 구분되어 있음
-            current_section = None
-            
-            # career 섹션 내의 모든 요소를 순서대로 처리
-            for element in career_section.find_all(['h3', 'li']):
-                if element.name == 'h3':
-                    # 섹션 제목 확인
-                    section_title = element.get_text(strip=True)
-                    if '학력' in section_title:
-                        current_section = '학력'
-                        print(f"        [DEBUG] 학력 섹션 시작")
-                    elif '경력' in section_title:
-                        current_section = '경력'
-                        print(f"        [DEBUG] 경력 섹션 시작")
-                    else:
-                        current_section = None
-                
-                elif element.name == 'li' and element.has_attr('class') and 'blogCont-history-item' in element['class']:
-                    # 학력/경력 항목 처리
-                    if current_section:
-                        # 날짜 추출 (p 태그)
-                        date_p = element.find('p', class_='blogCont-history-date')
-                        date_text = date_p.get_text(strip=True) if date_p else ''
-                        
-                        # 내용 추출 (div > p 구조)
-                        content_p = element.find('p', class_='blogCont-history-content')
-                        content_text = content_p.get_text(strip=True) if content_p else ''
-                        
-                        if content_text:
-                            history_item = f"{date_text} {content_text}".strip()
-                            
-                            if current_section == '학력':
-                                education_list.append(history_item)
-                            elif current_section == '경력':
-                                experience_list.append(history_item)
-        
-        else:
-            # career 섹션이 없는 경우 기존 방식으로 시도
-            print(f"        [DEBUG] career 섹션 없음, 기존 방식으로 시도")
-            
-            # 학력 섹션 찾기
-            edu_h3 = soup.find('h3', string=lambda text: text and '학력' in text)
-            if edu_h3:
-                # 다음 ul 또는 형제 요소들에서 li 찾기
-                next_sibling = edu_h3.find_next_sibling()
-                while next_sibling:
-                    if next_sibling.name == 'h3' and '경력' in next_sibling.get_text():
-                        break
-                    if next_sibling.name == 'li' and 'blogCont-history-item' in (next_sibling.get('class') or []):
-                        date_p = next_sibling.find('p', class_='blogCont-history-date')
-                        content_p = next_sibling.find('p', class_='blogCont-history-content')
-                        
-                        date_text = date_p.get_text(strip=True) if date_p else ''
-                        content_text = content_p.get_text(strip=True) if content_p else ''
-                        
-                        if content_text:
-                            history_item = f"{date_text} {content_text}".strip()
+    # 학력/경력 섹션 찾기 (id="career")
+    career_section = soup.find('div', {'id': 'career'})
+    if career_section:
+        print(f"        [DEBUG] career 섹션 발견")
+
+        # 학력/경력이 하나의 ul 안에 h3로 구분되어 있음
+        current_section = None
+
+        # career 섹션 내의 모든 요소를 순서대로 처리
+        for element in career_section.find_all(['h3', 'li']):
+            if element.name == 'h3':
+                # 섹션 제목 확인
+                section_title = element.get_text(strip=True)
+                if '학력' in section_title:
+                    current_section = '학력'
+                    print(f"        [DEBUG] 학력 섹션 시작")
+                elif '경력' in section_title:
+                    current_section = '경력'
+                    print(f"        [DEBUG] 경력 섹션 시작")
+                else:
+                    current_section = None
+
+            elif element.name == 'li' and element.has_attr('class') and 'blogCont-history-item' in element['class']:
+                # 학력/경력 항목 처리
+                if current_section:
+                    # 날짜 추출 (p 태그)
+                    date_p = element.find('p', class_='blogCont-history-date')
+                    date_text = date_p.get_text(strip=True) if date_p else ''
+
+                    # 내용 추출 (div > p 구조)
+                    content_p = element.find('p', class_='blogCont-history-content')
+                    content_text = content_p.get_text(strip=True) if content_p else ''
+
+                    if content_text:
+                        history_item = f"{date_text} {content_text}".strip()
+
+                        if current_section == '학력':
                             education_list.append(history_item)
-                    
-                    next_sibling = next_sibling.find_next_sibling()
-            
-            # 경력 섹션 찾기
-            exp_h3 = soup.find('h3', string=lambda text: text and '경력' in text)
-            if exp_h3:
-                next_sibling = exp_h3.find_next_sibling()
-                while next_sibling:
-                    if next_sibling.name == 'h3':
-                        break
-                    if next_sibling.name == 'li' and 'blogCont-history-item' in (next_sibling.get('class') or []):
-                        date_p = next_sibling.find('p', class_='blogCont-history-date')
-                        content_p = next_sibling.find('p', class_='blogCont-history-content')
-                        
-                        date_text = date_p.get_text(strip=True) if date_p else ''
-                        content_text = content_p.get_text(strip=True) if content_p else ''
-                        
-                        if content_text:
-                            history_item = f"{date_text} {content_text}".strip()
+                        elif current_section == '경력':
                             experience_list.append(history_item)
-                    
-                    next_sibling = next_sibling.find_next_sibling()
-        
-        print(f"        정적 HTML: 학력 {len(education_list)}개, 경력 {len(experience_list)}개 항목 수집")
-        
-        # Step 3: 더보기 버튼 확인 및 AJAX 데이터 추가 수집
-        more_button = soup.find('button', {'id': 'addCarBtn'}) or soup.find('a', {'id': 'addCarBtn'})
-        if more_button:
-            print(f"        더보기 버튼 발견, AJAX 추가 데이터 수집 시작...")
-            
-            # doctor_id를 URL에서 추출 (예: /blog/01102/philosophy.do)
-            doctor_id = None
-            url_match = re.search(r'/blog/(\d+)/', detail_url)
-            if url_match:
-                doctor_id = url_match.group(1)
-            else:
-                # JavaScript 변수에서 추출 시도
-                dr_cd_match = re.search(r'var\s+dr_cd\s*=\s*["\'](\d+)["\']', response.text)
-                if dr_cd_match:
-                    doctor_id = dr_cd_match.group(1)
-            
-            if doctor_id:
-                print(f"        Doctor ID: {doctor_id}")
-                
-                # totalCareerCount 추출해서 전체 데이터 가져오기
-                total_count_match = re.search(r'var\s+totalCareerCount\s*=\s*(\d+)', response.text)
-                total_count = int(total_count_match.group(1)) if total_count_match else 100
-                
-                # AJAX로 전체 경력 정보 가져오기
-                ajax_url = f"https://www.snuh.org/m/blog/{doctor_id}/ajaxMobileCareer.do"
-                params = {'firstIndex': '0', 'lastIndex': str(total_count)}
-                
-                ajax_response = requests.get(ajax_url, headers=headers, params=params, timeout=15)
-                ajax_response.raise_for_status()
-                
-                if ajax_response.text.strip():
-                    try:
-                        ajax_data = ajax_response.json()
-                        
-                        # AJAX 데이터에서 추가 학력/경력 정보 추출
-                        ajax_education_list = []
-                        ajax_experience_list = []
-                        current_section = None
-                        
-                        print(f"        AJAX: 총 {len(ajax_data)}개의 항목 처리 중...")
-                        
-                        for item in ajax_data:
-                            gubun = item.get('gubun', '')
-                            content = item.get('content') or ''  # None일 경우 빈 문자열로 처리
-                            sdate = item.get('sdate') or ''      # None일 경우 빈 문자열로 처리
-                            
-                            content = content.strip() if content else ''
-                            sdate = sdate.strip() if sdate else ''
-                            
-                            if gubun == 'TITLE':
-                                if '학력' in content:
-                                    current_section = '학력'
-                                elif '경력' in content:
-                                    current_section = '경력'
-                                else:
-                                    current_section = '기타'  # 학회 등 기타 정보
-                            elif gubun == 'CAR' and current_section in ['학력', '경력']:
-                                # CAR은 주로 경력 정보
-                                if content and current_section:
-                                    history_item = f"{sdate} {content}" if sdate else content
-                                    if current_section == '학력':
-                                        ajax_education_list.append(history_item)
-                                    elif current_section == '경력':
-                                        ajax_experience_list.append(history_item)
-                            elif gubun == 'EDU' and current_section == '학력':
-                                # EDU는 학력 정보
-                                if content:
-                                    history_item = f"{sdate} {content}" if sdate else content
-                                    ajax_education_list.append(history_item)
-                        
-                        # 기존 리스트와 AJAX 리스트 합치기 (중복 제거)
-                        all_education = education_list + [item for item in ajax_education_list if item not in education_list]
-                        all_experience = experience_list + [item for item in ajax_experience_list if item not in experience_list]
-                        
-                        education_list = all_education
-                        experience_list = all_experience
-                        
-                        print(f"        AJAX 추가: 학력 {len(ajax_education_list)}개, 경력 {len(ajax_experience_list)}개 항목")
-                        
-                    except json.JSONDecodeError:
-                        print(f"        AJAX JSON 파싱 실패")
-                else:
-                    print(f"        AJAX 응답 데이터 없음")
+
+    else:
+        # career 섹션이 없는 경우 기존 방식으로 시도
+        print(f"        [DEBUG] career 섹션 없음, 기존 방식으로 시도")
+
+        # 학력 섹션 찾기
+        edu_h3 = soup.find('h3', string=lambda text: text and '학력' in text)
+        if edu_h3:
+            # 다음 ul 또는 형제 요소들에서 li 찾기
+            next_sibling = edu_h3.find_next_sibling()
+            while next_sibling:
+                if next_sibling.name == 'h3' and '경력' in next_sibling.get_text():
+                    break
+                if next_sibling.name == 'li' and 'blogCont-history-item' in (next_sibling.get('class') or []):
+                    date_p = next_sibling.find('p', class_='blogCont-history-date')
+                    content_p = next_sibling.find('p', class_='blogCont-history-content')
+
+                    date_text = date_p.get_text(strip=True) if date_p else ''
+                    content_text = content_p.get_text(strip=True) if content_p else ''
+
+                    if content_text:
+                        history_item = f"{date_text} {content_text}".strip()
+                        education_list.append(history_item)
+
+                next_sibling = next_sibling.find_next_sibling()
+
+        # 경력 섹션 찾기
+        exp_h3 = soup.find('h3', string=lambda text: text and '경력' in text)
+        if exp_h3:
+            next_sibling = exp_h3.find_next_sibling()
+            while next_sibling:
+                if next_sibling.name == 'h3':
+                    break
+                if next_sibling.name == 'li' and 'blogCont-history-item' in (next_sibling.get('class') or []):
+                    date_p = next_sibling.find('p', class_='blogCont-history-date')
+                    content_p = next_sibling.find('p', class_='blogCont-history-content')
+
+                    date_text = date_p.get_text(strip=True) if date_p else ''
+                    content_text = content_p.get_text(strip=True) if content_p else ''
+
+                    if content_text:
+                        history_item = f"{date_text} {content_text}".strip()
+                        experience_list.append(history_item)
+
+                next_sibling = next_sibling.find_next_sibling()
+
+    more_button = soup.find('button', {'id': 'addCarBtn'}) or soup.find('a', {'id': 'addCarBtn'})
+    dr_cd_match = re.search(r'var\s+dr_cd\s*=\s*["\'](\d+)["\']', page_text)
+    total_count_match = re.search(r'var\s+totalCareerCount\s*=\s*(\d+)', page_text)
+    return {
+        '학력': education_list,
+        '경력': experience_list,
+        'has_more': more_button is not None,
+        'dr_cd': dr_cd_match.group(1) if dr_cd_match else None,
+        # totalCareerCount가 없으면 넉넉하게 100개를 요청
+        'total_count': int(total_count_match.group(1)) if total_count_match else 100,
+    }
+
+@timed('snuh.career_ajax')
+def parse_career_ajax(body):
+    """ajaxMobileCareer.do 응답(JSON bytes)에서 학력/경력 목록을 추출합니다."""
+    ajax_data = json.loads(body)
+    
+    # AJAX 데이터에서 추가 학력/경력 정보 추출
+    ajax_education_list = []
+    ajax_experience_list = []
+    current_section = None
+    
+    for item in ajax_data:
+        gubun = item.get('gubun', '')
+        content = item.get('content') or ''  # None일 경우 빈 문자열로 처리
+        sdate = item.get('sdate') or ''      # None일 경우 빈 문자열로 처리
+
+        content = content.strip() if content else ''
+        sdate = sdate.strip() if sdate else ''
+
+        if gubun == 'TITLE':
+            if '학력' in content:
+                current_section = '학력'
+            elif '경력' in content:
+                current_section = '경력'
             else:
-                print(f"        Doctor ID를 찾을 수 없음")
+                current_section = '기타'  # 학회 등 기타 정보
+        elif gubun == 'CAR' and current_section in ['학력', '경력']:
+            # CAR은 주로 경력 정보
+            if content and current_section:
+                history_item = f"{sdate} {content}" if sdate else content
+                if current_section == '학력':
+                    ajax_education_list.append(history_item)
+                elif current_section == '경력':
+                    ajax_experience_list.append(history_item)
+        elif gubun == 'EDU' and current_section == '학력':
+            # EDU는 학력 정보
+            if content:
+                history_item = f"{sdate} {content}" if sdate else content
+                ajax_education_list.append(history_item)
+
+    return ajax_education_list, ajax_experience_list
+
+def merge_careers(static_list, ajax_list):
+    """정적 HTML 목록 뒤에 AJAX 목록 중 아직 없는 항목만 순서대로 이어 붙입니다. (집합으로 확인해 항목 수에 비례)"""
+    seen = set(static_list)
+    return static_list + [item for item in ajax_list if item not in seen]
+
+def _detail_link(doctor):
+    """(내부 헬퍼 함수) 목록 행의 상세정보링크 (링크가 없으면 None)"""
+    link = doctor.get('상세정보링크')
+    return link if link and link != "링크 없음" else None
+
+def doctor_key(doctor):
+    """
+    3단계 상세 수집 단위를 구분하는 의료진 키 (상세정보링크|소속진료과)
+    - 상세정보링크는 진료과와 상관없이 같으므로 진료과를 붙여 부서 행마다 증분 상태가 덮어써지지 않게 함
+    """
+    link = _detail_link(doctor)
+    return f"{link}|{doctor.get('소속진료과', '')}" if link else None
+
+def blog_doctor_id(detail_url):
+    """상세정보링크(예: /blog/01102/philosophy.do)에서 의사 ID를 추출합니다. (없으면 None)"""
+    url_match = re.search(r'/blog/(\d+)/', detail_url or '')
+    return url_match.group(1) if url_match else None
+
+def detail_key(doctor):
+    """여러 진료과에 소속된 같은 의사를 묶는 키 (상세정보링크의 블로그 의사 ID, 없으면 링크 전체)"""
+    link = _detail_link(doctor)
+    return blog_doctor_id(link) or link
+
+def fetch_career_ajax(doctor_id, headers, total_count=AJAX_CAREER_LIMIT):
+    """
+    ajaxMobileCareer.do에서 전체 학력/경력을 가져옵니다.
+    - 반환: (학력 목록, 경력 목록), 응답이 비었거나 JSON이 아니면 None
+    """
+    ajax_url = f"https://www.snuh.org/m/blog/{doctor_id}/ajaxMobileCareer.do"
+    params = {'firstIndex': '0', 'lastIndex': str(total_count)}
+    ajax_response = fetch('GET', ajax_url, headers=headers, params=params, timeout=15)
+    ajax_response.raise_for_status()
+    if not ajax_response.content.strip():
+        print(f"        AJAX 응답 데이터 없음")
+        return None
+    try:
+        return parse_career_ajax(ajax_response.content)
+    except json.JSONDecodeError:
+        print(f"        AJAX JSON 파싱 실패")
+        return None
+
+def fetch_career_html(detail_url, headers):
+    """블로그 상세 페이지 HTML을 파싱하고, 더보기 버튼이 있으면 AJAX 목록을 합쳐 (학력 목록, 경력 목록)을 반환합니다."""
+    # Step 1: 메인 페이지에서 기본 정보 수집
+    response = fetch('GET', detail_url, headers=headers, timeout=15)
+    response.raise_for_status()
+
+    # Step 2: 먼저 정적 HTML에서 기본 학력/경력 정보 수집
+    career = parse_career_html(response.content)
+    education_list = career['학력']
+    experience_list = career['경력']
+
+    print(f"        정적 HTML: 학력 {len(education_list)}개, 경력 {len(experience_list)}개 항목 수집")
+
+    # Step 3: 더보기 버튼 확인 및 AJAX 데이터 추가 수집
+    if career['has_more']:
+        print(f"        더보기 버튼 발견, AJAX 추가 데이터 수집 시작...")
+
+        # doctor_id를 URL에서 추출 (예: /blog/01102/philosophy.do), 없으면 JavaScript 변수 사용
+        doctor_id = blog_doctor_id(detail_url) or career['dr_cd']
+
+        if doctor_id:
+            print(f"        Doctor ID: {doctor_id}")
+            ajax_lists = fetch_career_ajax(doctor_id, headers, career['total_count'])
+            if ajax_lists:
+                ajax_education_list, ajax_experience_list = ajax_lists
+
+                # 기존 리스트와 AJAX 리스트 합치기 (중복 제거)
+                education_list = merge_careers(education_list, ajax_education_list)
+                experience_list = merge_careers(experience_list, ajax_experience_list)
+
+                print(f"        AJAX 추가: 학력 {len(ajax_education_list)}개, 경력 {len(ajax_experience_list)}개 항목")
         else:
-            print(f"        더보기 버튼 없음, 정적 데이터만 사용")
-        
+            print(f"        Doctor ID를 찾을 수 없음")
+    else:
+        print(f"        더보기 버튼 없음, 정적 데이터만 사용")
+    return education_list, experience_list
+
+def fetch_doctor_details(detail_url, headers, ajax_first=True):
+    """
+    의료진 상세 페이지에서 학력/경력 정보를 추출하는 함수
+    - ajax_first=True: 상세정보링크에 의사 ID가 있으면 HTML 페이지 없이 ajaxMobileCareer.do JSON만 요청
+      (요청 1번, HTML 파싱 없음). ID가 없거나 AJAX 응답이 비었거나 실패하면 HTML 페이지 방식으로 다시 수집
+    - ajax_first=False: 항상 HTML 페이지를 파싱하고 더보기 버튼이 있을 때만 AJAX 목록을 합침 (기존 방식)
+    """
+    details = {"학력": "정보 없음", "경력": "정보 없음"}
+    if not detail_url or "javascript" in detail_url or detail_url == "링크 없음":
+        return details
+
+    try:
+        career_lists = None
+        doctor_id = blog_doctor_id(detail_url) if ajax_first else None
+        if doctor_id:
+            try:
+                # AJAX 요청이 실패해도 HTML 페이지로 다시 수집하므로 작업을 요청 실패로 표시하지 않음
+                with allow_failure():
+                    career_lists = fetch_career_ajax(doctor_id, headers)
+            except requests.exceptions.RequestException as e:
+                print(f"        AJAX 요청 실패, HTML 페이지로 다시 수집: {e}")
+            if career_lists and not any(career_lists):
+                career_lists = None
+            if career_lists:
+                print(f"        AJAX: 학력 {len(career_lists[0])}개, 경력 {len(career_lists[1])}개 항목 수집")
+        education_list, experience_list = career_lists or fetch_career_html(detail_url, headers)
+
         # 최종 결과 설정
         details['학력'] = "\n".join(education_list) if education_list else "정보 없음"
         details['경력'] = "\n".join(experience_list) if experience_list else "정보 없음"
-        
+
         print(f"        최종: 학력 {len(education_list)}개, 경력 {len(experience_list)}개 항목")
-        
+
     except requests.exceptions.RequestException as e:
         print(f"        [Error] 네트워크 에러: {e}")
     except Exception as e:
         print(f"        [Error] 예상치 못한 에러: {e}")
-    
-    return details
 
+    return details
 
 
-if __name__ == "__main__":
+def main(argv=None):
+    """전체 수집을 실행하고 최종 저장한 의료진 수를 반환합니다. (crawl.py에서 병원별 프로세스로도 호출)"""
+    args = parse_args("서울대학교병원 의료진 크롤러", argv)
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36',
         'Referer': 'https://www.snuh.org/'
     }
     
+    file_name = '서울대학교병원_snuh'
+    fetch_details = lambda doc: fetch_doctor_details(doc['상세정보링크'], headers)
+    details_once = SingleFlight()
+    fetch_details = details_once.wrap(fetch_details, detail_key)
+    state = IncrementalState(file_name, args.max_age_days) if args.incremental else None
+    if state:
+        fetch_details = state.wrap(fetch_details, doctor_key)
+
+    def collect_details(doc):
+        details = fetch_details(doc)
+        # 목록 행은 그대로 두고 새 레코드로 반환 (결과를 파일에만 쓸 때 목록 쪽에 상세 정보가 쌓이지 않게 함)
+        return {**doc, '학력': details['학력'], '경력': details['경력']}
+
+    if args.queue_worker:
+        return serve_queue(file_name, 'snuh', args, collect_details)
+
     departments = get_snuh_department_codes()
     
     if departments:
-        all_doctors_list = []
         print("\n2단계: 각 부서별 의료진 목록 수집을 시작합니다...")
-        for i, dept in enumerate(departments):
-            print(f"  - ({i+1}/{len(departments)}) {dept['진료과명']} 의료진 목록 수집 중...")
-            doctors_in_dept = fetch_doctors_from_department(dept, headers)
-            if doctors_in_dept:
-                all_doctors_list.extend(doctors_in_dept)
+        results = run_stage("2단계", departments, lambda dept: fetch_doctors_from_department(dept, headers),
+                            label=lambda d: f"{d['진료과명']} 의료진 목록")
+        all_doctors_list = [doc for doctors_in_dept in results if doctors_in_dept for doc in doctors_in_dept]
         
         print(f"\n✅ 2단계 완료: 총 {len(all_doctors_list)}명의 의료진 목록을 수집했습니다.")
         
 
         print("\n3단계: 각 의료진의 상세 정보(학력/경력) 수집을 시작합니다...")
         
-        final_data = []
-        for i, doc in enumerate(all_doctors_list):
-            print(f"  - ({i+1}/{len(all_doctors_list)}) {doc['이름']} 의료진 상세 정보 수집 중...")
-            details = fetch_doctor_details(doc['상세정보링크'], headers)
+        checkpoint = Checkpoint(file_name, args.resume)
+        output = open_output(file_name, args)
+        queue = open_queue(file_name, args)
+        worker = queue.wrap(collect_details, doctor_key, all_doctors_list) if queue else collect_details
+        worker = defer_on_failure(worker)
+        worker = checkpoint.wrap(worker, doctor_key)
+        if output:
+            worker = output.wrap(worker)
+        parquet = open_parquet(file_name, 'snuh', args)
+        if parquet:
+            worker = parquet.wrap(worker)
+        store = open_store('snuh', args)
+        if store:
+            worker = store.wrap(worker)
+        if output:
+            # 결과 레코드는 파일에만 남기고 메모리에는 모으지 않음
+            worker = drop_records(worker)
+        final_data = [doc for doc in run_stage("3단계", all_doctors_list, worker, label=lambda d: d['이름']) if doc]
             
-            doc['학력'] = details['학력']
-            doc['경력'] = details['경력']
-            final_data.append(doc)
-            time.sleep(0.5)  # 요청 간격을 조금 늘림
+        if state:
+            state.save()
+        details_once.report()
             
         print(f"\n✅ 3단계 완료: 최종적으로 {len(final_data)}명의 상세 정보를 수집했습니다.")
 
-        file_name = '서울대학교병원_snuh'
-        save_to_json(final_data, file_name)
-        save_to_excel(final_data, file_name)
+        if parquet:
+            parquet.close()
+        if store:
+            store.close()
+        if output:
+            finish_output(output, file_name, args)
+        else:
+            save_to_json(final_data, file_name)
+        save_to_excel(output.path if output else final_data, file_name)
+        save_metrics(file_name, 'snuh', args)
+        checkpoint.finish()
+        return len(final_data)
     else:
-        print("수집할 부서 정보가 없습니다.")
\ No newline at end of file
+        print("수집할 부서 정보가 없습니다.")
+        return 0
+
+
+if __name__ == "__main__":
+    main()
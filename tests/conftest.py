@@ -0,0 +1,13 @@
+import pytest
+
+from utils import engine
+
+
+@pytest.fixture(autouse=True)
+def reset_task_state():
+    """테스트마다 작업 스레드의 요청 실패 표시를 지웁니다. (utils.engine의 스레드별 상태가 테스트 사이에 남지 않도록)"""
+    engine._local.failed = False
+    engine._local.defer = False
+    yield
+    engine._local.failed = False
+    engine._local.defer = False
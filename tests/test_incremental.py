@@ -0,0 +1,73 @@
+from utils.engine import mark_failed
+from utils.incremental import IncrementalState, no_error
+from utils.singleflight import SingleFlight
+
+
+def counting_fetch(result):
+    """호출 횟수를 세는 상세 수집 함수를 만듭니다."""
+    calls = []
+
+    def fetch_details(doctor):
+        calls.append(doctor['id'])
+        return dict(result)
+
+    return fetch_details, calls
+
+
+def key_fn(doctor):
+    return doctor['id']
+
+
+def test_single_flight_remembers_empty_profile():
+    fetch_details, calls = counting_fetch({})
+    wrapped = SingleFlight().wrap(fetch_details, key_fn, is_valid=no_error)
+    assert wrapped({'id': 'a', 'dept': '내과'}) == {}
+    assert wrapped({'id': 'a', 'dept': '외과'}) == {}
+    assert calls == ['a']
+
+
+def test_single_flight_retries_error_result():
+    fetch_details, calls = counting_fetch({'error': '상세 정보를 가져올 수 없습니다.'})
+    wrapped = SingleFlight().wrap(fetch_details, key_fn, is_valid=no_error)
+    wrapped({'id': 'a', 'dept': '내과'})
+    wrapped({'id': 'a', 'dept': '외과'})
+    assert calls == ['a', 'a']
+
+
+def test_single_flight_does_not_remember_failed_request():
+    calls = []
+
+    def fetch_details(doctor):
+        calls.append(doctor['id'])
+        mark_failed()
+        return {}
+
+    wrapped = SingleFlight().wrap(fetch_details, key_fn, is_valid=no_error)
+    wrapped({'id': 'a', 'dept': '내과'})
+    wrapped({'id': 'a', 'dept': '외과'})
+    assert calls == ['a', 'a']
+
+
+def test_incremental_state_reuses_empty_profile(tmp_path):
+    base_name = str(tmp_path / 'hospital')
+    doctor = {'id': 'a', 'name': '홍길동'}
+
+    fetch_details, calls = counting_fetch({})
+    state = IncrementalState(base_name)
+    assert state.wrap(fetch_details, key_fn, is_valid=no_error)(doctor) == {}
+    state.save()
+
+    state = IncrementalState(base_name)
+    assert state.wrap(fetch_details, key_fn, is_valid=no_error)(doctor) == {}
+    assert calls == ['a']
+    assert state.reused == 1
+
+
+def test_incremental_state_does_not_store_error_result(tmp_path):
+    base_name = str(tmp_path / 'hospital')
+    fetch_details, calls = counting_fetch({'error': '상세 정보를 가져올 수 없습니다.'})
+    for _ in range(2):
+        state = IncrementalState(base_name)
+        state.wrap(fetch_details, key_fn, is_valid=no_error)({'id': 'a'})
+        state.save()
+    assert calls == ['a', 'a']
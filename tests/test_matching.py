@@ -0,0 +1,63 @@
+from utils.matching import normalize_name, resolve
+
+
+def doctor(hospital, doctor_id, name, education, department='내과', snapshot='261018'):
+    return {'hospital': hospital, 'doctor_id': doctor_id, 'name': name, 'department': department,
+            'specialty': None, 'education': education, 'career': [], 'snapshot': snapshot}
+
+
+def clusters(results):
+    """(병원, doctor_id) 집합의 집합으로 클러스터를 비교하기 쉽게 바꿉니다."""
+    grouped = {}
+    for row in results:
+        grouped.setdefault(row['cluster_id'], set()).add((row['hospital'], row['doctor_id']))
+    return {frozenset(members) for members in grouped.values()}
+
+
+def test_same_doctor_at_two_hospitals_is_linked():
+    records = [
+        doctor('snuh', 'a', '홍길동 교수', ['서울대학교 의과대학 졸업', '서울대학교병원 내과 전공의']),
+        doctor('smc', 'b', '홍길동', ['서울대 의대 졸업', '서울대병원 내과 전공의']),
+    ]
+    results, stats = resolve(records)
+    assert clusters(results) == {frozenset({('snuh', 'a'), ('smc', 'b')})}
+    assert stats['multi_hospital_clusters'] == 1
+    assert all(row['confidence'] >= 0.5 for row in results)
+
+
+def test_namesakes_with_different_education_stay_apart():
+    records = [
+        doctor('snuh', 'a', '김철수', ['서울대학교 의과대학 졸업'], department='외과'),
+        doctor('ys', 'b', '김철수', ['연세대학교 의과대학 졸업'], department='안과'),
+    ]
+    results, stats = resolve(records)
+    assert len(clusters(results)) == 2
+    assert stats['multi_hospital_clusters'] == 0
+
+
+def test_snapshots_of_one_doctor_are_one_entity():
+    records = [
+        doctor('snuh', 'a', '홍길동', ['서울대 졸업'], snapshot='261001'),
+        doctor('snuh', 'a', '홍길동', ['서울대 졸업'], snapshot='261018'),
+    ]
+    results, stats = resolve(records)
+    assert stats['doctors'] == 1
+    assert results[0]['snapshots'] == ['261001', '261018']
+    assert results[0]['confidence'] == 1.0
+
+
+def test_normalize_name():
+    assert normalize_name('홍 길동 교수(내과)') == '홍길동'
+    assert normalize_name('ＨＯＮＧ') == 'hong'
+
+
+def test_namesakes_at_one_hospital_are_not_merged():
+    """같은 병원의 동명이인은 학력/진료과가 같아도 다른 사람"""
+    records = [
+        doctor('snuh', 'a', '이영희', ['서울대학교 의과대학 졸업']),
+        doctor('snuh', 'b', '이영희', ['서울대학교 의과대학 졸업']),
+        doctor('smc', 'c', '이영희', ['서울대 의대 졸업']),
+    ]
+    results, stats = resolve(records)
+    assert stats['candidate_pairs'] == 2
+    assert not any({('snuh', 'a'), ('snuh', 'b')} <= cluster for cluster in clusters(results))
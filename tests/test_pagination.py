@@ -0,0 +1,117 @@
+import pytest
+import requests
+
+from utils.engine import fetch_failed
+from utils.pagination import fetch_pages, page_count, page_count_from_links
+
+
+def make_site(pages, total=None, wrap=False, errors=()):
+    """페이지 번호 -> 항목 리스트 목록 사이트와 요청한 페이지 번호 기록을 만듭니다."""
+    requested = []
+
+    def fetch_page(page):
+        requested.append(page)
+        if page in errors:
+            raise requests.exceptions.ConnectionError(f"{page}페이지 연결 실패")
+        if page > len(pages):
+            # 마지막 페이지를 넘기면 빈 페이지 또는 첫 페이지를 다시 보여주는 사이트
+            return pages[0] if wrap else []
+        return pages[page - 1]
+
+    def parse_page(items):
+        return items, total
+
+    return fetch_page, parse_page, requested
+
+
+def test_known_total_requests_every_page_once():
+    pages = [[1, 2, 3], [4, 5, 6], [7]]
+    fetch_page, parse_page, requested = make_site(pages, total=3)
+    assert fetch_pages(fetch_page, parse_page) == [1, 2, 3, 4, 5, 6, 7]
+    assert sorted(requested) == [1, 2, 3]
+
+
+def test_unknown_total_stops_at_short_page():
+    pages = [[1, 2, 3], [4, 5, 6], [7]]
+    fetch_page, parse_page, requested = make_site(pages)
+    assert fetch_pages(fetch_page, parse_page) == [1, 2, 3, 4, 5, 6, 7]
+    assert requested == [1, 2, 3]
+
+
+def test_unknown_total_stops_at_empty_page():
+    pages = [[1, 2], [3, 4]]
+    fetch_page, parse_page, requested = make_site(pages)
+    assert fetch_pages(fetch_page, parse_page) == [1, 2, 3, 4]
+    assert requested == [1, 2, 3]
+
+
+def test_unknown_total_stops_when_site_wraps_to_first_page():
+    pages = [[1, 2], [3, 4]]
+    fetch_page, parse_page, requested = make_site(pages, wrap=True)
+    assert fetch_pages(fetch_page, parse_page) == [1, 2, 3, 4]
+    assert requested == [1, 2, 3]
+
+
+def test_unknown_total_respects_max_pages():
+    pages = [[i] for i in range(1, 11)]
+    fetch_page, parse_page, requested = make_site(pages)
+    assert fetch_pages(fetch_page, parse_page, max_pages=4) == [1, 2, 3, 4]
+    assert requested == [1, 2, 3, 4]
+
+
+def test_empty_first_page_returns_nothing():
+    fetch_page, parse_page, requested = make_site([[]], total=5)
+    assert fetch_pages(fetch_page, parse_page) == []
+    assert requested == [1]
+
+
+def test_first_page_error_is_raised():
+    fetch_page, parse_page, _ = make_site([[1], [2]], total=2, errors={1})
+    with pytest.raises(requests.exceptions.ConnectionError):
+        fetch_pages(fetch_page, parse_page)
+
+
+def test_failed_later_page_is_skipped_and_marks_task_failed():
+    pages = [[1, 2], [3, 4], [5]]
+    fetch_page, parse_page, _ = make_site(pages, total=3, errors={2})
+    assert fetch_pages(fetch_page, parse_page) == [1, 2, 5]
+    assert fetch_failed()
+
+
+def test_broken_later_page_is_skipped():
+    def parse_page(body):
+        if body == 'broken':
+            raise KeyError('list')
+        return body, 3
+
+    bodies = {1: [1], 2: 'broken', 3: [3]}
+    assert fetch_pages(bodies.get, parse_page) == [1, 3]
+    assert fetch_failed()
+
+
+def test_page_count_from_links():
+    html = '<a href="?pageIndex=2">2</a><a href="javascript:fn_link_page(7)">끝</a>'
+    assert page_count_from_links(html, 'pageIndex') == 7
+    assert page_count_from_links(b'<div>no links</div>', 'pageIndex') is None
+
+
+def test_page_count_uses_size_the_server_returned():
+    # pagePerNum=100으로 요청했지만 서버가 50명씩만 보내면 페이지는 2개가 아니라 4개
+    assert page_count(180, list(range(50))) == 4
+    assert page_count(180, list(range(100))) == 2
+    assert page_count(0, []) == 0
+
+
+def test_capped_server_pages_are_all_fetched():
+    doctors = list(range(180))
+    requested = []
+
+    def fetch_page(page):
+        requested.append(page)
+        return doctors[(page - 1) * 50:page * 50]
+
+    def parse_page(items):
+        return items, page_count(len(doctors), items)
+
+    assert fetch_pages(fetch_page, parse_page) == doctors
+    assert sorted(requested) == [1, 2, 3, 4]
@@ -0,0 +1,43 @@
+from utils.records import normalize_record, snapshot_info
+
+
+def test_doctor_id_prefers_hospital_id_over_url():
+    record = {'이름': '홍길동', '소속부서': '내과', 'drNo': '123', '상세정보URL': 'https://x/detail?dept=IM&id=123'}
+    assert normalize_record('cmc', record)['doctor_id'] == '123'
+
+
+def test_doctor_id_skips_placeholders():
+    record = {'이름': '홍길동', 'profNo': '정보 없음', 'empNo': 'E1'}
+    assert normalize_record('ys', record)['doctor_id'] == 'E1'
+
+
+def test_doctor_id_falls_back_to_url_then_name_and_department():
+    assert normalize_record('snuh', {'이름': '홍길동', '상세정보링크': '/blog/01102/philosophy.do'})['doctor_id'] \
+        == '/blog/01102/philosophy.do'
+    assert normalize_record('amc', {'name': '홍길동', 'department': '내과'})['doctor_id'] == '홍길동|내과'
+
+
+def test_education_and_career_become_lists():
+    record = {'이름': '홍길동', 'profile': {'학력': ['서울대 졸업', '정보 없음'], '경력': '내과 전공의\n\n교수'}}
+    normalized = normalize_record('smc', record)
+    assert normalized['education'] == ['서울대 졸업']
+    assert normalized['career'] == ['내과 전공의', '교수']
+    nested = normalize_record('ys', {'nm': '홍길동', '학력및경력': {'학력': '연세대 졸업', '경력': '정보 없음'}})
+    assert nested['education'] == ['연세대 졸업']
+    assert nested['career'] == []
+
+
+def test_snapshot_info():
+    assert snapshot_info('서울대학교병원_snuh_crawling_261018.jsonl.gz') == ('snuh', '261018')
+    assert snapshot_info('분당서울대학교병원_의료진_crawling_261018.json') == ('snubh', '261018')
+    assert snapshot_info('notes.txt') == (None, None)
+
+
+def test_doctor_id_ignores_department_specific_urls():
+    """부서 파라미터가 들어 있는 상세 URL 대신 병원별 의사 ID를 사용 (여러 부서 행이 한 의료진이 되도록)"""
+    snubh = [{'이름': '홍길동', '상세정보URL': f'https://www.snubh.org/medical/drIntroduce.do?sDpCdDtl={dept}&sDrSid=777',
+              'sDrSid': '777'} for dept in ('IM', 'GS')]
+    assert {normalize_record('snubh', record)['doctor_id'] for record in snubh} == {'777'}
+    smc = [{'이름': '홍길동', '소속': dept, '상세정보URL': 'https://www.samsunghospital.com/dr?DR_NO=42', 'DR_NO': '42'}
+           for dept in ('내과', '외과')]
+    assert {normalize_record('smc', record)['doctor_id'] for record in smc} == {'42'}
@@ -0,0 +1,219 @@
+import threading
+
+import pytest
+
+from utils.engine import defer_on_failure, mark_failed, run_stage, stats
+from utils.workqueue import WorkQueue
+
+
+def key_fn(item):
+    return item.get('id')
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'queue.sqlite'), 'test')
+    yield queue
+    queue.close()
+
+
+def test_push_ignores_duplicates_and_rows_without_key(queue):
+    items = [{'id': 'a'}, {'id': 'b'}, {'name': '키 없음'}]
+    assert queue.push(items, key_fn) == 2
+    assert queue.push(items, key_fn) == 0
+    assert queue.counts() == {'pending': 2}
+
+
+def test_claim_state_machine(queue):
+    item = {'id': 'a'}
+    queue.push([item], key_fn)
+    key = queue.item_key(item, key_fn)
+    assert queue.claim('없는 키') == ('missing', None)
+    assert queue.claim(key) == ('leased', None)
+    assert queue.claim(key) == ('busy', None)
+    queue.complete(key, {'id': 'a', 'profile': '결과'})
+    assert queue.claim(key) == ('done', {'id': 'a', 'profile': '결과'})
+
+
+def test_fail_retries_until_max_attempts(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'queue.sqlite'), 'test', max_attempts=2)
+    queue.push([{'id': 'a'}], key_fn)
+    key = queue.item_key({'id': 'a'}, key_fn)
+    for _ in range(2):
+        assert queue.claim(key) == ('leased', None)
+        queue.fail(key, '연결 실패')
+    assert queue.claim(key) == ('failed', '연결 실패')
+    assert queue.counts() == {'failed': 1}
+    queue.close()
+
+
+def test_expired_lease_is_taken_again(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'queue.sqlite'), 'test', lease_seconds=0)
+    queue.push([{'id': 'a'}], key_fn)
+    assert [key for key, _ in queue.lease(10)] == [queue.item_key({'id': 'a'}, key_fn)]
+    # 임대 시간이 지났으므로(프로세스 종료 등) 다른 프로세스가 다시 가져감
+    assert len(queue.lease(10)) == 1
+    queue.close()
+
+
+def test_wrap_processes_each_item_once_in_input_order(queue):
+    items = [{'id': 'a'}, {'id': 'b'}, {'name': '키 없음'}]
+    calls = []
+
+    def worker(item):
+        calls.append(item.get('id'))
+        return {**item, 'profile': 'ok'}
+
+    wrapped = queue.wrap(worker, key_fn, items)
+    assert [wrapped(item) for item in items] == [{**item, 'profile': 'ok'} for item in items]
+    # 이미 끝난 작업은 다시 처리하지 않고 저장된 결과를 반환
+    assert wrapped(items[0]) == {'id': 'a', 'profile': 'ok'}
+    assert calls == ['a', 'b', None]
+    assert queue.counts() == {'done': 2}
+
+
+def test_wrap_retries_worker_errors_then_raises(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'queue.sqlite'), 'test', max_attempts=2)
+    calls = []
+
+    def worker(item):
+        calls.append(item['id'])
+        raise ValueError('파싱 실패')
+
+    wrapped = queue.wrap(worker, key_fn, [{'id': 'a'}])
+    with pytest.raises(RuntimeError):
+        wrapped({'id': 'a'})
+    assert calls == ['a', 'a']
+    assert queue.counts() == {'failed': 1}
+    queue.close()
+
+
+def test_serve_processes_sealed_queue_and_exits(queue):
+    queue.push([{'id': 'a'}, {'id': 'b'}], key_fn)
+    queue.seal()
+    assert queue.serve(lambda item: {**item, 'profile': 'ok'}, concurrency=2) == 2
+    assert queue.counts() == {'done': 2}
+
+
+def test_wrap_uses_result_of_another_worker(tmp_path):
+    path = str(tmp_path / 'queue.sqlite')
+    producer = WorkQueue(path, 'test')
+    wrapped = producer.wrap(lambda item: pytest.fail('직접 처리하면 안 됨'), key_fn, [{'id': 'a'}])
+    key = producer.item_key({'id': 'a'}, key_fn)
+
+    # 다른 프로세스(작업자)가 먼저 임대한 작업은 끝날 때까지 기다렸다가 그 결과를 사용
+    other = WorkQueue(path, 'test')
+    assert other.lease(1) == [(key, {'id': 'a'})]
+    timer = threading.Timer(0.2, other.complete, (key, {'id': 'a', 'profile': '작업자'}))
+    timer.start()
+    assert wrapped({'id': 'a'}) == {'id': 'a', 'profile': '작업자'}
+    timer.join()
+    other.close()
+    producer.close()
+
+
+def serve_in_thread(queue, worker):
+    """작업자(serve)를 다른 스레드에서 실행하고 (스레드, 처리 수 결과)를 반환합니다."""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(queue.serve(worker, concurrency=1)), daemon=True)
+    thread.start()
+    return thread, result
+
+
+def test_serve_waits_for_leases_of_crashed_process(tmp_path):
+    path = str(tmp_path / 'queue.sqlite')
+    crashed = WorkQueue(path, 'test', lease_seconds=0.5)
+    crashed.push([{'id': 'a'}], key_fn)
+    crashed.seal()
+    # 작업을 임대한 프로세스가 결과를 기록하지 못하고 죽음
+    assert len(crashed.lease(1)) == 1
+    crashed.close()
+
+    worker = WorkQueue(path, 'test')
+    thread, result = serve_in_thread(worker, lambda item: {**item, 'profile': 'ok'})
+    thread.join(10)
+    assert result == [1]
+    assert worker.counts() == {'done': 1}
+    worker.close()
+
+
+def test_serve_gives_up_expired_lease_after_max_attempts(tmp_path):
+    path = str(tmp_path / 'queue.sqlite')
+    crashed = WorkQueue(path, 'test', lease_seconds=0, max_attempts=1)
+    crashed.push([{'id': 'a'}], key_fn)
+    crashed.seal()
+    assert len(crashed.lease(1)) == 1
+    crashed.close()
+
+    worker = WorkQueue(path, 'test', max_attempts=1)
+    assert worker.serve(lambda item: pytest.fail('시도 횟수를 다 쓴 작업')) == 0
+    assert worker.counts() == {'failed': 1}
+    worker.close()
+
+
+def test_serve_started_before_reset_waits_for_new_run(tmp_path):
+    path = str(tmp_path / 'queue.sqlite')
+    producer = WorkQueue(path, 'test')
+    previous = producer.wrap(lambda item: {**item, 'run': 1}, key_fn, [{'id': 'old'}])
+    previous({'id': 'old'})
+
+    # 이전 실행이 끝나 닫혀 있는 큐에서 작업자를 먼저 띄움
+    worker = WorkQueue(path, 'test')
+    thread, result = serve_in_thread(worker, lambda item: {**item, 'run': 2})
+    thread.join(1)
+    assert thread.is_alive()
+
+    producer.reset()
+    producer.push([{'id': 'new'}], key_fn)
+    producer.seal()
+    thread.join(10)
+    assert result == [1]
+    assert producer.claim(producer.item_key({'id': 'new'}, key_fn)) == ('done', {'id': 'new', 'run': 2})
+    worker.close()
+    producer.close()
+
+
+def failing_worker(calls):
+    """요청이 재시도 후에도 실패해 자리표시 레코드를 돌려주는 3단계 작업 함수"""
+    def worker(item):
+        calls.append(item['id'])
+        mark_failed()
+        return {**item, '학력': '정보 없음'}
+    return worker
+
+
+def test_failed_request_in_wrap_is_retried_and_counted_as_failed(queue):
+    items = [{'id': 'a'}, {'id': 'b'}]
+    calls = []
+
+    def worker(item):
+        if item['id'] == 'a':
+            return failing_worker(calls)(item)
+        calls.append(item['id'])
+        return {**item, '학력': '서울대 졸업'}
+
+    wrapped = defer_on_failure(queue.wrap(worker, key_fn, items))
+    before = stats()['dead_letters']
+    results = run_stage("큐 테스트", items, wrapped, concurrency=1)
+    # 단계 끝 재시도에서 저장된 자리표시 결과를 쓰지 않고 실제로 다시 요청
+    assert calls.count('a') == 2
+    assert stats()['dead_letters'] - before == 1
+    assert results[1] == {'id': 'b', '학력': '서울대 졸업'}
+    assert queue.claim(queue.item_key(items[0], key_fn))[0] != 'done'
+
+
+def test_serve_does_not_complete_failed_request(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'queue.sqlite'), 'test', max_attempts=2)
+    queue.push([{'id': 'a'}], key_fn)
+    queue.seal()
+    calls = []
+    assert queue.serve(failing_worker(calls), concurrency=1) == 0
+    assert calls == ['a', 'a']
+    assert queue.counts() == {'failed': 1}
+
+    # 작업을 등록한 프로세스도 자리표시 결과를 받지 않고 최종 실패로 셈
+    before = stats()['dead_letters']
+    wrapped = defer_on_failure(queue.wrap(lambda item: pytest.fail('시도 횟수를 다 쓴 작업'), key_fn, [{'id': 'a'}]))
+    assert run_stage("큐 테스트", [{'id': 'a'}], wrapped, concurrency=1) == [None]
+    assert stats()['dead_letters'] - before == 1
+    queue.close()
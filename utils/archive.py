@@ -0,0 +1,214 @@
+import atexit
+import glob
+import gzip
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from urllib.parse import urlparse
+
+import requests
+
+from utils.cache import cache_key, to_response
+
+# zstd 압축은 zstandard 패키지가 있을 때만 사용, 없으면 gzip으로 저장
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULT_ARCHIVE_DIR = 'crawl_archive'
+# 브라우저로 렌더링한 페이지(ajou 부서 목록)는 HTTP 메서드 대신 이 이름으로 보관
+RENDER_METHOD = 'RENDER'
+
+
+def default_run():
+    """보관본 이름 기본값 (오늘 날짜 'yymmdd', crawl.py로 여러 병원을 동시에 실행해도 같은 보관본에 모임)"""
+    return datetime.now().strftime('%y%m%d')
+
+
+def _compress(body):
+    """(내부 헬퍼 함수) 응답 본문을 압축하고 (압축된 bytes, 확장자)를 반환합니다."""
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=10).compress(body), '.zst'
+    return gzip.compress(body, compresslevel=6), '.gz'
+
+
+def _decompress(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError("zstd로 압축된 보관본을 읽으려면 'pip install zstandard'가 필요합니다.")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class ResponseArchive:
+    """
+    수집한 응답 원본을 실행(run)별로 보관하는 WARC 형식 비슷한 보관소
+    - 응답 본문은 SHA-256으로 이름 붙인 압축 파일('blobs/ab/<sha256>.zst', zstandard가 없으면 .gz)로 한 번만 저장
+      (실행이 달라도 내용이 같은 페이지는 파일 하나를 함께 씀)
+    - 요청별 기록(요청 키, 메서드, URL, 상태 코드, 헤더, 본문 해시, 수집 시각)은 'runs/<run>/index-<pid>.jsonl'에 한 줄씩 추가
+      (crawl.py가 병원마다 띄운 프로세스가 서로 다른 파일에 쓰므로 잠금이 필요 없음)
+    - replay=True이면 그 실행의 기록을 모두 읽어 두고, 같은 요청에 보관된 응답을 돌려줌 (같은 요청이 여러 번이면 마지막 응답)
+    """
+
+    def __init__(self, directory, run, replay=False):
+        self.directory = directory
+        self.run = run
+        self.replay = replay
+        self.run_dir = os.path.join(directory, 'runs', run)
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._file = None
+
+        if replay:
+            paths = sorted(glob.glob(os.path.join(self.run_dir, 'index-*.jsonl')), key=os.path.getmtime)
+            if not paths:
+                raise FileNotFoundError(f"보관본 '{self.run_dir}'이 없습니다. 먼저 --archive로 수집하세요.")
+            for path in paths:
+                with open(path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except json.JSONDecodeError:
+                            # 기록 도중 끊긴 마지막 줄은 버림
+                            continue
+                        self.entries[entry['key']] = entry
+            self.info = self._read_info()
+            return
+
+        os.makedirs(self.run_dir, exist_ok=True)
+        info_path = os.path.join(self.run_dir, 'run.json')
+        if not os.path.exists(info_path):
+            with open(info_path, 'w', encoding='utf-8') as f:
+                json.dump({'run': run, 'date': datetime.now().strftime('%y%m%d'),
+                           'started_at': datetime.now().isoformat(timespec='seconds')}, f, ensure_ascii=False)
+        self.info = self._read_info()
+        self._file = open(os.path.join(self.run_dir, f'index-{os.getpid()}.jsonl'), 'a', encoding='utf-8')
+
+    def _read_info(self):
+        try:
+            with open(os.path.join(self.run_dir, 'run.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {'run': self.run}
+
+    def _blob_path(self, digest, suffix):
+        return os.path.join(self.directory, 'blobs', digest[:2], digest + suffix)
+
+    def _store_blob(self, body):
+        """(내부 헬퍼 함수) 본문을 한 번만 저장하고 (SHA-256, 압축 확장자)를 반환합니다."""
+        digest = hashlib.sha256(body).hexdigest()
+        for suffix in ('.zst', '.gz'):
+            if os.path.exists(self._blob_path(digest, suffix)):
+                return digest, suffix
+        data, suffix = _compress(body)
+        path = self._blob_path(digest, suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 다른 스레드/프로세스가 같은 본문을 동시에 저장해도 깨진 파일이 보이지 않도록 임시 파일에 쓰고 이름 변경
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return digest, suffix
+
+    def put(self, key, method, url, response):
+        """최종 응답(Response) 하나를 보관합니다. (재시도 끝에 받은 에러 응답도 그대로 보관해 재파싱 때 같은 결과가 나오게 함)"""
+        body = response.content or b''
+        digest, suffix = self._store_blob(body)
+        line = json.dumps({
+            'key': key, 'method': method.upper(), 'url': url, 'host': urlparse(url).netloc,
+            'status': response.status_code, 'headers': dict(response.headers), 'sha256': digest,
+            'blob': suffix, 'size': len(body), 'fetched_at': datetime.now().isoformat(timespec='seconds'),
+        }, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def get(self, key):
+        """보관된 응답을 utils.cache.to_response()로 복원할 수 있는 딕셔너리로 반환합니다. 없으면 None."""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        body = _decompress(self._blob_path(entry['sha256'], entry['blob']))
+        return {'url': entry['url'], 'status': entry['status'], 'headers': entry['headers'], 'body': body}
+
+    def response(self, key, url):
+        """
+        (재파싱) 보관된 응답을 Response로 반환합니다.
+        - 보관본에 없는 요청은 네트워크로 보내지 않고 연결 에러로 처리 (수집 때 에러로 끝났던 요청과 같은 결과)
+        """
+        entry = self.get(key)
+        if entry is None:
+            raise requests.exceptions.ConnectionError(f"보관본 '{self.run}'에 없는 요청입니다: {url}")
+        return to_response(entry)
+
+    def put_page(self, url, html):
+        """브라우저로 렌더링한 페이지 HTML을 보관합니다."""
+        response = requests.Response()
+        response.status_code = 200
+        response.headers['Content-Type'] = 'text/html; charset=utf-8'
+        response._content = html.encode('utf-8')
+        self.put(cache_key(RENDER_METHOD, url), RENDER_METHOD, url, response)
+
+    def get_page(self, url):
+        """(재파싱) 보관된 렌더링 페이지 HTML을 반환합니다. 없으면 None."""
+        entry = self.get(cache_key(RENDER_METHOD, url))
+        if entry is None:
+            print(f"   - 보관본 '{self.run}'에 '{url}' 페이지가 없습니다.")
+            return None
+        return entry['body'].decode('utf-8')
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def render_pages(urls, render):
+    """
+    브라우저 렌더링 결과도 보관/재생합니다.
+    - render(urls) -> urls와 같은 순서의 HTML 리스트 (None은 실패한 페이지)
+    - 재파싱 중이면 브라우저를 띄우지 않고 보관된 HTML을 반환
+    """
+    archive = get_archive()
+    if archive is not None and archive.replay:
+        return [archive.get_page(url) for url in urls]
+    pages = render(urls)
+    if archive is not None:
+        for url, html in zip(urls, pages):
+            if html is not None:
+                archive.put_page(url, html)
+    return pages
+
+
+def archived_hosts(directory, run):
+    """보관본 'run'에 기록된 호스트 목록을 반환합니다. (crawl.py reparse에서 다시 파싱할 병원을 고르는 용도)"""
+    hosts = set()
+    for path in glob.glob(os.path.join(directory, 'runs', run, 'index-*.jsonl')):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    hosts.add(json.loads(line)['host'])
+                except (json.JSONDecodeError, KeyError):
+                    continue
+    return hosts
+
+
+_archive = None
+
+
+def enable(directory=DEFAULT_ARCHIVE_DIR, run=None, replay=False):
+    """응답 보관(또는 replay=True이면 보관본 재생)을 켭니다. (기본값은 꺼져 있음)"""
+    global _archive
+    _archive = ResponseArchive(directory, run or default_run(), replay)
+    atexit.register(_archive.close)
+    return _archive
+
+
+def get_archive():
+    """켜져 있는 보관소를 반환합니다. 꺼져 있으면 None."""
+    return _archive
@@ -0,0 +1,187 @@
+import atexit
+import json
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+from selenium import webdriver
+from selenium.common.exceptions import SessionNotCreatedException, TimeoutException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from utils.sessions import DEFAULT_HEADERS
+
+# ChromeDriverManager().install()로 찾은 드라이버 경로를 저장해 두는 파일 (다음 실행부터는 네트워크/디스크 확인 생략)
+DRIVER_PATH_FILE = os.path.join(os.path.expanduser('~'), '.cache', 'crawling', 'chromedriver.json')
+
+# 부서 목록 수집에 필요 없는 이미지/폰트/CSS 요청은 브라우저에서 차단
+BLOCKED_URLS = ['*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico',
+                '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot', '*.css']
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _install_driver():
+    """(내부 헬퍼 함수) webdriver-manager로 크롬 드라이버를 내려받아(또는 찾아) 경로를 캐시 파일에 기록합니다."""
+    from webdriver_manager.chrome import ChromeDriverManager
+    path = ChromeDriverManager().install()
+    os.makedirs(os.path.dirname(DRIVER_PATH_FILE), exist_ok=True)
+    with open(DRIVER_PATH_FILE, 'w', encoding='utf-8') as f:
+        json.dump({'path': path}, f)
+    return path
+
+
+def driver_path(refresh=False):
+    """
+    크롬 드라이버 경로를 반환합니다.
+    - CHROMEDRIVER_PATH 환경 변수가 있으면 그대로 사용
+    - 캐시 파일의 경로가 아직 있으면 재사용, 없거나 refresh=True이면 webdriver-manager로 다시 설치
+    """
+    if os.environ.get('CHROMEDRIVER_PATH'):
+        return os.environ['CHROMEDRIVER_PATH']
+    if not refresh:
+        try:
+            with open(DRIVER_PATH_FILE, 'r', encoding='utf-8') as f:
+                path = json.load(f).get('path')
+            if path and os.path.exists(path):
+                return path
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+    return _install_driver()
+
+
+def _chrome_options():
+    """(내부 헬퍼 함수) 헤드리스, 이미지 비활성화, DOM 준비 시점까지만 기다리는(eager) 크롬 옵션"""
+    options = Options()
+    options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument(f"user-agent={DEFAULT_HEADERS['User-Agent']}")
+    options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+    options.page_load_strategy = 'eager'
+    return options
+
+
+def new_driver():
+    """리소스 차단이 적용된 헤드리스 크롬을 새로 띄웁니다. 캐시된 드라이버가 브라우저 버전과 맞지 않으면 한 번 다시 설치합니다."""
+    try:
+        driver = webdriver.Chrome(service=Service(driver_path()), options=_chrome_options())
+    except SessionNotCreatedException:
+        driver = webdriver.Chrome(service=Service(driver_path(refresh=True)), options=_chrome_options())
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URLS})
+    return driver
+
+
+class BrowserPool:
+    """
+    한 번 띄운 헤드리스 브라우저를 재사용하는 풀
+    - 브라우저는 처음 필요할 때 띄우고, 다 쓴 뒤에도 닫지 않고 다음 작업에 다시 사용 (프로세스 종료 시 정리)
+    - render()는 여러 페이지를 한 브라우저의 탭으로 동시에 열고, 고정 sleep 대신 선택자가 나타날 때까지만 기다림
+    """
+
+    def __init__(self, size=1):
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._all = []
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _checkout(self):
+        """(내부 헬퍼 함수) 쉬고 있는 브라우저를 꺼내고, 없으면 size까지 새로 띄우고, 그래도 없으면 반납을 기다립니다."""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+        if not create:
+            return self._idle.get()
+        try:
+            driver = new_driver()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+        with self._lock:
+            self._all.append(driver)
+        return driver
+
+    def _discard(self, driver):
+        """(내부 헬퍼 함수) 작업 중 에러가 난 브라우저는 상태를 믿을 수 없으므로 닫고 풀에서 뺍니다."""
+        with self._lock:
+            self._all.remove(driver)
+            self._created -= 1
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    @contextmanager
+    def browser(self):
+        """풀에서 브라우저 하나를 빌려 쓰고 돌려놓습니다."""
+        driver = self._checkout()
+        try:
+            yield driver
+        except Exception:
+            self._discard(driver)
+            raise
+        self._idle.put(driver)
+
+    def render(self, urls, wait_css, timeout=10, before_load=None):
+        """
+        urls를 각각 새 탭에서 동시에 열고, wait_css 요소가 나타나면 그 탭의 HTML을 가져옵니다.
+        - before_load(url): 탭을 열기 직전에 호출 (요청 속도 제한 등)
+        - 반환: urls와 같은 순서의 HTML 리스트 (timeout 안에 요소가 나타나지 않은 페이지는 None)
+        """
+        pages = [None] * len(urls)
+        with self.browser() as driver:
+            home = driver.current_window_handle
+            handles = []
+            for url in urls:
+                if before_load:
+                    before_load(url)
+                driver.switch_to.new_window('tab')
+                # location 변경은 바로 반환되므로 모든 탭의 로딩이 동시에 진행됨
+                driver.execute_script("window.location.href = arguments[0];", url)
+                handles.append(driver.current_window_handle)
+
+            for i, handle in enumerate(handles):
+                driver.switch_to.window(handle)
+                try:
+                    WebDriverWait(driver, timeout).until(EC.presence_of_element_located((By.CSS_SELECTOR, wait_css)))
+                    pages[i] = driver.page_source
+                except TimeoutException:
+                    print(f"   - '{urls[i]}'에서 {timeout}초 안에 '{wait_css}' 요소가 나타나지 않았습니다.")
+                finally:
+                    driver.close()
+            driver.switch_to.window(home)
+        return pages
+
+    def close(self):
+        with self._lock:
+            drivers = list(self._all)
+            self._all.clear()
+            self._created = 0
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+
+def get_browser_pool():
+    """프로세스 전체에서 공유하는 브라우저 풀을 반환합니다. (프로세스 종료 시 자동으로 브라우저를 닫음)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+            atexit.register(_pool.close)
+        return _pool
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# 캐시 키에서 제외할 쿼리 파라미터 (smc의 '_' 같은 캐시 무효화용 타임스탬프)
+IGNORED_PARAMS = {'_'}
+DEFAULT_TTL = 24 * 60 * 60
+
+
+def cache_key(method, url, params=None, data=None):
+    """메서드 + 정규화된 URL + 요청 본문으로 캐시 키를 만듭니다. 쿼리 순서와 무시할 파라미터는 정규화합니다."""
+    prepared = requests.Request(method.upper(), url, params=params, data=data).prepare()
+    parsed = urlparse(prepared.url)
+    query = sorted((k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True) if k not in IGNORED_PARAMS)
+    normalized_url = urlunparse(parsed._replace(query=urlencode(query)))
+
+    body = prepared.body or b''
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    digest = hashlib.sha256(f"{method.upper()}\n{normalized_url}\n".encode('utf-8') + body)
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite 파일 하나에 응답 본문을 저장하는 디스크 캐시
+    - TTL 안의 항목은 네트워크 요청 없이 바로 반환
+    - TTL이 지난 항목은 ETag/Last-Modified로 조건부 재검증 (304면 본문 재사용)
+    - 전체 크기가 max_bytes를 넘으면 가장 오래 사용하지 않은 항목부터 삭제 (LRU)
+    """
+
+    def __init__(self, directory, max_bytes):
+        os.makedirs(directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, 'responses.sqlite'), check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY, url TEXT, status INTEGER, headers TEXT, body BLOB,
+                etag TEXT, last_modified TEXT, stored_at REAL, accessed_at REAL, size INTEGER
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON responses (accessed_at)")
+        self._conn.commit()
+        self._total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key):
+        """캐시 항목을 딕셔너리로 반환합니다. 없으면 None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, status, headers, body, etag, last_modified, stored_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        url, status, headers, body, etag, last_modified, stored_at = row
+        return {'url': url, 'status': status, 'headers': json.loads(headers), 'body': body,
+                'etag': etag, 'last_modified': last_modified, 'stored_at': stored_at}
+
+    def put(self, key, response):
+        """정상 응답(Response)을 저장하고 필요하면 LRU 정리를 수행합니다."""
+        body = response.content
+        headers = dict(response.headers)
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, response.url, response.status_code, json.dumps(headers), body,
+                 headers.get('ETag'), headers.get('Last-Modified'), now, now, len(body))
+            )
+            self._total += len(body) - (old[0] if old else 0)
+            self._evict()
+            self._conn.commit()
+
+    def touch(self, key):
+        """304 재검증에 성공한 항목의 저장 시각을 갱신해 TTL을 다시 시작합니다."""
+        with self._lock:
+            now = time.time()
+            self._conn.execute("UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))
+            self._conn.commit()
+
+    def _evict(self):
+        """(내부 헬퍼 함수) 크기 한도를 넘으면 한도의 90%가 될 때까지 오래된 항목부터 지웁니다."""
+        if self._total <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall()
+        for key, size in rows:
+            if self._total <= target:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._total -= size
+
+
+def to_response(entry):
+    """캐시 항목을 requests.Response 객체로 복원합니다."""
+    response = requests.Response()
+    response.status_code = entry['status']
+    response.headers = CaseInsensitiveDict(entry['headers'])
+    response._content = entry['body']
+    response.url = entry['url']
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.from_cache = True
+    return response
+
+
+def revalidation_headers(entry):
+    """TTL이 지난 항목을 조건부 요청으로 재검증할 때 붙일 헤더를 만듭니다."""
+    headers = {}
+    if entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+
+_cache = None
+
+
+def enable(directory='.crawl_cache', max_bytes=512 * 1024 * 1024):
+    """디스크 캐시를 켭니다. (기본값은 꺼져 있음)"""
+    global _cache
+    _cache = ResponseCache(directory, max_bytes)
+    return _cache
+
+
+def get_cache():
+    """켜져 있는 캐시를 반환합니다. 꺼져 있으면 None."""
+    return _cache
@@ -0,0 +1,65 @@
+import json
+import os
+import threading
+
+from utils.incremental import fingerprint
+from utils.utils import output_path
+
+
+class Checkpoint:
+    """
+    3단계 상세 수집 체크포인트 ('{base_name}_checkpoint.jsonl')
+    - 완료된 의료진 레코드를 한 줄씩 즉시 파일에 추가 (flush + fsync)
+    - --resume으로 다시 실행하면 이미 완료된 의료진 키는 요청 없이 저장된 레코드를 사용
+    - 최종 파일 저장까지 끝나면 finish()로 체크포인트를 삭제
+    """
+
+    def __init__(self, base_name, resume=False):
+        self.path = output_path(f"{base_name}_checkpoint.jsonl")
+        self.completed = {}
+        self._lock = threading.Lock()
+
+        if resume and os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 기록 도중 끊긴 마지막 줄은 버림
+                        continue
+                    self.completed[entry['key']] = entry['record']
+            print(f"♻️ 이어서 수집: 체크포인트 '{self.path}'에서 완료된 {len(self.completed)}명을 건너뜁니다.")
+            self._file = open(self.path, 'a', encoding='utf-8')
+        else:
+            self._file = open(self.path, 'w', encoding='utf-8')
+
+    def append(self, key, record):
+        """완료된 레코드 하나를 체크포인트 파일에 바로 기록합니다."""
+        line = json.dumps({'key': key, 'record': record}, ensure_ascii=False, default=str)
+        # 이번 실행에서 완료한 레코드는 메모리에 두지 않음 (--resume으로 다시 실행할 때만 파일에서 읽음)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def wrap(self, worker, key_fn):
+        """
+        3단계 작업 함수 worker(doctor) -> 최종 레코드를 감싸 체크포인트를 적용한 함수를 반환합니다.
+        - 키는 worker가 레코드를 바꾸기 전에 계산 (cmc처럼 ID를 지우는 경우 대비)
+        - 같은 의료진이 여러 부서 행으로 나오는 경우(ys, smc, snuh)를 구분하도록 의료진 키에 목록 행의 지문을 붙임
+        """
+        def wrapped(doctor):
+            doctor_key = key_fn(doctor)
+            key = f"{doctor_key}#{fingerprint(doctor)}" if doctor_key else None
+            if key is not None and key in self.completed:
+                return self.completed[key]
+            record = worker(doctor)
+            if key is not None and record is not None:
+                self.append(key, record)
+            return record
+        return wrapped
+
+    def finish(self):
+        """최종 결과 저장이 끝난 뒤 체크포인트 파일을 닫고 삭제합니다."""
+        self._file.close()
+        os.remove(self.path)
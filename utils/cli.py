@@ -0,0 +1,77 @@
+import argparse
+import os
+
+from utils import archive, cache
+from utils.store import DEFAULT_STORE_PATH
+from utils.utils import set_output
+from utils.workqueue import DEFAULT_LEASE_SECONDS, DEFAULT_QUEUE_PATH
+
+
+def parse_args(description=None, argv=None):
+    """
+    스크래퍼 공통 실행 옵션을 읽고, 옵션에 맞게 fetch 계층을 설정합니다.
+    - --cache: 응답을 디스크에 캐시해 재실행/파서 수정 시 다시 내려받지 않음
+    - --incremental: 이전 실행 이후 새로 생기거나 바뀐 의료진만 상세 정보를 다시 수집
+    - --resume: 중간에 끊긴 이전 실행의 체크포인트에서 이어서 수집
+    - --jsonl: 3단계 결과를 한 줄에 한 건씩 바로 JSONL 파일로 저장 (--compress로 gzip/zstd 압축)
+    - --parquet: 3단계 결과를 공통 스키마의 Parquet 파일에도 row group 단위로 저장
+    - --base-url: 모든 요청을 실제 병원 대신 다른 서버(예: bench/mock_server.py)로 보냄
+    - --sqlite: 3단계 결과를 SQLite 저장소에 (병원, 의료진 ID) 키로 upsert하고 바뀐 내용은 이력으로 보관
+    - --queue: 3단계 작업을 SQLite 작업 큐에 올려, --queue-worker로 띄운 다른 프로세스와 나눠서 처리
+    - --metrics: 호스트별 요청/지연 시간, 페이지별 파싱 시간, 단계별 처리량을 결과 파일 옆에 JSON/Prometheus 형식으로 저장
+    - --archive: 받은 응답 원본을 압축해 실행(run)별 보관본으로 저장 (utils.archive)
+    - --reparse: 보관본의 응답만으로 현재 파서를 다시 실행 (네트워크 요청 없음, 결과는 'reparse_{run}/' 폴더에 저장)
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--cache', action='store_true', help='HTTP 응답 디스크 캐시 사용')
+    parser.add_argument('--cache-dir', default='.crawl_cache', help='캐시 저장 폴더 (기본: .crawl_cache)')
+    parser.add_argument('--cache-max-mb', type=int, default=512, help='캐시 최대 크기(MB), 넘으면 오래된 항목부터 삭제')
+    parser.add_argument('--incremental', action='store_true', help='새로 생기거나 바뀐 의료진만 상세 정보 재수집')
+    parser.add_argument('--max-age-days', type=int, default=7, help='증분 모드에서 이 기간이 지난 상세 정보는 다시 수집 (기본: 7일)')
+    parser.add_argument('--resume', action='store_true', help='이전 실행 체크포인트에서 완료된 의료진은 건너뛰고 이어서 수집')
+    parser.add_argument('--jsonl', action='store_true', help='결과를 JSONL로 스트리밍 저장 (기존 JSON 대신)')
+    parser.add_argument('--compress', choices=['gzip', 'zstd'], help='JSONL 압축 방식')
+    parser.add_argument('--pretty-json', action='store_true', help='--jsonl 사용 시 기존 형식의 들여쓰기 JSON도 후처리로 생성')
+    parser.add_argument('--parquet', action='store_true', help='결과를 Parquet 파일로도 저장 (pyarrow 필요)')
+    parser.add_argument('--sqlite', nargs='?', const=DEFAULT_STORE_PATH,
+                        help=f'결과를 SQLite 저장소에 upsert (파일 경로, 기본: {DEFAULT_STORE_PATH})')
+    parser.add_argument('--base-url', help="모든 병원 요청을 '{BASE_URL}/{원래 호스트}/...'로 보냄 (예: http://127.0.0.1:8800)")
+    parser.add_argument('--queue', nargs='?', const=DEFAULT_QUEUE_PATH,
+                        help=f'3단계 작업을 SQLite 작업 큐로 처리 (파일 경로, 기본: {DEFAULT_QUEUE_PATH})')
+    parser.add_argument('--queue-worker', action='store_true',
+                        help='목록 수집 없이 작업 큐의 3단계 작업만 처리하는 작업자로 실행')
+    parser.add_argument('--lease-seconds', type=int, default=DEFAULT_LEASE_SECONDS,
+                        help=f'작업 임대 시간(초), 그 안에 끝내지 못한 작업은 다른 프로세스가 다시 가져감 (기본: {DEFAULT_LEASE_SECONDS})')
+    parser.add_argument('--metrics', action='store_true',
+                        help='실행 지표를 결과 파일 옆에 저장 (*_metrics_날짜.json, *_metrics_날짜.prom)')
+    parser.add_argument('--archive', nargs='?', const=archive.default_run(), metavar='RUN',
+                        help='받은 응답 원본을 보관본으로 저장 (보관본 이름, 기본: 오늘 날짜 yymmdd)')
+    parser.add_argument('--reparse', metavar='RUN', help='보관본 RUN의 응답으로 네트워크 없이 다시 파싱')
+    parser.add_argument('--archive-dir', default=archive.DEFAULT_ARCHIVE_DIR,
+                        help=f'보관본 저장 폴더 (기본: {archive.DEFAULT_ARCHIVE_DIR})')
+    args = parser.parse_args(argv)
+
+    if args.reparse:
+        if args.archive or args.queue or args.queue_worker:
+            parser.error('--reparse는 --archive, --queue, --queue-worker와 함께 쓸 수 없습니다.')
+        # 재파싱은 보관본만 읽으므로 이전 실행 상태/캐시를 쓰지 않고, 결과는 원래 수집 날짜로 별도 폴더에 저장
+        args.cache = args.incremental = args.resume = False
+        try:
+            replay = archive.enable(args.archive_dir, args.reparse, replay=True)
+        except FileNotFoundError as e:
+            parser.error(str(e))
+        set_output(f'reparse_{args.reparse}', replay.info.get('date'))
+        print(f"🗄️ 보관본 '{args.reparse}'의 응답 {len(replay.entries)}건으로 다시 파싱합니다. "
+              f"(결과 폴더: reparse_{args.reparse})")
+    elif args.archive:
+        archive.enable(args.archive_dir, args.archive)
+
+    if args.queue_worker and not args.queue:
+        args.queue = DEFAULT_QUEUE_PATH
+
+    if args.base_url:
+        os.environ['CRAWL_BASE_URL'] = args.base_url
+
+    if args.cache:
+        cache.enable(args.cache_dir, args.cache_max_mb * 1024 * 1024)
+    return args
@@ -0,0 +1,59 @@
+import json
+import os
+from urllib.parse import urlparse, urlunparse
+
+# 병원별 크롤링 설정 파일 (CRAWL_CONFIG 환경 변수로 다른 파일 지정 가능)
+CONFIG_PATH = os.environ.get(
+    'CRAWL_CONFIG',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'crawl_config.json')
+)
+
+_config = None
+
+
+def load_config():
+    """설정 파일을 한 번만 읽어 캐시해 두고 반환합니다. 파일이 없으면 빈 설정을 사용합니다."""
+    global _config
+    if _config is None:
+        try:
+            with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+                _config = json.load(f)
+        except FileNotFoundError:
+            _config = {}
+    return _config
+
+
+def hospital_settings(hospital):
+    """기본값 위에 병원별 설정을 덮어쓴 딕셔너리를 반환합니다."""
+    config = load_config()
+    return {**config.get('default', {}), **config.get('hospitals', {}).get(hospital, {})}
+
+
+def host_settings(host):
+    """호스트(netloc)가 속한 병원의 설정을 반환합니다. 등록되지 않은 호스트는 기본값을 사용합니다."""
+    config = load_config()
+    for hospital, settings in config.get('hospitals', {}).items():
+        if host in settings.get('hosts', []):
+            return hospital_settings(hospital)
+    return dict(config.get('default', {}))
+
+
+def base_url_override(host):
+    """
+    호스트로 가는 요청을 대신 보낼 기본 URL을 반환합니다. 없으면 None.
+    - CRAWL_BASE_URL 환경 변수(--base-url): 모든 병원 요청을 '{CRAWL_BASE_URL}/{host}' 아래로 보냄 (bench/mock_server.py 등)
+    - 설정 파일의 병원별 'base_url': 해당 병원 요청만 다른 주소로 보냄
+    """
+    base_url = os.environ.get('CRAWL_BASE_URL')
+    if base_url:
+        return f"{base_url.rstrip('/')}/{host}"
+    return host_settings(host).get('base_url')
+
+
+def resolve_url(url):
+    """URL의 scheme://host 부분을 base_url_override()의 주소로 바꿉니다. 대체 주소가 없으면 그대로 반환합니다."""
+    parsed = urlparse(url)
+    base_url = base_url_override(parsed.netloc) if parsed.netloc else None
+    if not base_url:
+        return url
+    return base_url.rstrip('/') + urlunparse(('', '', parsed.path, parsed.params, parsed.query, parsed.fragment))
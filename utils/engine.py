@@ -0,0 +1,304 @@
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import requests
+
+from utils import metrics
+from utils.archive import get_archive
+from utils.cache import DEFAULT_TTL, cache_key, get_cache, revalidation_headers, to_response
+from utils.config import host_settings, resolve_url
+from utils.ratelimit import get_breaker, get_limiter
+from utils.sessions import get_session
+
+# 단계 전체에서 동시에 실행할 작업 수와 호스트 하나에 동시에 보낼 요청 수
+DEFAULT_CONCURRENCY = 8
+DEFAULT_PER_HOST = 4
+# 일시적인 장애로 보고 다시 시도할 상태 코드와 재시도 설정 (crawl_config.json의 retries/backoff로 병원별 변경 가능)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+MAX_BACKOFF = 30.0
+
+_lock = threading.Lock()
+_host_limits = {}
+_host_slots = {}
+_request_count = 0
+_failed_requests = 0
+_task_errors = 0
+_dead_letters = 0
+# 작업 스레드별 상태: 지금 처리 중인 작업에서 재시도 후에도 실패한 요청이 있었는지, 실패를 단계 끝으로 미룰지
+_local = threading.local()
+
+
+class FetchFailed(Exception):
+    """재시도 후에도 요청이 실패해 작업을 단계 끝에서 다시 시도하도록 미룰 때 발생하는 예외"""
+
+
+def set_host_limit(host, limit):
+    """특정 호스트의 동시 요청 수 상한을 지정합니다. (첫 요청 전에 호출해야 적용됩니다)"""
+    with _lock:
+        _host_limits[host] = limit
+        _host_slots.pop(host, None)
+
+
+def _get_slot(host):
+    """(내부 헬퍼 함수) 호스트별 동시 요청 수를 제한하는 세마포어를 반환합니다."""
+    with _lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            limit = _host_limits.get(host) or host_settings(host).get('concurrency', DEFAULT_PER_HOST)
+            slot = threading.BoundedSemaphore(limit)
+            _host_slots[host] = slot
+        return slot
+
+
+def _send(method, url, host, session, **kwargs):
+    """(내부 헬퍼 함수) 호스트별 동시 요청 상한과 요청 속도(AIMD limiter)를 지키면서 실제 네트워크 요청을 보냅니다."""
+    global _request_count, _failed_requests
+    limiter = get_limiter(host)
+    queued = time.perf_counter()
+    with _get_slot(host):
+        limiter.acquire()
+        wait = time.perf_counter() - queued
+        with _lock:
+            _request_count += 1
+        start = time.perf_counter()
+        try:
+            response = (session or get_session(host)).request(method, url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            latency = time.perf_counter() - start
+            limiter.record(error=True)
+            metrics.record_request(host, 'error', 0, latency, wait)
+            with _lock:
+                _failed_requests += 1
+            raise
+        latency = time.perf_counter() - start
+        limiter.record(latency=latency, status=response.status_code)
+        metrics.record_request(host, response.status_code, len(response.content), latency, wait)
+        if response.status_code >= 400:
+            with _lock:
+                _failed_requests += 1
+        return response
+
+
+def _backoff_delay(attempt, settings, response=None):
+    """
+    (내부 헬퍼 함수) 재시도 전 대기 시간: 지수 백오프 상한 안에서 무작위로 고름 (full jitter)
+    - 429/503 응답에 Retry-After(초)가 있으면 그 시간 이상 기다림
+    """
+    cap = min(MAX_BACKOFF, settings.get('backoff', DEFAULT_BACKOFF) * 2 ** attempt)
+    delay = random.uniform(0, cap)
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after and retry_after.isdigit():
+        delay = max(delay, min(MAX_BACKOFF, int(retry_after)))
+    return delay
+
+
+def _send_with_retry(method, url, host, session, **kwargs):
+    """
+    (내부 헬퍼 함수) 일시적인 장애(연결 에러/타임아웃/429/5xx)는 백오프 후 다시 요청하고, 호스트 차단기를 거쳐 보냅니다.
+    - 재시도를 모두 써도 실패하면 지금 처리 중인 작업에 실패를 표시 (run_stage가 단계 끝에서 다시 시도)
+    """
+    settings = host_settings(host)
+    retries = settings.get('retries', DEFAULT_RETRIES)
+    breaker = get_breaker(host)
+    for attempt in range(retries + 1):
+        breaker.wait()
+        try:
+            response = _send(method, url, host, session, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            breaker.record(ok=False)
+            if attempt == retries:
+                _local.failed = True
+                raise
+            delay = _backoff_delay(attempt, settings)
+        else:
+            transient = response.status_code in RETRY_STATUS
+            breaker.record(ok=not transient)
+            if not transient:
+                return response
+            if attempt == retries:
+                _local.failed = True
+                return response
+            delay = _backoff_delay(attempt, settings, response)
+        metrics.record_retry(host)
+        time.sleep(delay)
+
+
+def fetch(method, url, session=None, **kwargs):
+    """
+    HTTP 요청을 보내고 Response를 반환합니다. 모든 스크래퍼의 요청은 이 함수를 거칩니다.
+    - session을 주지 않으면 호스트별 keep-alive 세션(utils.sessions)을 재사용
+    - 디스크 캐시가 켜져 있으면(--cache) TTL 안의 응답은 네트워크 없이 반환하고,
+      TTL이 지난 응답은 ETag/Last-Modified로 재검증
+    - --base-url(CRAWL_BASE_URL)이나 설정의 base_url이 있으면 요청만 그 주소로 보내고,
+      동시 요청 수/속도 제한은 원래 호스트 기준으로 적용
+    - 연결 에러/타임아웃/429/5xx는 지수 백오프(jitter)로 최대 retries번 다시 시도하고,
+      호스트의 에러율이 급증하면 차단기(utils.ratelimit.CircuitBreaker)가 그 호스트 요청을 잠시 멈춤
+    - 응답 보관(--archive)이 켜져 있으면 최종 응답을 원래 URL 기준으로 보관하고,
+      재파싱(--reparse) 중이면 네트워크 없이 보관된 응답만 반환 (utils.archive)
+    """
+    archive = get_archive()
+    if archive is None:
+        return _fetch(method, url, session, **kwargs)
+    key = cache_key(method, url, kwargs.get('params'), kwargs.get('data'))
+    if archive.replay:
+        return archive.response(key, url)
+    response = _fetch(method, url, session, **kwargs)
+    archive.put(key, method, url, response)
+    return response
+
+
+def _fetch(method, url, session=None, **kwargs):
+    """(내부 헬퍼 함수) 디스크 캐시를 거쳐 요청을 보냅니다."""
+    host = urlparse(url).netloc
+    url = resolve_url(url)
+    cache = get_cache()
+    key = entry = None
+    if cache is not None:
+        key = cache_key(method, url, kwargs.get('params'), kwargs.get('data'))
+        entry = cache.get(key)
+        if entry and time.time() - entry['stored_at'] < host_settings(host).get('cache_ttl', DEFAULT_TTL):
+            metrics.record_cache_hit(host)
+            return to_response(entry)
+        if entry:
+            kwargs['headers'] = {**(kwargs.get('headers') or {}), **revalidation_headers(entry)}
+
+    response = _send_with_retry(method, url, host, session, **kwargs)
+
+    if cache is not None:
+        if response.status_code == 304 and entry:
+            cache.touch(key)
+            return to_response(entry)
+        if response.status_code == 200:
+            cache.put(key, response)
+    return response
+
+
+def stats():
+    """
+    이 프로세스에서 지금까지 보낸 요청 수, 실패한 요청 수(연결 에러/타임아웃/4xx·5xx, 재시도 포함),
+    에러로 끝난 작업 수, 단계 끝에서 다시 시도해도 요청이 실패한 작업 수를 반환합니다.
+    """
+    with _lock:
+        return {'requests': _request_count, 'failed_requests': _failed_requests, 'task_errors': _task_errors,
+                'dead_letters': _dead_letters}
+
+
+def defer_on_failure(worker):
+    """
+    3단계 작업 함수 worker(doctor)를 감싸, 재시도 후에도 요청이 실패한 작업은 결과 대신 FetchFailed를 발생시킵니다.
+    - 스크래퍼는 요청 실패를 '정보 없음' 같은 값으로 바꿔 반환하므로, 그 값이 체크포인트/JSONL/저장소에 기록되기 전에 막는 용도
+    - run_stage가 이런 작업을 모아(dead-letter) 단계 끝에서 한 번 더 실행하고, 그때도 실패하면 worker의 반환값을 그대로 사용
+    """
+    def wrapped(item):
+        result = worker(item)
+        if getattr(_local, 'failed', False) and getattr(_local, 'defer', False):
+            raise FetchFailed("재시도 후에도 요청이 실패해 단계 끝에서 다시 시도합니다.")
+        return result
+    return wrapped
+
+
+def fetch_failed():
+    """지금 처리 중인 작업에서 재시도 후에도 실패한 요청이 있었으면 True (실패한 결과를 저장하지 않을 때 사용)"""
+    return getattr(_local, 'failed', False)
+
+
+def mark_failed():
+    """지금 처리 중인 작업을 요청 실패로 표시합니다. (다른 스레드가 대신 요청한 결과를 받은 경우 등)"""
+    _local.failed = True
+
+
+@contextmanager
+def allow_failure():
+    """
+    안에서 보낸 요청이 재시도 후에도 실패해도 지금 처리 중인 작업을 요청 실패로 표시하지 않습니다.
+    - 실패하면 다른 방법으로 다시 수집하는 요청(snuh의 AJAX 우선 요청 등)에 사용
+      (대신 수집한 요청이 성공하면 작업이 dead-letter로 미뤄지지 않고, 그 요청도 실패하면 그때 실패로 표시됨)
+    """
+    failed = getattr(_local, 'failed', False)
+    try:
+        yield
+    finally:
+        _local.failed = failed
+
+
+def _safe_call(worker, item, defer=False):
+    """
+    (내부 헬퍼 함수) 작업 하나의 예외가 단계 전체를 멈추지 않도록 감쌉니다.
+    - 반환: (결과, 요청 실패 여부, 에러 여부)
+    """
+    _local.failed = False
+    _local.defer = defer
+    try:
+        return worker(item), _local.failed, False
+    except FetchFailed:
+        return None, True, True
+    except Exception as e:
+        print(f"     [Error] 작업 처리 중 에러: {e}")
+        return None, _local.failed, True
+    finally:
+        _local.defer = False
+
+
+async def _run(items, worker, concurrency, label, defer=False):
+    loop = asyncio.get_running_loop()
+    total = len(items)
+    done = 0
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        async def run_one(item):
+            nonlocal done
+            result = await loop.run_in_executor(pool, _safe_call, worker, item, defer)
+            done += 1
+            if label:
+                print(f"  - ({done}/{total}) {label(item)} 완료")
+            return result
+
+        return await asyncio.gather(*(run_one(item) for item in items))
+
+
+def run_stage(stage_name, items, worker, concurrency=DEFAULT_CONCURRENCY, label=None, retry_failed=True):
+    """
+    items 각각에 worker(item)을 동시에 실행하고, 입력 순서대로 결과 리스트를 반환합니다.
+    - worker 내부의 요청은 fetch()를 거치므로 호스트별 동시 요청 상한이 함께 적용됨
+    - retry_failed=True이면 재시도 후에도 요청이 실패한 작업을 모아(dead-letter) 단계 끝에서 한 번 더 실행
+      (그 사이 호스트 차단기가 풀리길 기다리므로 일시적인 장애로 비어 있는 결과를 전체 재실행 없이 채움)
+    - 단계가 끝나면 소요 시간과 초당 요청 수를 출력하고, 처리량/네트워크·파싱 시간을 utils.metrics에 기록
+    """
+    global _task_errors, _dead_letters
+    items = list(items)
+    start_count = _request_count
+    start_totals = metrics.totals()
+    start = time.perf_counter()
+
+    outcomes = asyncio.run(_run(items, worker, concurrency, label, defer=retry_failed)) if items else []
+    outcomes = list(outcomes)
+
+    dead_letters = [i for i, (_, failed, _) in enumerate(outcomes) if failed] if retry_failed else []
+    if dead_letters:
+        print(f"☠️ {stage_name}: 요청이 실패한 작업 {len(dead_letters)}건을 단계 끝에서 다시 시도합니다...")
+        retried = asyncio.run(_run([items[i] for i in dead_letters], worker, concurrency, label))
+        for i, outcome in zip(dead_letters, retried):
+            outcomes[i] = outcome
+        still_failed = sum(1 for i in dead_letters if outcomes[i][1])
+        print(f"  - 다시 시도 결과: {len(dead_letters) - still_failed}건 성공 / {still_failed}건 실패")
+        with _lock:
+            _dead_letters += still_failed
+
+    results = [result for result, _, _ in outcomes]
+    with _lock:
+        _task_errors += sum(1 for _, _, error in outcomes if error)
+
+    elapsed = time.perf_counter() - start
+    request_count = _request_count - start_count
+    rate = request_count / elapsed if elapsed > 0 else 0.0
+    print(f"⏱️ {stage_name}: 작업 {len(items)}건 / 요청 {request_count}회 / {elapsed:.1f}초 ({rate:.1f} req/s)")
+    metrics.record_stage(stage_name, len(items), sum(1 for result in results if result is not None),
+                         request_count, elapsed, start_totals)
+    return results
@@ -0,0 +1,53 @@
+import os
+import re
+from functools import lru_cache
+
+import soupsieve
+from bs4 import BeautifulSoup, SoupStrainer
+
+# lxml이 설치되어 있으면 lxml 파서(가장 빠름), 없으면 내장 html.parser 사용
+# (CRAWL_HTML_PARSER 환경 변수로 파서를 바꿔 비교할 수 있음)
+try:
+    import lxml  # noqa: F401
+    DEFAULT_PARSER = 'lxml'
+except ImportError:
+    DEFAULT_PARSER = 'html.parser'
+
+PARSER = os.environ.get('CRAWL_HTML_PARSER', DEFAULT_PARSER)
+
+# 크롤링 대상 병원 페이지는 모두 UTF-8 (requests의 charset 추측을 건너뛰기 위해 미리 지정)
+DEFAULT_ENCODING = 'utf-8'
+
+
+@lru_cache(maxsize=None)
+def css(selector):
+    """CSS 선택자를 한 번만 컴파일해 재사용합니다. 결과는 soup.select()/select_one()에 그대로 넘길 수 있습니다."""
+    return soupsieve.compile(selector)
+
+
+def _class_pattern(classes):
+    """(내부 헬퍼 함수) class 속성 문자열("textList2 new")에 주어진 클래스 중 하나라도 있으면 맞는 정규식을 만듭니다."""
+    if isinstance(classes, str):
+        classes = [classes]
+    return re.compile(r'(?:^|\s)(?:%s)(?:\s|$)' % '|'.join(map(re.escape, classes)))
+
+
+def strainer(name=None, class_=None, **attrs):
+    """
+    parse(only=...)에 넘길 SoupStrainer를 만듭니다. 조건에 맞는 태그(와 그 하위 트리)만 DOM으로 만듭니다.
+    - 예: strainer('div', id='careerMobArea'), strainer('ul', class_=['acdmcrMatter', 'edcNdClincCareer'])
+    - class_는 CSS 선택자처럼 태그의 여러 클래스 중 하나만 맞아도 일치 (SoupStrainer 기본 동작은 class 전체 문자열 비교)
+    """
+    if class_ is not None:
+        attrs['class'] = _class_pattern(class_)
+    return SoupStrainer(name, attrs)
+
+
+def parse(content, only=None, encoding=DEFAULT_ENCODING, parser=None):
+    """
+    HTML을 BeautifulSoup으로 파싱합니다.
+    - content: response.content(bytes)를 그대로 넘기면 encoding으로 바로 디코딩 (response.text 사용 안 함)
+    - only: strainer(...)로 만든 SoupStrainer. 필요한 하위 트리만 파싱해 전체 DOM을 만들지 않음
+    """
+    from_encoding = encoding if isinstance(content, bytes) else None
+    return BeautifulSoup(content, parser or PARSER, parse_only=only, from_encoding=from_encoding)
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+from utils.engine import fetch_failed
+
+
+def fingerprint(record):
+    """2단계 목록 데이터(딕셔너리)의 내용 해시를 만듭니다. 키 순서와 무관하게 같은 내용이면 같은 값입니다."""
+    payload = json.dumps(record, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def no_error(details):
+    """
+    상세 수집 결과가 실패 표시({'error': ...})가 아니면 True (SingleFlight/IncrementalState의 is_valid로 사용)
+    - 학력/경력이 없는 의료진의 빈 결과({})도 정상 결과로 기억해 행마다/실행마다 다시 요청하지 않음
+    """
+    return isinstance(details, dict) and 'error' not in details
+
+
+class IncrementalState:
+    """
+    증분 크롤링(--incremental) 상태
+    - 이전 실행에서 수집한 의료진별 {목록 지문, 상세 수집 시각, 상세 정보}를 '{base_name}_incremental.json'에 보관
+    - 목록 정보가 그대로이고 max_age_days 안에 수집한 의료진은 3단계 요청 없이 이전 상세 정보를 재사용
+    - 새 의료진, 목록 정보가 바뀐 의료진, 오래된 의료진만 상세 페이지를 다시 요청
+    """
+
+    def __init__(self, base_name, max_age_days=7):
+        self.path = f"{base_name}_incremental.json"
+        self.max_age = timedelta(days=max_age_days)
+        self.reused = 0
+        self.fetched = 0
+        self._seen = set()
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+            print(f"🔁 증분 모드: 이전 상태 '{self.path}'에서 {len(self.entries)}명의 정보를 불러왔습니다.")
+        except FileNotFoundError:
+            self.entries = {}
+            print("🔁 증분 모드: 이전 상태 파일이 없어 전체를 수집합니다.")
+
+    def lookup(self, key, record_fingerprint):
+        """재사용 가능한 이전 상세 정보가 있으면 반환하고, 다시 수집해야 하면 None을 반환합니다."""
+        entry = self.entries.get(key)
+        if not entry or entry['fingerprint'] != record_fingerprint:
+            return None
+        if datetime.now() - datetime.fromisoformat(entry['fetched_at']) > self.max_age:
+            return None
+        return entry['details']
+
+    def store(self, key, record_fingerprint, details):
+        self.entries[key] = {
+            'fingerprint': record_fingerprint,
+            'fetched_at': datetime.now().isoformat(timespec='seconds'),
+            'details': details,
+        }
+
+    def wrap(self, fetch_details, key_fn, is_valid=bool):
+        """
+        상세 수집 함수 fetch_details(doctor)를 감싸 증분 모드를 적용한 함수를 반환합니다.
+        - 지문은 상세 정보가 붙기 전의 목록 데이터로 계산
+        - is_valid(details)가 거짓인 결과나 재시도 후에도 요청이 실패한 결과는 저장하지 않아 다음 실행에서 다시 시도
+        """
+        def wrapped(doctor):
+            key = key_fn(doctor)
+            if not key:
+                return fetch_details(doctor)
+            record_fingerprint = fingerprint(doctor)
+            with self._lock:
+                self._seen.add(key)
+            details = self.lookup(key, record_fingerprint)
+            if details is not None:
+                with self._lock:
+                    self.reused += 1
+                return details
+            details = fetch_details(doctor)
+            with self._lock:
+                self.fetched += 1
+                if is_valid(details) and not fetch_failed():
+                    self.store(key, record_fingerprint, details)
+            return details
+        return wrapped
+
+    def save(self):
+        """
+        상태 파일을 저장합니다. 이번 목록에 없는(퇴직 등) 의료진은 제외하고,
+        중간에 끊겨도 기존 파일이 깨지지 않도록 임시 파일을 거쳐 교체합니다.
+        """
+        entries = {key: entry for key, entry in self.entries.items() if key in self._seen}
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        print(f"🔁 증분 모드: 재사용 {self.reused}명 / 새로 수집 {self.fetched}명 (상태 저장: '{self.path}')")
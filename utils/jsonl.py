@@ -0,0 +1,142 @@
+import gzip
+import io
+import json
+import threading
+
+from utils.utils import _generate_filenames
+
+# orjson이 설치되어 있으면 빠른 직렬화 사용, 없으면 표준 json으로 대체
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# zstd 압축은 zstandard 패키지가 있을 때만 사용 가능
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_SUFFIXES = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+
+
+def dumps(record):
+    """레코드 하나를 JSON 한 줄(bytes, 줄바꿈 없음)로 직렬화합니다."""
+    if orjson is not None:
+        return orjson.dumps(record, default=str)
+    return json.dumps(record, ensure_ascii=False, default=str).encode('utf-8')
+
+
+def loads(line):
+    """JSON 한 줄(bytes 또는 str)을 파이썬 객체로 읽습니다."""
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
+
+
+def _open_binary(path, mode):
+    """(내부 헬퍼 함수) 파일 확장자(.gz/.zst)에 맞는 압축 스트림을 엽니다. mode는 'rb' 또는 'wb'."""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode)
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError("zstd 압축을 사용하려면 'pip install zstandard'가 필요합니다.")
+        raw = open(path, mode)
+        if mode == 'wb':
+            return zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True))
+    return open(path, mode)
+
+
+def jsonl_filename(base_name, compression=None):
+    """'{base_name}_crawling_{yymmdd}.jsonl' (+ .gz/.zst) 파일명을 만듭니다."""
+    json_filename, _ = _generate_filenames(base_name)
+    return f"{json_filename}l{COMPRESSION_SUFFIXES[compression]}"
+
+
+class JsonlWriter:
+    """
+    레코드를 만들어지는 즉시 한 줄씩 기록하는 스트리밍 JSONL writer
+    - 전체 결과를 메모리에 모았다가 한 번에 쓰지 않음
+    - 여러 작업 스레드에서 동시에 write()해도 줄이 섞이지 않음
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+        self._file = _open_binary(path, 'wb')
+
+    def write(self, record):
+        line = dumps(record) + b'\n'
+        with self._lock:
+            self._file.write(line)
+            self.count += 1
+
+    def wrap(self, worker, transform=None):
+        """3단계 작업 함수 worker(doctor)의 결과를 바로 기록하도록 감싼 함수를 반환합니다. transform으로 저장 형태를 바꿀 수 있습니다."""
+        def wrapped(doctor):
+            record = worker(doctor)
+            if record is not None:
+                self.write(transform(record) if transform else record)
+            return record
+        return wrapped
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+        print(f"✅ 성공! {self.count}건의 데이터가 '{self.path}' 파일로 스트리밍 저장되었습니다.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_jsonl(path):
+    """JSONL(.jsonl/.jsonl.gz/.jsonl.zst) 파일을 한 줄씩 읽어 레코드를 하나씩 돌려줍니다."""
+    with _open_binary(path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                yield loads(line)
+
+
+def jsonl_to_json(jsonl_path, json_path):
+    """(후처리) JSONL 파일을 기존과 같은 들여쓰기 JSON 배열 파일로 변환합니다. 레코드를 하나씩 옮겨 적어 전체를 메모리에 올리지 않습니다."""
+    print(f"\n💾 '{jsonl_path}'를 JSON 파일({json_path})로 변환합니다...")
+    with open(json_path, 'w', encoding='utf-8') as f:
+        f.write('[')
+        for i, record in enumerate(iter_jsonl(jsonl_path)):
+            f.write(',\n' if i else '\n')
+            f.write('    ' + json.dumps(record, indent=4, ensure_ascii=False).replace('\n', '\n    '))
+        f.write('\n]')
+    print(f"✅ 성공! 데이터가 '{json_path}' 파일로 저장되었습니다.")
+
+
+def open_output(base_name, args):
+    """--jsonl 옵션이 있으면 스트리밍 writer를 열어 반환하고, 없으면 None을 반환합니다."""
+    if not args.jsonl:
+        return None
+    path = jsonl_filename(base_name, args.compress)
+    print(f"\n💾 결과를 JSONL 파일({path})로 스트리밍 저장합니다...")
+    return JsonlWriter(path)
+
+
+def drop_records(worker):
+    """
+    (--jsonl) 3단계 작업 함수를 감싸 결과 레코드 대신 True만 돌려주는 함수를 반환합니다.
+    - 레코드는 JSONL 파일(과 Parquet/SQLite)에만 남기고 run_stage의 결과 리스트에는 모으지 않음 (건수만 셈)
+    - 저장 wrapper들보다 바깥에서 감싸야 함
+    """
+    def wrapped(doctor):
+        return None if worker(doctor) is None else True
+    return wrapped
+
+
+def finish_output(writer, base_name, args):
+    """스트리밍 writer를 닫고, --pretty-json이면 기존 형식의 JSON 파일도 만듭니다."""
+    writer.close()
+    if args.pretty_json:
+        json_filename, _ = _generate_filenames(base_name)
+        jsonl_to_json(writer.path, json_filename)
@@ -0,0 +1,203 @@
+import hashlib
+import re
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+from itertools import combinations
+
+# 같은 사람으로 볼 최소 점수 (0~1)
+DEFAULT_THRESHOLD = 0.5
+# 한 블록(이름 + 학력 토큰)에 이보다 많은 의료진이 모이면 그 토큰은 구분력이 없다고 보고 비교하지 않음
+MAX_BLOCK_SIZE = 50
+
+# 학력/경력 문장에서 사람을 구분하는 데 도움이 되지 않는 단어
+STOPWORDS = {
+    '졸업', '수료', '입학', '과정', '학사', '석사', '박사', '의학사', '의학석사', '의학박사', '전공의', '전임의',
+    '수련', '인턴', '레지던트', '교수', '부교수', '조교수', '임상교수', '현재', '역임', '취득', '근무', '및',
+    'md', 'phd', 'ms', 'ma', 'the', 'of', 'and', 'in', 'at', 'university', 'college', 'school',
+}
+
+_TOKEN = re.compile(r'[0-9a-z]+|[가-힣]+')
+_BRACKETS = re.compile(r'\([^)]*\)|\[[^\]]*\]')
+# 같은 기관을 다르게 쓴 표기 통일 (서울대학교병원 -> 서울대병원)
+_ABBREVIATIONS = [('대학교', '대'), ('대학', '대'), ('의과대', '의대')]
+
+
+def normalize_text(text):
+    """전각/반각, 대소문자, 괄호 안 내용, 공백 차이를 없앱니다."""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    return ' '.join(_BRACKETS.sub(' ', text).split())
+
+
+def normalize_name(name):
+    """이름에서 괄호 안 내용, 직함, 공백을 지운 비교용 이름을 만듭니다. (예: '홍 길동 교수(내과)' -> '홍길동')"""
+    name = normalize_text(name)
+    for title in ('교수님', '교수', '의사', '원장', '과장'):
+        if name.endswith(title) and len(name) > len(title):
+            name = name[:-len(title)]
+    return name.replace(' ', '')
+
+
+@lru_cache(maxsize=200000)
+def _line_tokens(line):
+    """(내부 헬퍼 함수) 한 줄의 토큰 (여러 스냅샷에 같은 줄이 반복되므로 캐시)"""
+    text = normalize_text(line)
+    for old, new in _ABBREVIATIONS:
+        text = text.replace(old, new)
+    return frozenset(token for token in _TOKEN.findall(text) if len(token) > 1 and token not in STOPWORDS)
+
+
+def tokens(lines):
+    """학력/경력 줄 목록을 비교용 토큰 집합으로 바꿉니다. (약어 통일, 불용어/한 글자 제거)"""
+    result = set()
+    for line in lines or []:
+        result |= _line_tokens(line)
+    return result
+
+
+def _jaccard(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def _score(a, b):
+    """
+    (내부 헬퍼 함수) 두 의료진이 같은 사람일 가능성 (0~1)
+    - 학력 토큰 유사도 0.6, 경력 토큰 유사도 0.25, 진료과/전문분야 일치 0.15 가중 평균
+    - 학력 정보가 한쪽에만 없으면 경력 유사도로 학력 비중을 대신함
+    """
+    education = _jaccard(a['education_tokens'], b['education_tokens'])
+    career = _jaccard(a['career_tokens'], b['career_tokens'])
+    if not (a['education_tokens'] and b['education_tokens']):
+        education = career
+    same_field = bool(a['fields'] & b['fields'])
+    return 0.6 * education + 0.25 * career + 0.15 * same_field
+
+
+def _entities(records):
+    """
+    (내부 헬퍼 함수) 같은 병원/같은 doctor_id의 레코드(여러 스냅샷)를 의료진 하나로 묶고 비교용 필드를 계산합니다.
+    """
+    entities = {}
+    for record in records:
+        key = (record['hospital'], record['doctor_id'])
+        entity = entities.get(key)
+        if entity is None:
+            entity = entities[key] = {
+                'key': key, 'name': normalize_name(record.get('name')), 'records': [],
+                'education_tokens': set(), 'career_tokens': set(), 'fields': set(),
+            }
+        entity['records'].append(record)
+        entity['education_tokens'] |= tokens(record.get('education'))
+        entity['career_tokens'] |= tokens(record.get('career'))
+        for field in (record.get('department'), record.get('specialty')):
+            if field:
+                entity['fields'].add(normalize_text(field))
+    return list(entities.values())
+
+
+def _blocks(entities):
+    """
+    (내부 헬퍼 함수) 블로킹 인덱스: (이름, 학력 토큰)이 같은 의료진끼리만 후보 쌍으로 비교
+    - 학력이 없는 의료진은 (이름, 진료과/전문분야)로 블록을 만듦
+    - 모든 쌍을 비교하지 않으므로 전체 비교 횟수가 의료진 수에 거의 비례
+    """
+    index = defaultdict(list)
+    for i, entity in enumerate(entities):
+        if not entity['name']:
+            continue
+        block_tokens = entity['education_tokens'] or {f'#{field}' for field in entity['fields']} or {'#'}
+        for token in block_tokens:
+            index[(entity['name'], token)].append(i)
+    return index
+
+
+class _UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i, j):
+        self.parent[self.find(i)] = self.find(j)
+
+
+def resolve(records, threshold=DEFAULT_THRESHOLD, max_block_size=MAX_BLOCK_SIZE):
+    """
+    여러 병원/여러 스냅샷의 공통 스키마 레코드(utils.records.normalize_record)를 사람 단위로 묶습니다.
+    - 반환: ([{cluster_id, confidence, hospital, doctor_id, name, department, snapshots}], 통계)
+    - 같은 병원의 같은 doctor_id는 항상 같은 사람, 병원 간에는 블록 안의 후보 쌍 중 점수가 threshold 이상인 쌍을 연결
+      (같은 병원의 서로 다른 doctor_id는 비교하지 않고, 한 클러스터에 같은 병원 의료진이 두 명 들어가지 않게 연결)
+    - confidence: 클러스터 안에서 그 의료진이 가진 가장 높은 연결 점수 (혼자인 의료진은 1.0)
+    """
+    entities = _entities(records)
+    index = _blocks(entities)
+    union_find = _UnionFind(len(entities))
+    best = [0.0] * len(entities)
+    compared = set()
+    pairs = []
+    skipped_blocks = 0
+
+    for members in index.values():
+        if len(members) < 2:
+            continue
+        if len(members) > max_block_size:
+            skipped_blocks += 1
+            continue
+        for i, j in combinations(members, 2):
+            # 같은 병원의 다른 doctor_id는 다른 사람 (동명이인이 같은 진료과에 있어도 합치지 않음)
+            if (i, j) in compared or entities[i]['key'][0] == entities[j]['key'][0]:
+                continue
+            compared.add((i, j))
+            score = _score(entities[i], entities[j])
+            if score >= threshold:
+                pairs.append((score, i, j))
+
+    # 점수가 높은 쌍부터 연결하되, 이미 같은 병원 의료진이 들어 있는 클러스터끼리는 합치지 않음
+    # (같은 병원 동명이인 두 명이 다른 병원의 한 명을 거쳐 한 클러스터로 묶이지 않도록)
+    hospitals = [{entity['key'][0]} for entity in entities]
+    for score, i, j in sorted(pairs, key=lambda pair: (-pair[0], pair[1], pair[2])):
+        root_i, root_j = union_find.find(i), union_find.find(j)
+        if root_i != root_j:
+            if hospitals[root_i] & hospitals[root_j]:
+                continue
+            union_find.union(i, j)
+            hospitals[root_j] |= hospitals[root_i]
+        best[i] = max(best[i], score)
+        best[j] = max(best[j], score)
+
+    clusters = defaultdict(list)
+    for i in range(len(entities)):
+        clusters[union_find.find(i)].append(i)
+
+    results = []
+    for members in clusters.values():
+        keys = sorted(f"{entities[i]['key'][0]}:{entities[i]['key'][1]}" for i in members)
+        cluster_id = 'c' + hashlib.sha1(keys[0].encode('utf-8')).hexdigest()[:12]
+        for i in members:
+            entity = entities[i]
+            latest = max(entity['records'], key=lambda r: r.get('snapshot') or '')
+            results.append({
+                'cluster_id': cluster_id,
+                'confidence': round(best[i], 3) if len(members) > 1 else 1.0,
+                'hospital': entity['key'][0],
+                'doctor_id': entity['key'][1],
+                'name': latest.get('name'),
+                'department': latest.get('department'),
+                'snapshots': sorted({r.get('snapshot') for r in entity['records'] if r.get('snapshot')}),
+            })
+    results.sort(key=lambda r: (r['cluster_id'], r['hospital'], r['doctor_id']))
+
+    stats = {
+        'records': len(records),
+        'doctors': len(entities),
+        'candidate_pairs': len(compared),
+        'skipped_blocks': skipped_blocks,
+        'clusters': len(clusters),
+        'multi_hospital_clusters': sum(1 for members in clusters.values()
+                                       if len({entities[i]['key'][0] for i in members}) > 1),
+    }
+    return results, stats
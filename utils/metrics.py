@@ -0,0 +1,234 @@
+import functools
+import json
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from utils.utils import _generate_filenames
+
+# 요청 지연 히스토그램 구간(초), Prometheus histogram의 le 값
+LATENCY_BUCKETS = [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+
+_lock = threading.Lock()
+_started_at = datetime.now().isoformat(timespec='seconds')
+_hosts = defaultdict(lambda: {
+    'requests': 0, 'status': defaultdict(int), 'bytes': 0, 'latencies': [], 'wait_seconds': 0.0, 'retries': 0,
+    'cache_hits': 0,
+})
+_parse = defaultdict(lambda: {'count': 0, 'seconds': 0.0, 'max': 0.0})
+_stages = []
+# 단계별 네트워크/파싱 시간 비교용 누적값 (run_stage 시작/끝의 차이로 계산)
+_totals = {'request_seconds': 0.0, 'wait_seconds': 0.0, 'parse_seconds': 0.0}
+
+
+def record_request(host, status, nbytes, latency, wait=0.0):
+    """
+    fetch 계층이 보낸 요청 하나를 기록합니다.
+    - status: HTTP 상태 코드, 연결 에러/타임아웃은 'error'
+    - wait: 호스트별 동시 요청 상한/요청 속도 제한 때문에 요청을 보내기 전에 기다린 시간
+    """
+    with _lock:
+        entry = _hosts[host]
+        entry['requests'] += 1
+        entry['status'][str(status)] += 1
+        entry['bytes'] += nbytes
+        entry['latencies'].append(latency)
+        entry['wait_seconds'] += wait
+        _totals['request_seconds'] += latency
+        _totals['wait_seconds'] += wait
+
+
+def record_retry(host):
+    with _lock:
+        _hosts[host]['retries'] += 1
+
+
+def record_cache_hit(host):
+    with _lock:
+        _hosts[host]['cache_hits'] += 1
+
+
+def timed(page_type):
+    """
+    파서 함수에 붙여 페이지 종류별 파싱 시간을 기록하는 데코레이터
+    - page_type: 'snuh.doctor_detail'처럼 bench/bench_parsers.py의 케이스 이름과 같은 이름을 사용
+    """
+    def decorator(parse_fn):
+        @functools.wraps(parse_fn)
+        def wrapped(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return parse_fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with _lock:
+                    entry = _parse[page_type]
+                    entry['count'] += 1
+                    entry['seconds'] += elapsed
+                    entry['max'] = max(entry['max'], elapsed)
+                    _totals['parse_seconds'] += elapsed
+        return wrapped
+    return decorator
+
+
+def totals():
+    """지금까지 응답 대기/속도 제한 대기/파싱 시간 합계를 반환합니다. (단계 시작/끝에서 차이를 구하는 용도)"""
+    with _lock:
+        return dict(_totals)
+
+
+def record_stage(stage_name, items, records, requests, elapsed, start_totals):
+    """
+    run_stage 한 번의 결과(작업 수, 결과 레코드 수, 요청 수, 소요 시간, 네트워크/파싱 시간)를 기록합니다.
+    - 같은 이름의 단계가 여러 번 실행되면(큐 작업자 모드의 '큐 작업' 등) 한 항목에 합산하고 'runs'로 실행 횟수를 셈
+      (Prometheus에 같은 라벨의 시계열이 중복으로 나가지 않도록)
+    """
+    end_totals = totals()
+    with _lock:
+        entry = next((s for s in _stages if s['stage'] == stage_name), None)
+        if entry is None:
+            entry = {'stage': stage_name, 'runs': 0, 'items': 0, 'records': 0, 'requests': 0, 'seconds': 0.0,
+                     'records_per_second': 0.0, 'request_seconds': 0.0, 'wait_seconds': 0.0, 'parse_seconds': 0.0}
+            _stages.append(entry)
+        entry['runs'] += 1
+        entry['items'] += items
+        entry['records'] += records
+        entry['requests'] += requests
+        entry['seconds'] = round(entry['seconds'] + elapsed, 3)
+        entry['records_per_second'] = round(entry['records'] / entry['seconds'], 2) if entry['seconds'] > 0 else 0.0
+        # 작업 스레드들이 응답을 기다린 시간, 속도 제한으로 요청 전에 기다린 시간, 파싱한 시간의 합 (가장 큰 쪽이 병목)
+        for key in ('request_seconds', 'wait_seconds', 'parse_seconds'):
+            entry[key] = round(entry[key] + end_totals[key] - start_totals[key], 3)
+
+
+def _percentile(sorted_values, q):
+    """(내부 헬퍼 함수) 정렬된 값 목록의 q 분위수 (nearest-rank)"""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
+
+
+def summary(hospital=None, worker=None):
+    """이번 실행의 지표를 JSON으로 저장할 수 있는 딕셔너리로 반환합니다. (지연 시간은 ms, worker: 큐 작업자 이름)"""
+    with _lock:
+        hosts = {}
+        for host, entry in sorted(_hosts.items()):
+            latencies = sorted(entry['latencies'])
+            hosts[host] = {
+                'requests': entry['requests'],
+                'status_codes': dict(sorted(entry['status'].items())),
+                'bytes': entry['bytes'],
+                'wait_seconds': round(entry['wait_seconds'], 3),
+                'retries': entry['retries'],
+                'cache_hits': entry['cache_hits'],
+                'latency_ms': {
+                    name: round(_percentile(latencies, q) * 1000, 1) if latencies else None
+                    for name, q in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99), ('max', 1.0))
+                },
+            }
+        parse = {
+            page: {'count': entry['count'], 'total_ms': round(entry['seconds'] * 1000, 1),
+                   'mean_ms': round(entry['seconds'] * 1000 / entry['count'], 2) if entry['count'] else None,
+                   'max_ms': round(entry['max'] * 1000, 2)}
+            for page, entry in sorted(_parse.items())
+        }
+        return {
+            'hospital': hospital,
+            'worker': worker,
+            'started_at': _started_at,
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+            'hosts': hosts,
+            'parse': parse,
+            'stages': [dict(s) for s in _stages],
+        }
+
+
+def _labels(**labels):
+    """(내부 헬퍼 함수) Prometheus 라벨 문자열 ({a="1",b="2"})"""
+    escaped = {key: str(value).replace('\\', '\\\\').replace('"', '\\"')
+               for key, value in labels.items() if value is not None}
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped.items()) + '}'
+
+
+def to_prometheus(hospital=None, worker=None):
+    """
+    이번 실행의 지표를 Prometheus 텍스트 형식(node_exporter textfile collector에서 읽는 형식)으로 반환합니다.
+    - worker: 큐 작업자 이름 (있으면 모든 시계열에 worker 라벨을 붙여 다른 프로세스의 지표와 겹치지 않게 함)
+    """
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for suffix, labels, value in samples:
+            lines.append(f'{name}{suffix}{_labels(hospital=hospital, worker=worker, **labels)} {value}')
+
+    with _lock:
+        hosts = sorted(_hosts.items())
+        metric('crawl_requests_total', 'counter', 'HTTP requests sent, by host and status code',
+               [('', {'host': host, 'status': status}, count)
+                for host, entry in hosts for status, count in sorted(entry['status'].items())])
+        metric('crawl_response_bytes_total', 'counter', 'Response body bytes received',
+               [('', {'host': host}, entry['bytes']) for host, entry in hosts])
+        metric('crawl_rate_limit_wait_seconds_total', 'counter', 'Time spent waiting for the per-host limits before sending',
+               [('', {'host': host}, round(entry['wait_seconds'], 6)) for host, entry in hosts])
+        metric('crawl_retries_total', 'counter', 'Requests retried after a failure',
+               [('', {'host': host}, entry['retries']) for host, entry in hosts])
+        metric('crawl_cache_hits_total', 'counter', 'Responses served from the disk cache without a request',
+               [('', {'host': host}, entry['cache_hits']) for host, entry in hosts])
+
+        histogram = []
+        for host, entry in hosts:
+            latencies = entry['latencies']
+            for bound in LATENCY_BUCKETS:
+                histogram.append(('_bucket', {'host': host, 'le': bound}, sum(1 for v in latencies if v <= bound)))
+            histogram.append(('_bucket', {'host': host, 'le': '+Inf'}, len(latencies)))
+            histogram.append(('_sum', {'host': host}, round(sum(latencies), 6)))
+            histogram.append(('_count', {'host': host}, len(latencies)))
+        metric('crawl_request_duration_seconds', 'histogram', 'HTTP request latency', histogram)
+
+        parse = sorted(_parse.items())
+        metric('crawl_parse_duration_seconds', 'summary', 'Time spent parsing pages, by page type',
+               [sample for page, entry in parse for sample in (
+                   ('_sum', {'page': page}, round(entry['seconds'], 6)),
+                   ('_count', {'page': page}, entry['count']))])
+
+        stages = [dict(s) for s in _stages]
+        metric('crawl_stage_runs', 'gauge', 'Times each stage ran (repeated stages are summed into one series)',
+               [('', {'stage': s['stage']}, s['runs']) for s in stages])
+        metric('crawl_stage_duration_seconds', 'gauge', 'Wall time of each stage',
+               [('', {'stage': s['stage']}, s['seconds']) for s in stages])
+        metric('crawl_stage_records', 'gauge', 'Records produced by each stage',
+               [('', {'stage': s['stage']}, s['records']) for s in stages])
+        metric('crawl_stage_records_per_second', 'gauge', 'Records per second of each stage',
+               [('', {'stage': s['stage']}, s['records_per_second']) for s in stages])
+        metric('crawl_stage_request_seconds', 'gauge', 'Sum of request latency inside each stage',
+               [('', {'stage': s['stage']}, s['request_seconds']) for s in stages])
+        metric('crawl_stage_wait_seconds', 'gauge', 'Sum of rate limit wait inside each stage',
+               [('', {'stage': s['stage']}, s['wait_seconds']) for s in stages])
+        metric('crawl_stage_parse_seconds', 'gauge', 'Sum of parse time inside each stage',
+               [('', {'stage': s['stage']}, s['parse_seconds']) for s in stages])
+    return '\n'.join(lines) + '\n'
+
+
+def save_metrics(base_name, hospital, args, worker=None):
+    """
+    --metrics 옵션이 있으면 이번 실행의 지표를 결과 파일 옆에 저장합니다.
+    - '{base_name}_metrics_{날짜}.json': 실행 요약 (호스트별 요청/상태 코드/바이트/지연 p50·p95·p99/속도 제한 대기, 페이지별 파싱 시간, 단계별 처리량)
+    - '{base_name}_metrics_{날짜}.prom': 같은 내용의 Prometheus 텍스트 형식
+    - worker(큐 작업자 이름)가 있으면 파일 이름 끝에 '_worker-{이름}'을 붙여 작업을 등록한 프로세스/다른 작업자의 파일을 덮어쓰지 않음
+    """
+    if not getattr(args, 'metrics', False):
+        return
+    json_filename, _ = _generate_filenames(base_name)
+    base = json_filename.replace('_crawling_', '_metrics_')[:-len('.json')]
+    if worker:
+        base += '_worker-' + re.sub(r'[^0-9A-Za-z_.-]', '-', worker)
+    with open(base + '.json', 'w', encoding='utf-8') as f:
+        json.dump(summary(hospital, worker), f, ensure_ascii=False, indent=2)
+    with open(base + '.prom', 'w', encoding='utf-8') as f:
+        f.write(to_prometheus(hospital, worker))
+    print(f"📊 실행 지표를 '{base}.json', '{base}.prom' 파일로 저장했습니다.")
@@ -0,0 +1,78 @@
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from utils.engine import mark_failed
+
+# 첫 페이지 다음 페이지들을 동시에 요청할 개수 (실제 동시 요청 수는 utils.engine의 호스트별 상한을 따름)
+PAGE_CONCURRENCY = 4
+# 전체 페이지 수를 알 수 없을 때 끝없이 요청하지 않도록 두는 상한
+MAX_PAGES = 200
+
+
+def page_count_from_links(content, param):
+    """
+    목록 HTML의 페이지 이동 링크에서 가장 큰 페이지 번호를 찾습니다. (링크가 없으면 None)
+    - '?{param}=N' 형태의 링크와 fn_link_page(N)/linkPage(N)/goPage(N) 형태의 스크립트 호출을 모두 확인
+    """
+    text = content.decode('utf-8', errors='replace') if isinstance(content, bytes) else content
+    pattern = rf'[?&]{re.escape(param)}=(\d+)|(?:fn_link_page|linkPage|goPage)\(\s*[\'"]?(\d+)'
+    numbers = [int(a or b) for a, b in re.findall(pattern, text)]
+    return max(numbers) if numbers else None
+
+
+def page_count(total_count, page_items):
+    """
+    전체 항목 수와 한 페이지에 실제로 들어온 항목으로 전체 페이지 수를 계산합니다.
+    - 요청한 페이지 크기(pagePerNum) 대신 서버가 돌려준 크기로 나누므로, 서버가 페이지 크기를 더 작게 제한해도 페이지를 빠뜨리지 않음
+    - fetch_pages는 첫 페이지의 값만 사용하므로 마지막 페이지처럼 짧은 페이지로 계산한 값은 쓰이지 않음
+    """
+    return math.ceil(total_count / len(page_items)) if page_items else 0
+
+
+def fetch_pages(fetch_page, parse_page, name='', concurrency=PAGE_CONCURRENCY, max_pages=MAX_PAGES):
+    """
+    페이지로 나뉜 목록을 모두 가져와 입력 순서(페이지 순서)대로 이어 붙인 리스트를 반환합니다.
+    - fetch_page(page) -> 응답 본문(bytes), parse_page(content) -> (항목 리스트, 전체 페이지 수 또는 None)
+    - 첫 페이지 응답 하나로 전체 페이지 수를 알아내고(그 응답은 다시 요청하지 않음), 나머지 페이지는 동시에 요청
+    - 전체 페이지 수를 알 수 없으면 한 페이지씩 차례로 요청하고, 첫 페이지보다 짧은 페이지(마지막 페이지)가 나오면
+      더 요청하지 않음. 빈 페이지나 첫 페이지와 같은 페이지가 나와도 멈춤
+      (마지막 페이지를 넘기면 첫 페이지를 다시 보여주는 사이트 대비)
+    - 첫 페이지 요청 에러는 호출한 쪽으로 전달하고, 나머지 페이지의 에러(요청 에러, 응답 파싱 에러)는 출력 후 그 페이지만 건너뜀
+      (건너뛴 페이지가 있으면 호출한 작업을 요청 실패로 표시해 run_stage가 단계 끝에서 다시 시도)
+    """
+    first_items, total_pages = parse_page(fetch_page(1))
+    if not first_items:
+        return []
+
+    failed_pages = []
+
+    def load(page):
+        try:
+            items, _ = parse_page(fetch_page(page))
+            return items
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            # 요청 에러뿐 아니라 응답 형식이 깨진 페이지(JSON 파싱 실패, 키 없음)도 그 페이지만 건너뜀
+            print(f"      - {name} {page}페이지 처리 중 에러: {e}")
+            failed_pages.append(page)
+            return None
+
+    pages = [first_items]
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        if total_pages is not None:
+            last = min(total_pages, max_pages)
+            pages.extend(items for items in pool.map(load, range(2, last + 1)) if items)
+        else:
+            # 미리 여러 페이지를 요청하면 마지막 페이지 뒤의 빈 요청이 늘어나므로 한 페이지 앞만 확인
+            page = 2
+            while page <= max_pages and len(pages[-1]) >= len(first_items):
+                items = load(page)
+                if not items or items[0] == first_items[0]:
+                    break
+                pages.append(items)
+                page += 1
+    if failed_pages:
+        mark_failed()
+    return [item for items in pages for item in items]
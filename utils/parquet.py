@@ -0,0 +1,117 @@
+import glob
+import threading
+from datetime import date
+
+from utils.records import normalize_record
+from utils.utils import _generate_filenames, output_date
+
+ROW_GROUP_SIZE = 1000
+
+
+def _require_pyarrow():
+    """(내부 헬퍼 함수) pyarrow는 Parquet 저장에만 필요하므로 사용할 때 불러옵니다."""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet 저장을 사용하려면 'pip install pyarrow'가 필요합니다.")
+    return pyarrow, pyarrow.parquet
+
+
+def snapshot_schema():
+    """모든 병원 스냅샷이 공유하는 고정 스키마 (병원/부서는 dictionary 인코딩, 학력/경력은 list 컬럼)"""
+    pa, _ = _require_pyarrow()
+    dict_string = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('snapshot_date', pa.date32()),
+        ('hospital', dict_string),
+        ('department', dict_string),
+        ('doctor_id', pa.string()),
+        ('name', pa.string()),
+        ('position', pa.string()),
+        ('specialty', pa.string()),
+        ('detail_url', pa.string()),
+        ('education', pa.list_(pa.string())),
+        ('career', pa.list_(pa.string())),
+    ])
+
+
+def parquet_filename(base_name):
+    """'{base_name}_crawling_{yymmdd}.parquet' 파일명을 만듭니다."""
+    json_filename, _ = _generate_filenames(base_name)
+    return json_filename[:-len('.json')] + '.parquet'
+
+
+class ParquetSnapshotWriter:
+    """
+    최종 레코드를 공통 스키마로 바꿔 Parquet 파일에 row group 단위로 추가하는 writer
+    - 레코드가 들어오는 대로 버퍼에 모으고 row_group_size마다 한 번씩 기록
+    """
+
+    def __init__(self, path, hospital, snapshot_date=None, row_group_size=ROW_GROUP_SIZE):
+        pa, pq = _require_pyarrow()
+        self._pa = pa
+        self.path = path
+        self.hospital = hospital
+        self.snapshot_date = snapshot_date or date.today()
+        self.row_group_size = row_group_size
+        self.count = 0
+        self.schema = snapshot_schema()
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, record):
+        row = normalize_record(self.hospital, record)
+        row['snapshot_date'] = self.snapshot_date
+        with self._lock:
+            self._buffer.append(row)
+            if len(self._buffer) >= self.row_group_size:
+                self._flush()
+
+    def wrap(self, worker, transform=None):
+        """3단계 작업 함수 worker(doctor)의 결과를 바로 추가하도록 감싼 함수를 반환합니다."""
+        def wrapped(doctor):
+            record = worker(doctor)
+            if record is not None:
+                self.write(transform(record) if transform else record)
+            return record
+        return wrapped
+
+    def _flush(self):
+        """(내부 헬퍼 함수) 버퍼의 레코드를 row group 하나로 기록합니다."""
+        if not self._buffer:
+            return
+        table = self._pa.Table.from_pylist(self._buffer, schema=self.schema)
+        self._writer.write_table(table)
+        self.count += len(self._buffer)
+        self._buffer = []
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._writer.close()
+        print(f"✅ 성공! {self.count}건의 데이터가 '{self.path}' 파일(Parquet)로 저장되었습니다.")
+
+
+def open_parquet(base_name, hospital, args):
+    """--parquet 옵션이 있으면 Parquet writer를 열어 반환하고, 없으면 None을 반환합니다."""
+    if not args.parquet:
+        return None
+    path = parquet_filename(base_name)
+    print(f"\n💾 결과를 Parquet 파일({path})로 함께 저장합니다...")
+    # 재파싱(--reparse)이면 오늘 날짜 대신 보관본의 수집 날짜를 snapshot_date로 기록 (파일명 날짜와 같음)
+    return ParquetSnapshotWriter(path, hospital, output_date())
+
+
+def read_snapshots(pattern, columns=None, filter=None):
+    """
+    여러 Parquet 스냅샷(예: '*_crawling_*.parquet')을 하나의 Arrow Table로 읽습니다.
+    - columns로 필요한 컬럼만, filter(pyarrow.dataset 표현식)로 필요한 행만 읽어 빠르게 스캔
+    """
+    _require_pyarrow()
+    import pyarrow.dataset as ds
+    paths = sorted(glob.glob(pattern))
+    if not paths:
+        return None
+    return ds.dataset(paths, format='parquet', schema=snapshot_schema()).to_table(columns=columns, filter=filter)
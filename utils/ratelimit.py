@@ -0,0 +1,158 @@
+import threading
+import time
+from collections import deque
+
+from utils.config import host_settings
+
+# 서버가 과부하 신호로 보내는 상태 코드
+BACKOFF_STATUS = {429, 503}
+
+
+class AdaptiveRateLimiter:
+    """
+    호스트 하나의 요청 속도를 조절하는 토큰 버킷 (AIMD 방식)
+    - 응답이 정상이고 지연 시간이 평소 수준이면 초당 요청 수를 조금씩 올림 (가산 증가)
+    - 429/503, 연결 끊김, 지연 시간 급증 시 요청 속도를 절반으로 줄임 (승산 감소)
+    """
+
+    def __init__(self, rate=3.0, min_rate=0.5, max_rate=20.0, burst=4,
+                 increase=0.5, decrease=0.5, latency_factor=2.0):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._last_backoff = 0.0
+        self._baseline = None
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """토큰이 생길 때까지 기다린 뒤 하나를 소비합니다."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def record(self, latency=None, status=None, error=False):
+        """요청 결과를 반영해 요청 속도를 조절합니다."""
+        with self._lock:
+            if error or status in BACKOFF_STATUS:
+                self._backoff()
+                return
+            if latency is None:
+                return
+            if self._baseline is None:
+                self._baseline = latency
+            if latency > self._baseline * self.latency_factor:
+                self._backoff()
+            else:
+                # 평소 지연 시간은 정상 응답으로만 천천히 갱신
+                self._baseline = self._baseline * 0.9 + latency * 0.1
+                # 초당 rate건이 성공하면 약 increase만큼 증가
+                self.rate = min(self.max_rate, self.rate + self.increase / max(self.rate, 1.0))
+
+    def _backoff(self):
+        """(내부 헬퍼 함수) 요청 속도를 줄입니다. 한 번의 장애로 연속 감소하지 않도록 1초에 한 번만 적용합니다."""
+        now = time.monotonic()
+        if now - self._last_backoff < 1.0:
+            return
+        self._last_backoff = now
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        self._tokens = min(self._tokens, 0.0)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(host):
+    """호스트별 limiter를 반환합니다. 처음 요청될 때 설정 파일(crawl_config.json) 값으로 생성됩니다."""
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            settings = host_settings(host)
+            limiter = AdaptiveRateLimiter(
+                rate=settings.get('rate', 3.0),
+                min_rate=settings.get('min_rate', 0.5),
+                max_rate=settings.get('max_rate', 20.0),
+                burst=settings.get('burst', 4),
+            )
+            _limiters[host] = limiter
+        return limiter
+
+
+class CircuitBreaker:
+    """
+    호스트 하나의 최근 요청 결과를 보고, 에러율이 급증하면 그 호스트로 가는 요청을 잠시 멈추는 차단기
+    - 최근 window건 중 min_requests건 이상이 쌓였고 에러율이 threshold 이상이면 cooldown초 동안 요청을 멈춤
+    - 멈춘 뒤에도 곧바로 다시 에러율이 높으면 멈추는 시간을 두 배씩 늘림 (최대 max_cooldown초)
+    - 에러: 연결 에러/타임아웃, 재시도 대상 상태 코드(429/5xx)
+    """
+
+    def __init__(self, host, window=20, min_requests=10, threshold=0.5, cooldown=30.0, max_cooldown=300.0):
+        self.host = host
+        self.min_requests = min_requests
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.trips = 0
+
+        self._results = deque(maxlen=window)
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """차단 중이면 차단이 풀릴 때까지 기다립니다."""
+        while True:
+            with self._lock:
+                remaining = self._open_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def record(self, ok):
+        """요청 결과(성공 여부)를 반영하고, 에러율이 기준을 넘으면 차단합니다."""
+        with self._lock:
+            self._results.append(ok)
+            if len(self._results) < self.min_requests:
+                return
+            error_rate = self._results.count(False) / len(self._results)
+            if error_rate < self.threshold:
+                self.trips = 0
+                return
+            if time.monotonic() < self._open_until:
+                return
+            pause = min(self.max_cooldown, self.cooldown * 2 ** self.trips)
+            self.trips += 1
+            self._open_until = time.monotonic() + pause
+            self._results.clear()
+        print(f"🚧 {self.host}: 최근 요청 에러율 {error_rate:.0%}, {pause:.0f}초 동안 요청을 멈춥니다.")
+
+
+_breakers = {}
+
+
+def get_breaker(host):
+    """호스트별 차단기를 반환합니다. 처음 요청될 때 설정 파일(crawl_config.json) 값으로 생성됩니다."""
+    with _limiters_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            settings = host_settings(host)
+            breaker = CircuitBreaker(
+                host,
+                threshold=settings.get('breaker_threshold', 0.5),
+                cooldown=settings.get('breaker_cooldown', 30.0),
+            )
+            _breakers[host] = breaker
+        return breaker
@@ -0,0 +1,121 @@
+import glob
+import json
+import os
+import re
+
+# 병원 코드 -> 병원 이름 (README의 '크롤링 가능한 병원' 목록과 동일)
+HOSPITALS = {
+    'ajou': '아주대학교병원',
+    'amc': '서울아산병원',
+    'smc': '삼성서울병원',
+    'snuh': '서울대학교병원',
+    'ys': '세브란스병원(신촌)',
+    'cmc': '가톨릭대학교 서울성모병원',
+    'gs': '강남세브란스병원',
+    'snubh': '분당서울대학교병원',
+}
+
+# 스크래퍼마다 다른 필드 이름 -> 공통 필드 이름 (앞에 있는 이름이 우선)
+FIELD_ALIASES = {
+    'name': ['이름', 'name', 'nm'],
+    'department': ['소속부서', 'department', '소속', '부서명', '소속진료과', 'deptNm'],
+    'position': ['직위', '직위/소속', 'ofcps'],
+    'specialty': ['전문분야', 'fields', '진료분야', '세부전공', 'clnicRealm'],
+    'doctor_id': ['profNo', 'drEmpId', 'drNo', 'empNo', 'DR_NO', 'sDrSid', '상세정보URL', '상세정보링크', 'detail_url'],
+    'detail_url': ['상세정보URL', '상세정보링크', 'detail_url'],
+}
+
+# 수집 실패/정보 없음을 나타내는 자리표시 문자열 (학력/경력이 없는 것으로 취급)
+PLACEHOLDERS = {'정보 없음', '상세 정보 조회 불가', 'ID 또는 부서코드가 없어 조회 불가', 'ID 없음', '링크 없음'}
+
+
+def _first(record, keys):
+    """(내부 헬퍼 함수) 후보 필드 중 처음으로 값이 있는 필드의 값을 문자열로 반환합니다."""
+    for key in keys:
+        value = record.get(key)
+        if value in (None, '') or (isinstance(value, str) and value in PLACEHOLDERS):
+            continue
+        return str(value)
+    return None
+
+
+def _as_lines(value):
+    """(내부 헬퍼 함수) 리스트 또는 줄바꿈 문자열로 된 학력/경력을 문자열 리스트로 바꿉니다."""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split('\n')
+    lines = (str(line).strip() for line in value)
+    return [line for line in lines if line and line not in PLACEHOLDERS]
+
+
+def normalize_record(hospital, record):
+    """
+    스크래퍼별로 모양이 다른 최종 레코드를 공통 스키마로 바꿉니다.
+    - 반환 필드: hospital, doctor_id, name, department, position, specialty, detail_url, education, career
+    - 학력/경력은 'profile' 안에 있든 최상위에 있든, 리스트든 줄바꿈 문자열이든 문자열 리스트로 통일
+    - 레코드에서 의료진 ID를 찾지 못하면 이름|부서를 doctor_id로 사용
+    """
+    profile = record.get('profile') if isinstance(record.get('profile'), dict) else {}
+    nested = record.get('학력및경력') if isinstance(record.get('학력및경력'), dict) else {}
+    normalized = {field: _first(record, keys) for field, keys in FIELD_ALIASES.items()}
+    normalized['hospital'] = hospital
+    normalized['education'] = _as_lines(profile.get('학력', nested.get('학력', record.get('학력'))))
+    normalized['career'] = _as_lines(profile.get('경력', nested.get('경력', record.get('경력'))))
+    if normalized['doctor_id'] is None:
+        normalized['doctor_id'] = f"{normalized['name']}|{normalized['department']}"
+    return normalized
+
+
+# 스크래퍼가 저장한 결과 파일 ('{base_name}_crawling_{yymmdd}.json/.jsonl[.gz|.zst]/.parquet')
+SNAPSHOT_PATTERNS = ['*_crawling_*.json', '*_crawling_*.jsonl', '*_crawling_*.jsonl.gz',
+                     '*_crawling_*.jsonl.zst', '*_crawling_*.parquet']
+_SNAPSHOT_NAME = re.compile(r'^(?P<base>.+)_crawling_(?P<date>\d{6})\.(?:json|jsonl(?:\.gz|\.zst)?|parquet)$')
+
+
+def snapshot_info(path):
+    """
+    결과 파일 이름에서 (병원 코드, 스냅샷 날짜 'yymmdd')를 알아냅니다. 알 수 없으면 병원 코드는 None
+    - 파일 이름 끝의 병원 코드(예: '_snuh')를 먼저 보고, 없으면 병원 이름으로 시작하는지 확인 (분당서울대학교병원_의료진)
+    """
+    match = _SNAPSHOT_NAME.match(os.path.basename(path))
+    if not match:
+        return None, None
+    base = match.group('base')
+    hospital = next((code for code in HOSPITALS if base.endswith(f'_{code}')), None)
+    if hospital is None:
+        hospital = next((code for code, name in HOSPITALS.items() if base.startswith(name.replace(' ', '_'))), None)
+    return hospital, match.group('date')
+
+
+def find_snapshots(patterns=None):
+    """패턴(glob)에 맞는 결과 파일 목록을 반환합니다. (기본: 현재 폴더의 모든 스크래퍼 결과 파일)"""
+    paths = set()
+    for pattern in patterns or SNAPSHOT_PATTERNS:
+        paths.update(glob.glob(pattern))
+    return sorted(paths)
+
+
+def iter_snapshot_records(paths):
+    """
+    여러 결과 파일의 레코드를 공통 스키마로 바꿔 하나씩 돌려줍니다. (병원을 알 수 없는 파일은 건너뜀)
+    - 각 레코드에 'snapshot'(yymmdd)과 'source'(파일 경로) 필드를 추가
+    """
+    for path in paths:
+        hospital, snapshot = snapshot_info(path)
+        if hospital is None:
+            print(f"   - '{path}'의 병원을 알 수 없어 건너뜁니다.")
+            continue
+        if path.endswith('.parquet'):
+            from utils.parquet import read_snapshots
+            rows = read_snapshots(path).to_pylist()
+        elif path.endswith('.json'):
+            with open(path, 'r', encoding='utf-8') as f:
+                rows = (normalize_record(hospital, record) for record in json.load(f))
+        else:
+            from utils.jsonl import iter_jsonl
+            rows = (normalize_record(hospital, record) for record in iter_jsonl(path))
+        for row in rows:
+            row['snapshot'] = snapshot
+            row['source'] = path
+            yield row
@@ -0,0 +1,176 @@
+import json
+import re
+import sqlite3
+import unicodedata
+
+from utils.incremental import fingerprint
+
+DEFAULT_INDEX_PATH = 'doctor_search.sqlite'
+FIELDS = ['name', 'department', 'specialty', 'education', 'career']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    hospital TEXT NOT NULL,
+    doctor_id TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    name TEXT,
+    department TEXT,
+    specialty TEXT,
+    education TEXT,
+    career TEXT,
+    first_snapshot TEXT,
+    last_snapshot TEXT,
+    UNIQUE (hospital, doctor_id, content_hash)
+);
+CREATE INDEX IF NOT EXISTS documents_hospital ON documents (hospital);
+CREATE VIRTUAL TABLE IF NOT EXISTS doctor_fts USING fts5(name, department, specialty, education, career,
+                                                         tokenize = 'unicode61');
+CREATE TABLE IF NOT EXISTS indexed_files (
+    path TEXT PRIMARY KEY,
+    mtime REAL,
+    size INTEGER
+);
+"""
+
+_WORD = re.compile(r'[0-9a-z]+|[가-힣]+')
+_HANGUL = re.compile(r'[가-힣]')
+
+
+def _normalize(text):
+    """(내부 헬퍼 함수) 전각/반각, 대소문자 차이를 없앱니다."""
+    return unicodedata.normalize('NFKC', text or '').lower()
+
+
+def ngrams(text):
+    """
+    색인/검색용 토큰 문자열을 만듭니다.
+    - 한글은 띄어쓰기와 상관없이 찾을 수 있도록 두 글자씩 겹쳐 자름 ('대한내과학회' -> '대한 한내 내과 과학 학회')
+    - 영문/숫자는 단어 단위 ('Johns Hopkins' -> 'johns hopkins')
+    """
+    grams = []
+    for word in _WORD.findall(_normalize(text)):
+        if _HANGUL.match(word) and len(word) > 1:
+            grams.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            grams.append(word)
+    return ' '.join(grams)
+
+
+def build_query(query, field=None):
+    """
+    검색어를 FTS5 MATCH 식으로 바꿉니다. 띄어쓰기로 나눈 검색어는 모두 포함해야 하고(AND), 각 검색어는 연속된 문자열로 찾음
+    - field: 'career'처럼 특정 필드에서만 찾을 때 지정
+    """
+    phrases = []
+    for term in query.split():
+        grams = ngrams(term)
+        if grams:
+            phrase = '"' + grams.replace('"', '') + '"'
+            phrases.append(f'{field} : {phrase}' if field else phrase)
+    return ' AND '.join(phrases)
+
+
+def _as_text(value):
+    """(내부 헬퍼 함수) 학력/경력 리스트는 줄바꿈으로 이어 색인합니다."""
+    if isinstance(value, list):
+        return '\n'.join(value)
+    return value or ''
+
+
+class SearchIndex:
+    """
+    모든 병원 결과의 이름/진료과/전문분야/학력/경력을 담는 SQLite FTS5 전문 검색 색인
+    - 한글은 2-gram으로 색인해 '내과', '존스홉킨스', '대한내과학회' 같은 부분 문자열도 색인으로 바로 찾음
+    - 같은 의료진의 같은 내용은 스냅샷이 여러 개여도 한 번만 색인하고 처음/마지막 스냅샷만 갱신 (내용이 바뀌면 새 버전 추가)
+    - 이미 색인한 결과 파일은 수정 시각/크기가 같으면 다시 읽지 않음
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+
+    def add(self, record):
+        """공통 스키마 레코드(utils.records.normalize_record + 'snapshot') 하나를 색인합니다. 새 버전이면 True를 반환합니다."""
+        texts = {field: _as_text(record.get(field)) for field in FIELDS}
+        content_hash = fingerprint(texts)
+        snapshot = record.get('snapshot')
+        cursor = self._conn.execute(
+            'INSERT OR IGNORE INTO documents (hospital, doctor_id, content_hash, name, department, specialty, '
+            'education, career, first_snapshot, last_snapshot) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (record['hospital'], record['doctor_id'], content_hash, texts['name'], texts['department'],
+             texts['specialty'], json.dumps(record.get('education') or [], ensure_ascii=False),
+             json.dumps(record.get('career') or [], ensure_ascii=False), snapshot, snapshot))
+        if cursor.rowcount:
+            self._conn.execute('INSERT INTO doctor_fts (rowid, name, department, specialty, education, career) '
+                               'VALUES (?, ?, ?, ?, ?, ?)',
+                               (cursor.lastrowid, *(ngrams(texts[field]) for field in FIELDS)))
+            return True
+        if snapshot:
+            self._conn.execute(
+                'UPDATE documents SET first_snapshot = MIN(COALESCE(first_snapshot, ?), ?), '
+                'last_snapshot = MAX(COALESCE(last_snapshot, ?), ?) '
+                'WHERE hospital = ? AND doctor_id = ? AND content_hash = ?',
+                (snapshot, snapshot, snapshot, snapshot, record['hospital'], record['doctor_id'], content_hash))
+        return False
+
+    def is_indexed(self, path, mtime, size):
+        row = self._conn.execute('SELECT mtime, size FROM indexed_files WHERE path = ?', (path,)).fetchone()
+        return row == (mtime, size)
+
+    def mark_indexed(self, path, mtime, size):
+        self._conn.execute('INSERT OR REPLACE INTO indexed_files (path, mtime, size) VALUES (?, ?, ?)',
+                           (path, mtime, size))
+
+    def commit(self):
+        self._conn.commit()
+
+    def optimize(self):
+        """색인 세그먼트를 하나로 합쳐 검색 속도를 높입니다. (색인 후 한 번 호출)"""
+        self._conn.execute("INSERT INTO doctor_fts (doctor_fts) VALUES ('optimize')")
+        self._conn.commit()
+
+    def search(self, query, hospital=None, field=None, limit=20, all_versions=False):
+        """
+        검색어가 들어간 의료진을 관련도 순으로 반환합니다.
+        - 각 결과: {hospital, doctor_id, name, department, specialty, first_snapshot, last_snapshot, lines(검색어가 들어간 학력/경력 줄)}
+        - all_versions=False이면 의료진마다 가장 관련도가 높은 버전 하나만 반환
+        """
+        match = build_query(query, field)
+        if not match:
+            return []
+        sql = ('SELECT d.hospital, d.doctor_id, d.name, d.department, d.specialty, d.education, d.career, '
+               'd.first_snapshot, d.last_snapshot FROM doctor_fts JOIN documents d ON d.id = doctor_fts.rowid '
+               'WHERE doctor_fts MATCH ?')
+        params = [match]
+        if hospital:
+            sql += ' AND d.hospital = ?'
+            params.append(hospital)
+        sql += ' ORDER BY rank LIMIT ?'
+        params.append(limit if all_versions else limit * 5)
+
+        terms = [re.sub(r'\s+', '', _normalize(term)) for term in query.split()]
+        results = []
+        seen = set()
+        for row in self._conn.execute(sql, params):
+            hospital_code, doctor_id, name, department, specialty, education, career, first, last = row
+            if not all_versions:
+                if (hospital_code, doctor_id) in seen:
+                    continue
+                seen.add((hospital_code, doctor_id))
+            lines = [line for line in json.loads(education) + json.loads(career)
+                     if any(term in re.sub(r'\s+', '', _normalize(line)) for term in terms)]
+            results.append({'hospital': hospital_code, 'doctor_id': doctor_id, 'name': name, 'department': department,
+                            'specialty': specialty, 'first_snapshot': first, 'last_snapshot': last, 'lines': lines})
+            if len(results) >= limit:
+                break
+        return results
+
+    def count(self):
+        return self._conn.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+
+    def close(self):
+        self._conn.commit()
+        self._conn.close()
@@ -0,0 +1,77 @@
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.config import host_settings
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36',
+    'Connection': 'keep-alive',
+}
+# 기본 timeout(초): 연결 timeout은 짧게, 응답(read) timeout은 느린 페이지를 고려해 길게
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_TIMEOUT = 15
+
+_sessions = {}
+_adapter_classes = {}
+_lock = threading.Lock()
+
+
+class PooledSession(requests.Session):
+    """timeout을 지정하지 않은 요청에 기본 (연결, 응답) timeout을 적용하는 keep-alive 세션"""
+
+    def __init__(self, timeout=(DEFAULT_CONNECT_TIMEOUT, DEFAULT_TIMEOUT)):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def _host_of(url_or_host):
+    """(내부 헬퍼 함수) URL이 들어오면 호스트(netloc)만 뽑아냅니다."""
+    return urlparse(url_or_host).netloc if '://' in url_or_host else url_or_host
+
+
+def register_adapter(host, adapter_class):
+    """
+    특정 호스트의 세션에 사용할 HTTPAdapter 클래스를 등록합니다. (예: cmc의 LegacyCipherAdapter)
+    이미 만들어진 세션이 있으면 다음 get_session() 호출 때 새 어댑터로 다시 만듭니다.
+    """
+    host = _host_of(host)
+    with _lock:
+        _adapter_classes[host] = adapter_class
+        old = _sessions.pop(host, None)
+    if old is not None:
+        old.close()
+
+
+def get_session(url_or_host):
+    """호스트별로 하나씩 만들어 재사용하는 keep-alive 세션을 반환합니다. (커넥션 풀 크기 = 호스트 동시 요청 수)"""
+    host = _host_of(url_or_host)
+    with _lock:
+        session = _sessions.get(host)
+        if session is None:
+            settings = host_settings(host)
+            pool_size = settings.get('concurrency', 4)
+            session = PooledSession(timeout=(settings.get('connect_timeout', DEFAULT_CONNECT_TIMEOUT),
+                                             settings.get('timeout', DEFAULT_TIMEOUT)))
+            session.headers.update(DEFAULT_HEADERS)
+            adapter_class = _adapter_classes.get(host, HTTPAdapter)
+            adapter = adapter_class(pool_connections=1, pool_maxsize=pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[host] = session
+        return session
+
+
+def close_all():
+    """열려 있는 모든 세션의 커넥션을 정리합니다."""
+    with _lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
@@ -0,0 +1,78 @@
+import copy
+import threading
+
+from utils.engine import fetch_failed, mark_failed
+
+
+class _Call:
+    """(내부 헬퍼 클래스) 진행 중인 상세 요청 하나와 그 결과"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.failed = False
+
+
+class SingleFlight:
+    """
+    같은 의료진의 상세 수집을 한 번만 실행하고 결과를 모든 부서 행에 나눠 주는 래퍼
+    - 여러 부서에 소속된 의료진은 부서 행마다 같은 상세 페이지를 요청하므로 병원별 의사 ID(detail_key)로 묶음
+    - 같은 키를 동시에 요청하면 먼저 시작한 요청 하나만 실행하고 나머지는 그 결과를 기다림 (single-flight)
+    - 결과는 행마다 복사해서 돌려주므로 한 행의 상세 정보를 고쳐도 다른 행에 영향이 없음
+    - is_valid(결과)가 거짓이거나 재시도 후에도 요청이 실패한 결과는 기다리던 요청에만 전달하고 기억하지 않아 다음 행에서 다시 시도
+      (요청 실패는 기다리던 행에도 표시해 run_stage가 단계 끝에서 함께 다시 시도)
+    """
+
+    def __init__(self):
+        self.results = {}
+        self.fetched = 0
+        self.shared = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def wrap(self, fetch_details, key_fn, is_valid=bool):
+        """상세 수집 함수 fetch_details(doctor)를 감싸 key_fn(doctor)가 같은 의료진은 한 번만 요청하는 함수를 반환합니다."""
+        def wrapped(doctor):
+            key = key_fn(doctor)
+            if not key:
+                return fetch_details(doctor)
+            with self._lock:
+                if key in self.results:
+                    self.shared += 1
+                    return copy.deepcopy(self.results[key])
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+
+            if not leader:
+                call.done.wait()
+                if call.failed:
+                    mark_failed()
+                if call.error is not None:
+                    raise call.error
+                with self._lock:
+                    self.shared += 1
+                return copy.deepcopy(call.result)
+
+            try:
+                call.result = fetch_details(doctor)
+            except Exception as e:
+                call.error = e
+                raise
+            finally:
+                call.failed = fetch_failed()
+                with self._lock:
+                    del self._calls[key]
+                    self.fetched += 1
+                    if call.error is None and not call.failed and is_valid(call.result):
+                        self.results[key] = call.result
+                call.done.set()
+            return copy.deepcopy(call.result)
+        return wrapped
+
+    def report(self):
+        if self.shared:
+            print(f"🔗 여러 부서에 소속된 의료진: 상세 요청 {self.fetched}건으로 {self.fetched + self.shared}개 행을 채웠습니다. "
+                  f"(요청 {self.shared}건 절약)")
@@ -0,0 +1,260 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from itertools import groupby
+
+from utils.incremental import fingerprint
+from utils.records import normalize_record
+
+DEFAULT_STORE_PATH = 'crawl_store.sqlite'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS doctors (
+    hospital TEXT NOT NULL,
+    doctor_id TEXT NOT NULL,
+    name TEXT,
+    department TEXT,
+    position TEXT,
+    specialty TEXT,
+    detail_url TEXT,
+    education TEXT,
+    career TEXT,
+    record TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    version_since TEXT NOT NULL,
+    PRIMARY KEY (hospital, doctor_id)
+);
+CREATE INDEX IF NOT EXISTS doctors_hospital_department ON doctors (hospital, department);
+CREATE INDEX IF NOT EXISTS doctors_name ON doctors (name);
+CREATE TABLE IF NOT EXISTS doctor_departments (
+    hospital TEXT NOT NULL,
+    doctor_id TEXT NOT NULL,
+    department TEXT NOT NULL,
+    PRIMARY KEY (hospital, doctor_id, department)
+);
+CREATE INDEX IF NOT EXISTS doctor_departments_department ON doctor_departments (hospital, department);
+CREATE TABLE IF NOT EXISTS doctor_history (
+    hospital TEXT NOT NULL,
+    doctor_id TEXT NOT NULL,
+    valid_from TEXT NOT NULL,
+    valid_to TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    record TEXT NOT NULL,
+    PRIMARY KEY (hospital, doctor_id, valid_from)
+);
+"""
+
+# 이번 실행에서 받은 행을 의료진 단위로 합치기 전에 모아 두는 임시 테이블 (연결마다 따로 생기고 닫으면 사라짐)
+STAGING_SCHEMA = """
+CREATE TEMP TABLE IF NOT EXISTS staged (
+    hospital TEXT NOT NULL,
+    doctor_id TEXT NOT NULL,
+    department TEXT NOT NULL,
+    row TEXT NOT NULL,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS temp.staged_doctor ON staged (hospital, doctor_id);
+"""
+
+COLUMNS = ['hospital', 'doctor_id', 'name', 'department', 'position', 'specialty', 'detail_url',
+           'education', 'career', 'record', 'content_hash', 'first_seen', 'last_seen', 'version_since']
+
+
+def _join_unique(values):
+    """(내부 헬퍼 함수) 빈 값을 빼고 처음 나온 순서대로 중복 없이 ', '로 잇습니다. (값이 없으면 None)"""
+    unique = list(dict.fromkeys(value for value in values if value))
+    return ', '.join(unique) if unique else None
+
+
+def merge_rows(rows):
+    """
+    한 실행에서 같은 의료진이 여러 부서 행으로 나온 경우 (공통 스키마 행, 원본 레코드) 목록을 하나로 합칩니다.
+    - 부서 이름 순서로 정렬해 합치므로 행이 도착한 순서와 상관없이 항상 같은 결과
+    - 부서/전문분야는 모든 행의 값을 잇고, 나머지 필드와 원본 레코드는 첫 부서의 행을 사용
+    """
+    rows = sorted(rows, key=lambda pair: (pair[0]['department'] or '', fingerprint(pair[0])))
+    row, record = dict(rows[0][0]), rows[0][1]
+    row['department'] = _join_unique(r['department'] for r, _ in rows)
+    row['specialty'] = _join_unique(r['specialty'] for r, _ in rows)
+    departments = sorted({r['department'] for r, _ in rows if r['department']})
+    return row, record, departments
+
+
+def _row_to_dict(row):
+    """(내부 헬퍼 함수) doctors 테이블의 행을 딕셔너리로 바꿉니다. (학력/경력/원본 레코드는 JSON을 풀어서 반환)"""
+    entry = dict(zip(COLUMNS, row))
+    for field in ('education', 'career', 'record'):
+        entry[field] = json.loads(entry[field]) if entry[field] else None
+    return entry
+
+
+class DoctorStore:
+    """
+    병원별 의료진 레코드를 (병원, doctor_id) 키로 upsert하는 SQLite 저장소
+    - 레코드는 공통 스키마(utils.records.normalize_record)로 바꾼 뒤 내용 해시와 함께 저장
+    - 처음/마지막으로 수집된 시각(first_seen/last_seen)을 기록하고, 내용이 그대로면 last_seen만 갱신
+    - 내용이 바뀐 경우에만 이전 버전을 doctor_history에 남김 (같은 내용을 매일 다시 저장하지 않음)
+    - 여러 부서에 소속된 의료진은 실행 중에 받은 행을 임시 테이블에 모았다가 flush()에서 하나로 합쳐 비교
+      (행이 도착하는 순서에 따라 내용이 바뀐 것으로 보지 않음, 부서 목록은 doctor_departments에 보관)
+    - 병원/부서/이름에 인덱스가 있어 의료진 한 명 조회나 병원별 조회를 여러 스냅샷 파일을 읽지 않고 처리
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH, hospital=None):
+        self.path = path
+        self.hospital = hospital
+        self.stats = {'new': 0, 'changed': 0, 'unchanged': 0, 'duplicate': 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+        self._conn.executescript(STAGING_SCHEMA)
+
+    def add(self, hospital, record):
+        """이번 실행의 레코드 하나를 임시 테이블에 모읍니다. (flush()나 close()에서 의료진 단위로 저장)"""
+        row = normalize_record(hospital, record)
+        with self._lock:
+            self._conn.execute('INSERT INTO staged VALUES (?, ?, ?, ?, ?)',
+                               (hospital, row['doctor_id'], row['department'] or '',
+                                json.dumps(row, ensure_ascii=False),
+                                json.dumps(record, ensure_ascii=False, default=str)))
+
+    def flush(self, seen_at=None):
+        """모아 둔 행을 의료진마다 하나로 합쳐(merge_rows) upsert하고 임시 테이블을 비웁니다."""
+        seen_at = seen_at or datetime.now().isoformat(timespec='seconds')
+        # 의료진 순서로 정렬해 한 명씩 읽으므로 모아 둔 행 전체를 메모리에 올리지 않음
+        cursor = self._conn.cursor()
+        cursor.execute('SELECT hospital, doctor_id, row, record FROM staged ORDER BY hospital, doctor_id')
+        for (hospital, _), group in groupby(cursor, key=lambda staged: staged[:2]):
+            rows = [(json.loads(row), json.loads(record)) for _, _, row, record in group]
+            row, record, departments = merge_rows(rows)
+            self.upsert(hospital, row, record, departments, seen_at)
+            with self._lock:
+                self.stats['duplicate'] += len(rows) - 1
+        with self._lock:
+            self._conn.execute('DELETE FROM staged')
+            self._conn.commit()
+
+    def upsert(self, hospital, row, record, departments=(), seen_at=None):
+        """
+        공통 스키마 행 하나(의료진 한 명)를 저장하고 'new' / 'changed' / 'unchanged' 중 하나를 반환합니다.
+        - record: 원본 레코드 (버전 이력에 함께 보관), departments: 소속 부서 목록
+        """
+        content_hash = fingerprint(row)
+        seen_at = seen_at or datetime.now().isoformat(timespec='seconds')
+        values = {
+            **row,
+            'education': json.dumps(row['education'], ensure_ascii=False),
+            'career': json.dumps(row['career'], ensure_ascii=False),
+            'record': json.dumps(record, ensure_ascii=False, default=str),
+            'content_hash': content_hash,
+        }
+        key = (hospital, row['doctor_id'])
+        with self._lock:
+            current = self._conn.execute(
+                'SELECT content_hash, record, version_since FROM doctors WHERE hospital = ? AND doctor_id = ?',
+                key).fetchone()
+            if current is None:
+                status = 'new'
+                self._conn.execute(
+                    f"INSERT INTO doctors ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                    [values.get(column) for column in COLUMNS[:-3]] + [seen_at, seen_at, seen_at])
+            elif current[0] == content_hash:
+                status = 'unchanged'
+                self._conn.execute('UPDATE doctors SET last_seen = ? WHERE hospital = ? AND doctor_id = ?',
+                                   (seen_at, *key))
+            else:
+                status = 'changed'
+                old_hash, old_record, version_since = current
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO doctor_history (hospital, doctor_id, valid_from, valid_to, content_hash, record) '
+                    'VALUES (?, ?, ?, ?, ?, ?)', (*key, version_since, seen_at, old_hash, old_record))
+                self._update(values, seen_at, seen_at, key)
+            self._conn.execute('DELETE FROM doctor_departments WHERE hospital = ? AND doctor_id = ?', key)
+            self._conn.executemany('INSERT INTO doctor_departments VALUES (?, ?, ?)',
+                                   [(*key, department) for department in departments])
+            self.stats[status] += 1
+        return status
+
+    def _update(self, values, seen_at, version_since, key):
+        """(내부 헬퍼 함수) 현재 버전의 내용을 values로 바꿉니다. (호출하는 쪽에서 잠금을 잡고 있어야 함)"""
+        updated = COLUMNS[2:-3]
+        self._conn.execute(
+            f"UPDATE doctors SET {', '.join(f'{column} = ?' for column in updated)}, last_seen = ?, version_since = ? "
+            'WHERE hospital = ? AND doctor_id = ?',
+            [values[column] for column in updated] + [seen_at, version_since, *key])
+
+    def write(self, record):
+        self.add(self.hospital, record)
+
+    def wrap(self, worker, transform=None):
+        """3단계 작업 함수 worker(doctor)의 결과를 바로 저장소에 upsert하도록 감싼 함수를 반환합니다."""
+        def wrapped(doctor):
+            record = worker(doctor)
+            if record is not None:
+                self.write(transform(record) if transform else record)
+            return record
+        return wrapped
+
+    def get(self, hospital, doctor_id):
+        """의료진 한 명의 현재 레코드를 반환합니다. (없으면 None)"""
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(COLUMNS)} FROM doctors WHERE hospital = ? AND doctor_id = ?",
+                                     (hospital, doctor_id)).fetchone()
+        return _row_to_dict(row) if row else None
+
+    def find(self, hospital=None, department=None, name=None):
+        """
+        병원/부서/이름이 일치하는 의료진의 현재 레코드 목록을 반환합니다. (주어진 조건만 사용)
+        - department는 여러 부서에 소속된 의료진의 부서 하나와 같아도 찾음 (doctor_departments)
+        """
+        conditions = {'hospital': hospital, 'name': name}
+        where = [f'{column} = ?' for column, value in conditions.items() if value is not None]
+        params = [value for value in conditions.values() if value is not None]
+        if department is not None:
+            where.append('(department = ? OR EXISTS (SELECT 1 FROM doctor_departments d WHERE d.hospital = doctors.hospital '
+                         'AND d.doctor_id = doctors.doctor_id AND d.department = ?))')
+            params.extend([department, department])
+        sql = f"SELECT {', '.join(COLUMNS)} FROM doctors"
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        with self._lock:
+            rows = self._conn.execute(sql + ' ORDER BY hospital, department, name', params).fetchall()
+        return [_row_to_dict(row) for row in rows]
+
+    def history(self, hospital, doctor_id):
+        """
+        의료진 한 명의 버전 목록을 오래된 순서로 반환합니다. (마지막 항목이 현재 버전)
+        - 각 항목: {'valid_from', 'valid_to'(현재 버전은 None), 'content_hash', 'record'}
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT valid_from, valid_to, content_hash, record FROM doctor_history '
+                'WHERE hospital = ? AND doctor_id = ? ORDER BY valid_from', (hospital, doctor_id)).fetchall()
+        versions = [{'valid_from': valid_from, 'valid_to': valid_to, 'content_hash': content_hash,
+                     'record': json.loads(record)} for valid_from, valid_to, content_hash, record in rows]
+        current = self.get(hospital, doctor_id)
+        if current:
+            versions.append({'valid_from': current['version_since'], 'valid_to': None,
+                             'content_hash': current['content_hash'], 'record': current['record']})
+        return versions
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+        if self.hospital:
+            print(f"✅ 성공! SQLite 저장소 '{self.path}'에 저장했습니다. "
+                  f"(신규 {self.stats['new']}명 / 변경 {self.stats['changed']}명 / 변경 없음 {self.stats['unchanged']}명 / "
+                  f"중복 행 {self.stats['duplicate']}건)")
+
+
+def open_store(hospital, args):
+    """--sqlite 옵션이 있으면 hospital의 레코드를 upsert할 저장소를 열어 반환하고, 없으면 None을 반환합니다."""
+    if not args.sqlite:
+        return None
+    print(f"\n💾 결과를 SQLite 저장소({args.sqlite})에 upsert합니다...")
+    return DoctorStore(args.sqlite, hospital)
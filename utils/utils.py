@@ -1,29 +1,65 @@
-import re
-import pandas as pd
 import os
 import json
 from datetime import datetime # 날짜 생성을 위해 추가
 
+# 결과 파일을 저장할 폴더와 파일명에 붙일 날짜 (--reparse는 보관본의 수집 날짜로 별도 폴더에 저장)
+_output = {'directory': '', 'date': None}
+
+def set_output(directory='', date=None):
+    """결과 파일 저장 폴더와 파일명 날짜('yymmdd')를 바꿉니다. (기본: 현재 폴더, 오늘 날짜)"""
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    _output.update(directory=directory, date=date)
+
+def output_date():
+    """set_output()으로 지정한 파일명 날짜를 datetime.date로 반환합니다. (지정하지 않았으면 None)"""
+    return datetime.strptime(_output['date'], '%y%m%d').date() if _output['date'] else None
+
+def output_path(filename):
+    """(내부 헬퍼 함수) 결과 저장 폴더 안의 경로를 반환합니다."""
+    return os.path.join(_output['directory'], filename)
+
 def _generate_filenames(base_name):
     """(내부 헬퍼 함수) 주어진 기본 이름으로 최종 파일명들을 생성합니다."""
-    today_str = datetime.now().strftime('%y%m%d')
-    json_filename = f"{base_name}_crawling_{today_str}.json"
-    excel_filename = f"{base_name}_crawling_{today_str}.xlsx"
+    today_str = _output['date'] or datetime.now().strftime('%y%m%d')
+    json_filename = output_path(f"{base_name}_crawling_{today_str}.json")
+    excel_filename = output_path(f"{base_name}_crawling_{today_str}.xlsx")
     return json_filename, excel_filename
 
+# Excel(XML)에서 허용하지 않는 제어 문자 (\t, \n, \r 제외) 삭제용 변환표
+_ILLEGAL_CHARS_TABLE = dict.fromkeys(c for c in range(0x20) if c not in (0x09, 0x0a, 0x0d))
+
 def _clean_text(text):
     """⭐️ (핵심 기능) 문자열에서 Excel에서 허용하지 않는 XML 제어 문자를 제거합니다."""
     if not isinstance(text, str):
         return text
-    # \b 와 같은 문자를 여기서 걸러냅니다.
-    return re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f]', '', text)
+    # \b 와 같은 문자를 여기서 걸러냅니다. (정규식 대신 미리 만든 변환표로 한 번에 처리)
+    return text.translate(_ILLEGAL_CHARS_TABLE)
+
+def _flatten_record(record):
+    """(내부 헬퍼 함수) 중첩된 'profile' 딕셔너리를 펼쳐 '학력', '경력' 등의 컬럼으로 만듭니다."""
+    row = {key: value for key, value in record.items() if key != 'profile'}
+    profile = record.get('profile')
+    if isinstance(profile, dict):
+        row.update(profile)
+    return row
+
+def _to_cell(value, is_list_column):
+    """(내부 헬퍼 함수) 값 하나를 Excel 셀 값으로 바꿉니다. 리스트는 줄바꿈 문자열로, 문자열은 제어 문자 제거."""
+    if is_list_column:
+        value = '\n'.join(map(str, value)) if isinstance(value, list) else ''
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    return _clean_text(value if isinstance(value, str) else str(value))
 
 def save_to_excel(data, base_name):
     """
     주어진 데이터를 받아 Excel 파일로 저장합니다.
+    - data: 레코드 리스트 또는 JSONL 파일 경로 (경로면 파일을 스트리밍으로 읽음)
     - 중첩된 'profile' 데이터를 '학력', '경력' 컬럼으로 자동 분리
     - 리스트 데이터를 줄바꿈 문자열로 변환
     - ⭐️ 모든 문자열 데이터에서 불법 제어 문자 제거 (소독)
+    - openpyxl write-only 모드로 한 행씩 기록해 전체 표를 메모리에 만들지 않음
     """
     _, filename = _generate_filenames(base_name)
 
@@ -31,28 +67,48 @@ def save_to_excel(data, base_name):
         print("⚠️ 변환할 데이터가 없습니다. Excel 파일을 생성하지 않습니다.")
         return
 
+    if isinstance(data, str):
+        from utils.jsonl import iter_jsonl
+        records = lambda: iter_jsonl(data)
+    else:
+        records = lambda: iter(data)
+
     print(f"\n🔄 데이터를 Excel 파일({filename})로 변환합니다...")
     
     try:
-        # 1. 원본 데이터로 DataFrame 생성
-        df = pd.DataFrame(data)
-
-        # 2. 'profile' 컬럼이 있다면 펼쳐서 '학력', '경력' 컬럼으로 만듦
-        if 'profile' in df.columns:
-            profiles_df = df['profile'].fillna({}).apply(pd.Series)
-            df = pd.concat([df.drop('profile', axis=1), profiles_df], axis=1)
-
-        # 3. 모든 컬럼을 순회하며 데이터 형식 정리 및 정제
-        for col in df.columns:
-            if df[col].apply(lambda x: isinstance(x, list)).any():
-                df[col] = df[col].apply(lambda x: '\n'.join(x) if isinstance(x, list) else '')
-            
-            # ⭐️ 최종적으로 모든 문자열 데이터에서 제어 문자를 제거
-            if df[col].dtype == 'object':
-                df[col] = df[col].astype(str).apply(_clean_text)
-
-        # 4. 완전히 정리된 DataFrame을 Excel 파일로 저장
-        df.to_excel(filename, index=False, engine='openpyxl')
+        # 1. 첫 번째 순회: 컬럼 순서('profile'에서 나온 컬럼은 뒤쪽)와 리스트가 들어 있는 컬럼 파악
+        columns, profile_columns, list_columns = {}, {}, set()
+        row_count = 0
+        for record in records():
+            row_count += 1
+            for key in record:
+                if key != 'profile':
+                    columns.setdefault(key, None)
+            profile = record.get('profile')
+            if isinstance(profile, dict):
+                for key in profile:
+                    profile_columns.setdefault(key, None)
+            for key, value in _flatten_record(record).items():
+                if isinstance(value, list):
+                    list_columns.add(key)
+
+        if not row_count:
+            print("⚠️ 변환할 데이터가 없습니다. Excel 파일을 생성하지 않습니다.")
+            return
+
+        header = list(columns) + [key for key in profile_columns if key not in columns]
+        is_list = [key in list_columns for key in header]
+
+        # 2. 두 번째 순회: 한 행씩 정리해서 바로 기록
+        # (openpyxl은 불러오는 데 시간이 걸리므로 Excel을 실제로 만들 때만 import)
+        from openpyxl import Workbook
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(header)
+        for record in records():
+            row = _flatten_record(record)
+            sheet.append([_to_cell(row.get(key), list_flag) for key, list_flag in zip(header, is_list)])
+        workbook.save(filename)
         
         print(f"✅ 성공! 데이터가 '{filename}' 파일로 저장되었습니다.")
         print(f"   -> 저장 위치: {os.path.abspath(filename)}")
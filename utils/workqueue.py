@@ -0,0 +1,324 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.engine import DEFAULT_CONCURRENCY, fetch_failed, mark_failed, run_stage
+from utils.incremental import fingerprint
+from utils.metrics import save_metrics
+
+DEFAULT_QUEUE_PATH = 'crawl_queue.sqlite'
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 3
+# 다른 프로세스가 처리 중인 작업의 완료 여부를 다시 확인하는 간격(초)
+POLL_INTERVAL = 0.5
+# 작업 함수가 결과를 돌려줬지만 재시도 후에도 실패한 요청이 있었던 작업의 에러 메시지
+REQUEST_FAILED = '재시도 후에도 요청이 실패했습니다.'
+
+SCHEMA = """
+-- sealed: 큐를 닫은 시각(time.time()), 0이면 아직 작업을 등록하는 중
+CREATE TABLE IF NOT EXISTS queues (
+    queue TEXT PRIMARY KEY,
+    sealed INTEGER NOT NULL DEFAULT 0,
+    created_at REAL
+);
+CREATE TABLE IF NOT EXISTS queue_items (
+    queue TEXT NOT NULL,
+    key TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_until REAL,
+    result TEXT,
+    error TEXT,
+    updated_at REAL,
+    PRIMARY KEY (queue, key)
+);
+CREATE INDEX IF NOT EXISTS queue_items_status ON queue_items (queue, status, seq);
+"""
+
+
+class WorkQueue:
+    """
+    3단계 상세 수집 작업을 담는 SQLite 작업 큐 (여러 프로세스가 같은 파일을 공유)
+    - 작업 하나 = 의료진 목록 행 하나 (키: 의료진 키 + 목록 행 지문, Checkpoint와 동일)
+    - 작업은 lease_seconds 동안만 임대되고, 그 안에 완료/실패를 기록하지 못하면(프로세스 종료 등) 다른 프로세스가 다시 가져감
+    - 실패한 작업은 max_attempts번까지 다시 시도하고, 그래도 실패하면 'failed'로 남김
+    - 파일 하나에 병원별 큐(name)를 여러 개 둘 수 있음
+    """
+
+    def __init__(self, path, name, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        """(내부 헬퍼 함수) 스레드마다 별도의 SQLite 연결을 사용합니다. (sqlite3 연결은 스레드 간 공유 불가)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """(내부 헬퍼 함수) 쓰기 잠금을 바로 잡는 트랜잭션 (여러 프로세스가 같은 작업을 동시에 임대하지 않도록)"""
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def item_key(self, item, key_fn):
+        """작업 키: 의료진 키 + 목록 행 지문 (의료진 키가 없는 행은 None, 큐를 거치지 않고 바로 처리)"""
+        doctor_key = key_fn(item)
+        return f"{doctor_key}#{fingerprint(item)}" if doctor_key else None
+
+    def reset(self):
+        """이전 실행에서 남은 작업을 모두 지우고 큐를 다시 엽니다. (닫힘 표시도 지우므로 작업자는 새 실행이 닫히기를 기다림)"""
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM queue_items WHERE queue = ?', (self.name,))
+            conn.execute('DELETE FROM queues WHERE queue = ?', (self.name,))
+
+    def push(self, items, key_fn):
+        """items를 작업으로 등록합니다. (이미 있는 키는 그대로 둠) 새로 등록한 작업 수를 반환합니다."""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute('INSERT OR IGNORE INTO queues (queue, sealed, created_at) VALUES (?, 0, ?)', (self.name, now))
+            start = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM queue_items WHERE queue = ?',
+                                 (self.name,)).fetchone()[0]
+            rows = []
+            for i, item in enumerate(items, start=start + 1):
+                key = self.item_key(item, key_fn)
+                if key is not None:
+                    rows.append((self.name, key, i, json.dumps(item, ensure_ascii=False, default=str), now))
+            before = conn.total_changes
+            conn.executemany('INSERT OR IGNORE INTO queue_items (queue, key, seq, payload, updated_at) '
+                             'VALUES (?, ?, ?, ?, ?)', rows)
+            return conn.total_changes - before
+
+    def seal(self):
+        """
+        모든 작업을 등록했음을 표시합니다. (작업자는 큐가 닫히고 남은 작업이 없을 때 종료)
+        - 닫은 시각을 기록하므로 작업자는 이전 실행의 닫힘과 이번 실행의 닫힘을 구분할 수 있음
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute('INSERT OR IGNORE INTO queues (queue, sealed, created_at) VALUES (?, 0, ?)', (self.name, now))
+            conn.execute('UPDATE queues SET sealed = ? WHERE queue = ?', (now, self.name))
+
+    def sealed_at(self):
+        """큐를 닫은 시각을 반환합니다. (아직 닫히지 않았으면 None)"""
+        row = self._conn().execute('SELECT sealed FROM queues WHERE queue = ?', (self.name,)).fetchone()
+        return row[0] if row and row[0] else None
+
+    def is_sealed(self):
+        return self.sealed_at() is not None
+
+    def is_finished(self):
+        """대기 중인 작업도, 임대 중인 작업도 없으면 True (임대한 프로세스가 죽은 작업은 임대 시간이 지나면 다시 대기 상태로 취급)"""
+        counts = self.counts()
+        return not counts.get('pending') and not counts.get('leased')
+
+    def claim(self, key):
+        """
+        키 하나의 작업을 이 프로세스가 임대해 봅니다. (상태, 값)을 반환합니다.
+        - ('leased', None): 임대 성공, 직접 처리해야 함
+        - ('done', 결과) / ('failed', 에러 메시지): 이미 끝난 작업
+        - ('busy', None): 다른 프로세스가 처리 중 / ('missing', None): 큐에 없는 작업
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute('SELECT status, attempts, lease_until, result, error FROM queue_items '
+                               'WHERE queue = ? AND key = ?', (self.name, key)).fetchone()
+            if row is None:
+                return 'missing', None
+            status, attempts, lease_until, result, error = row
+            if status == 'done':
+                return 'done', json.loads(result)
+            if status == 'failed':
+                return 'failed', error
+            if status == 'leased' and lease_until > now:
+                return 'busy', None
+            if attempts >= self.max_attempts:
+                conn.execute("UPDATE queue_items SET status = 'failed', error = COALESCE(error, ?), updated_at = ? "
+                             "WHERE queue = ? AND key = ?", ('임대 시간 초과', now, self.name, key))
+                return 'failed', error or '임대 시간 초과'
+            conn.execute("UPDATE queue_items SET status = 'leased', attempts = attempts + 1, lease_owner = ?, "
+                         "lease_until = ?, updated_at = ? WHERE queue = ? AND key = ?",
+                         (self.owner, now + self.lease_seconds, now, self.name, key))
+            return 'leased', None
+
+    def lease(self, limit):
+        """
+        처리할 작업을 최대 limit개 임대해 [(키, 작업)] 리스트로 반환합니다. (대기 중이거나 임대 시간이 지난 작업)
+        - 목록 순서대로 처리하는 원래 실행(wrap)과 겹치지 않도록 작업자는 뒤쪽 작업부터 가져감
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            # 시도 횟수를 다 쓴 채 임대 시간이 지난 작업은 다시 가져가지 않고 'failed'로 끝냄 (작업자가 끝없이 기다리지 않도록)
+            conn.execute("UPDATE queue_items SET status = 'failed', error = COALESCE(error, ?), lease_owner = NULL, "
+                         "lease_until = NULL, updated_at = ? WHERE queue = ? AND status = 'leased' AND attempts >= ? "
+                         "AND lease_until <= ?", ('임대 시간 초과', now, self.name, self.max_attempts, now))
+            rows = conn.execute("SELECT key, payload FROM queue_items WHERE queue = ? AND attempts < ? AND "
+                                "(status = 'pending' OR (status = 'leased' AND lease_until <= ?)) "
+                                "ORDER BY seq DESC LIMIT ?", (self.name, self.max_attempts, now, limit)).fetchall()
+            conn.executemany("UPDATE queue_items SET status = 'leased', attempts = attempts + 1, lease_owner = ?, "
+                             "lease_until = ?, updated_at = ? WHERE queue = ? AND key = ?",
+                             [(self.owner, now + self.lease_seconds, now, self.name, key) for key, _ in rows])
+        return [(key, json.loads(payload)) for key, payload in rows]
+
+    def complete(self, key, record):
+        with self._transaction() as conn:
+            conn.execute("UPDATE queue_items SET status = 'done', result = ?, error = NULL, lease_owner = NULL, "
+                         "lease_until = NULL, updated_at = ? WHERE queue = ? AND key = ?",
+                         (json.dumps(record, ensure_ascii=False, default=str), time.time(), self.name, key))
+
+    def fail(self, key, error):
+        """처리에 실패한 작업을 다시 대기 상태로 돌립니다. (시도 횟수를 다 쓰면 'failed')"""
+        with self._transaction() as conn:
+            conn.execute("UPDATE queue_items SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                         "error = ?, lease_owner = NULL, lease_until = NULL, updated_at = ? "
+                         "WHERE queue = ? AND key = ? AND status = 'leased'",
+                         (self.max_attempts, str(error), time.time(), self.name, key))
+
+    def counts(self):
+        """상태별 작업 수 {'pending': n, 'leased': n, 'done': n, 'failed': n}를 반환합니다."""
+        rows = self._conn().execute('SELECT status, COUNT(*) FROM queue_items WHERE queue = ? GROUP BY status',
+                                    (self.name,)).fetchall()
+        return dict(rows)
+
+    def wrap(self, worker, key_fn, items):
+        """
+        items를 큐에 등록하고, 3단계 작업 함수 worker(doctor) -> 레코드를 큐를 거치도록 감싼 함수를 반환합니다.
+        - 아직 아무도 처리하지 않은 작업은 직접 임대해 처리하고, 다른 작업자가 처리 중이면 끝날 때까지 기다려 그 결과를 사용
+        - 반환된 함수는 입력 순서대로 레코드를 돌려주므로 Checkpoint/JSONL/Parquet 저장은 이 프로세스에서 그대로 동작
+        - 재시도 후에도 요청이 실패한 작업은 완료로 기록하지 않고 대기 상태로 돌려, 단계 끝의 재시도(defer_on_failure/run_stage)가
+          저장된 자리표시 결과 대신 실제로 다시 요청하게 함
+        """
+        added = self.push(items, key_fn)
+        self.seal()
+        print(f"📥 작업 큐 '{self.path}' ({self.name}): {added}건 등록, 현재 상태 {self.counts()}")
+
+        def wrapped(item):
+            key = self.item_key(item, key_fn)
+            if key is None:
+                return worker(item)
+            while True:
+                status, value = self.claim(key)
+                if status == 'missing':
+                    return worker(item)
+                if status == 'done':
+                    return value
+                if status == 'failed':
+                    # run_stage가 최종 실패한 작업으로 세도록 요청 실패로 표시
+                    mark_failed()
+                    raise RuntimeError(f"작업 큐에서 {self.max_attempts}번 모두 실패: {value}")
+                if status == 'busy':
+                    time.sleep(POLL_INTERVAL)
+                    continue
+                try:
+                    record = worker(item)
+                except Exception as e:
+                    self.fail(key, e)
+                    continue
+                if fetch_failed():
+                    self.fail(key, REQUEST_FAILED)
+                else:
+                    self.complete(key, record)
+                return record
+        return wrapped
+
+    def serve(self, worker, concurrency=DEFAULT_CONCURRENCY):
+        """
+        작업자 모드: 큐에서 작업을 임대해 worker(doctor)로 처리하고 결과를 기록하기를 반복합니다.
+        - 재시도 후에도 요청이 실패한 작업은 완료로 기록하지 않고 대기 상태로 돌려 다시 시도 (max_attempts번까지)
+        - 큐가 닫히고(seal) 대기 중/임대 중인 작업이 모두 없으면 종료. 처리한 작업 수를 반환
+          (다른 프로세스가 임대한 작업은 끝나거나 임대 시간이 지나 다시 가져갈 수 있을 때까지 기다림)
+        - 시작할 때 이미 닫혀 있고 남은 작업이 없는 큐는 이전 실행의 큐로 보고, 새 실행이 큐를 다시 닫을 때까지 기다림
+        """
+        def process(entry):
+            key, item = entry
+            try:
+                record = worker(item)
+            except Exception as e:
+                self.fail(key, e)
+                raise
+            if fetch_failed():
+                self.fail(key, REQUEST_FAILED)
+                return None
+            self.complete(key, record)
+            return record
+
+        processed = 0
+        waiting = False
+        stale_seal = self.sealed_at() if self.is_finished() else None
+        while True:
+            batch = self.lease(concurrency * 4)
+            if batch:
+                waiting = False
+                results = run_stage("큐 작업", batch, process, concurrency, retry_failed=False)
+                processed += sum(1 for record in results if record is not None)
+                continue
+            sealed_at = self.sealed_at()
+            if sealed_at is not None and sealed_at != stale_seal and self.is_finished():
+                break
+            if not waiting:
+                if sealed_at is not None and sealed_at == stale_seal:
+                    print(f"⏳ 작업 큐 '{self.path}' ({self.name})는 이전 실행에서 모두 끝났습니다. 새 실행을 기다립니다...")
+                elif sealed_at is not None:
+                    print(f"⏳ 다른 프로세스가 임대한 작업이 끝나기를 기다립니다... (큐 상태 {self.counts()})")
+                else:
+                    print(f"⏳ 작업 큐 '{self.path}' ({self.name})에 작업이 등록되기를 기다립니다...")
+                waiting = True
+            time.sleep(POLL_INTERVAL)
+        print(f"✅ 작업자 종료: {processed}건 처리, 큐 상태 {self.counts()}")
+        return processed
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def open_queue(base_name, args):
+    """
+    --queue 옵션이 있으면 base_name 이름의 작업 큐를 엽니다. (없으면 None)
+    - --resume이 아니면 이전 실행에서 남은 작업을 지우고 새로 시작
+    """
+    if not args.queue:
+        return None
+    queue = WorkQueue(args.queue, base_name, lease_seconds=args.lease_seconds)
+    if not args.resume and not args.queue_worker:
+        queue.reset()
+    return queue
+
+
+def serve_queue(base_name, hospital, args, worker):
+    """
+    --queue-worker 모드: 목록 수집 없이 base_name 큐의 3단계 작업만 처리하고 처리한 작업 수를 반환합니다.
+    - --metrics가 있으면 이 작업자의 지표를 작업자 이름(호스트:PID)을 붙인 파일로 저장
+    """
+    queue = open_queue(base_name, args)
+    print(f"👷 작업자 모드: '{args.queue}'의 '{base_name}' 큐에서 상세 정보 수집 작업을 가져옵니다.")
+    try:
+        processed = queue.serve(worker)
+    finally:
+        queue.close()
+    save_metrics(base_name, hospital, args, worker=queue.owner)
+    return processed
@@ -2,10 +2,26 @@
 
 import requests
 import json
-import time
-from bs4 import BeautifulSoup
 
 from utils.utils import save_to_excel, save_to_json
+from utils.engine import defer_on_failure, fetch, run_stage
+from utils.metrics import save_metrics, timed
+from utils.pagination import fetch_pages, page_count
+from utils.cli import parse_args
+from utils.incremental import IncrementalState
+from utils.singleflight import SingleFlight
+from utils.checkpoint import Checkpoint
+from utils.jsonl import open_output, finish_output, drop_records
+from utils.parquet import open_parquet
+from utils.store import open_store
+from utils.workqueue import open_queue, serve_queue
+from utils.html import parse, strainer
+
+# 목록 API 한 페이지의 의료진 수 (대부분의 부서가 한 페이지에 들어오도록 크게 요청)
+PAGE_SIZE = 100
+
+# 상세 페이지에서는 학력/경력 목록(ul)만 파싱
+CAREER_LISTS = strainer('ul', class_=['acdmcrMatter', 'edcNdClincCareer'])
 
 def fetch_departments_new(headers):
     """모든 부서의 정보를 수집합니다."""
@@ -19,7 +35,7 @@ def fetch_departments_new(headers):
     print("1단계: 전체 부서 목록 수집을 시작합니다...")
     for item in payloads:
         try:
-            response = requests.post(api_url, headers=headers, data=item['payload'], timeout=15)
+            response = fetch('POST', api_url, headers=headers, data=item['payload'], timeout=15)
             response.raise_for_status()
             response_data = response.json()
             department_list = response_data.get('data', {}).get('list', [])
@@ -29,43 +45,71 @@ def fetch_departments_new(headers):
                     'seq': dept.get('seq'), 'name': dept.get('deptNm')
                 })
             print(f"  - {item['type']} {len(department_list)}개 수집 완료.")
-            time.sleep(0.3)
         except requests.exceptions.RequestException as e:
             print(f"  - {item['type']} 목록을 가져오는 중 에러 발생: {e}")
     return all_departments
 
+@timed('ys.doctor_list')
+def parse_doctor_page(body):
+    """의료진 목록 API 응답(JSON bytes) 한 페이지에서 (의료진 목록, 전체 페이지 수)를 추출합니다."""
+    data = json.loads(body).get('data', {})
+    doctors = data.get('list', [])
+    pagenation = data.get('pagenation', {})
+    # 서버가 PAGE_SIZE보다 작게 잘라 보내도 모든 페이지를 요청하도록 전체 의료진 수가 있으면 실제로 받은 수로 페이지 수를 계산
+    if 'totalCount' in pagenation:
+        return doctors, page_count(pagenation['totalCount'], doctors)
+    return doctors, pagenation.get('totalPage', 1)
+
 def fetch_doctors_by_department_new(department, headers):
-    """'totalPage'를 미리 계산하여 효율적으로 페이지네이션을 처리하는 함수"""
+    """첫 페이지의 'totalPage'로 전체 페이지 수를 알아내고 나머지 페이지는 동시에 요청하는 함수"""
     api_url = "https://sev.severance.healthcare/api/doctor/list.do"
-    all_doctors_in_dept = []
-    page = 1
     payload = {
         'insttCode': '2', 'tyCode': department['tyCode'], 'seCode': department['seCode'],
-        'seq': department['seq'], 'page': page, 'pagePerNum': 20,
+        'seq': department['seq'], 'pagePerNum': PAGE_SIZE,
         'isChoSung': 'N', 'keyword': ''
     }
-    try:
-        response = requests.get(api_url, headers=headers, params=payload, timeout=15)
+
+    def fetch_page(page):
+        response = fetch('GET', api_url, headers=headers, params={**payload, 'page': page}, timeout=15)
         response.raise_for_status()
-        response_data = response.json()
-        first_page_doctors = response_data.get('data', {}).get('list', [])
-        if not first_page_doctors:
-            return []
-        all_doctors_in_dept.extend(first_page_doctors)
-        total_page = response_data.get('data', {}).get('pagenation', {}).get('totalPage', 1)
-        if total_page > 1:
-            for page_num in range(2, total_page + 1):
-                payload['page'] = page_num
-                response = requests.get(api_url, headers=headers, params=payload, timeout=15)
-                response.raise_for_status()
-                response_data = response.json()
-                doctor_list = response_data.get('data', {}).get('list', [])
-                if doctor_list:
-                    all_doctors_in_dept.extend(doctor_list)
-                time.sleep(0.3)
+        return response.content
+
+    try:
+        return fetch_pages(fetch_page, parse_doctor_page, name=department['name'])
     except requests.exceptions.RequestException as e:
-        print(f"    - 의료진 정보 {payload.get('page')}페이지 처리 중 에러: {e}")
-    return all_doctors_in_dept
+        print(f"    - 의료진 정보 1페이지 처리 중 에러: {e}")
+        return []
+
+@timed('ys.doctor_detail')
+def parse_doctor_details(content):
+    """상세 페이지 HTML(bytes)에서 학력 및 경력 정보를 추출합니다."""
+    details = {"학력": "정보 없음", "경력": "정보 없음"}
+    soup = parse(content, only=CAREER_LISTS)
+    
+    # 학력 정보 추출
+    education_ul = soup.find('ul', class_='acdmcrMatter')
+    if education_ul:
+        details['학력'] = "\n".join(li.get_text(strip=True) for li in education_ul.find_all('li'))
+
+    # 경력 정보 추출
+    experience_ul = soup.find('ul', class_='edcNdClincCareer')
+    if experience_ul:
+        details['경력'] = "\n".join(li.get_text(strip=True) for li in experience_ul.find_all('li'))
+    return details
+
+def doctor_key(doctor_info):
+    """3단계 상세 수집 단위를 구분하는 의료진 키 (empNo/deptSeq, 상세 페이지 파라미터와 동일)"""
+    emp_no = doctor_info.get('empNo')
+    dept_seq = doctor_info.get('deptSeq')
+    return f"{emp_no}/{dept_seq}" if emp_no and dept_seq else None
+
+def detail_key(doctor_info):
+    """
+    여러 부서(센터/클리닉/진료과)에 소속된 같은 의료진을 묶는 키 (empNo)
+    - 상세 페이지는 deptSeq와 상관없이 같은 학력/경력을 보여주므로 상세 요청은 empNo마다 한 번만 보냄
+    """
+    emp_no = doctor_info.get('empNo')
+    return emp_no if emp_no and doctor_info.get('deptSeq') else None
 
 def fetch_doctor_details(doctor_info, headers):
     """의료진 상세 페이지에서 학력 및 경력 정보를 가져옵니다."""
@@ -78,27 +122,34 @@ def fetch_doctor_details(doctor_info, headers):
     # API가 제공하는 인코딩된 empNo 값을 그대로 사용
     detail_url = f"https://sev.severance.healthcare/sev/doctor/doctor-view.do?empNo={emp_no}&deptSeq={dept_seq}"
     
-    details = {"학력": "정보 없음", "경력": "정보 없음"}
     try:
-        response = requests.get(detail_url, headers=headers, timeout=15)
+        response = fetch('GET', detail_url, headers=headers, timeout=15)
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # 학력 정보 추출
-        education_ul = soup.find('ul', class_='acdmcrMatter')
-        if education_ul:
-            details['학력'] = "\n".join(li.get_text(strip=True) for li in education_ul.find_all('li'))
-
-        # 경력 정보 추출
-        experience_ul = soup.find('ul', class_='edcNdClincCareer')
-        if experience_ul:
-            details['경력'] = "\n".join(li.get_text(strip=True) for li in experience_ul.find_all('li'))
-            
+        return parse_doctor_details(response.content)
     except requests.exceptions.RequestException as e:
         print(f"      [Error] 상세 정보 수집 중 에러: {e}\n      URL: {detail_url}")
-    return details
+    return {"학력": "정보 없음", "경력": "정보 없음"}
 
-if __name__ == "__main__":
+def to_output_record(doc):
+    """최종적으로 저장할 때 원하는 정보만 뽑아 저장용 레코드를 만듭니다."""
+    return {
+        '부서타입': doc.get('dept_type'),
+        '부서명': doc.get('dept_name'),
+        '이름': doc.get('nm'),
+        '영문이름': doc.get('nmEn'),
+        '직위': doc.get('ofcps'),
+        '진료분야': doc.get('clnicRealm'),
+        '이메일': doc.get('emailAdres'),
+        '블로그': doc.get('blog'),
+        '학력': doc.get('학력및경력', {}).get('학력'),
+        '경력': doc.get('학력및경력', {}).get('경력'),
+        # 의료진 ID (SQLite 저장소/병원 간 매칭의 doctor_id)
+        'empNo': doc.get('empNo')
+    }
+
+def main(argv=None):
+    """전체 수집을 실행하고 최종 저장한 의료진 수를 반환합니다. (crawl.py에서 병원별 프로세스로도 호출)"""
+    args = parse_args("세브란스병원(신촌) 의료진 크롤러", argv)
     # ⚠️ 아래 쿠키는 만료되었을 수 있으니, 실행 전 반드시 새 값으로 교체해주세요.
     request_headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36',
@@ -110,60 +161,91 @@ if __name__ == "__main__":
     dept_headers = request_headers.copy()
     dept_headers['Content-Type'] = 'application/x-www-form-urlencoded; charset=UTF-8'
     
+    file_name = '세브란스병원(신촌)_ys'
+    fetch_details = lambda doc: fetch_doctor_details(doc, request_headers)
+    details_once = SingleFlight()
+    fetch_details = details_once.wrap(fetch_details, detail_key)
+    state = IncrementalState(file_name, args.max_age_days) if args.incremental else None
+    if state:
+        fetch_details = state.wrap(fetch_details, doctor_key)
+
+    def collect_details(doc):
+        details = fetch_details(doc)
+
+        # 상세 정보가 담긴 딕셔너리를 통째로 저장 (목록 행은 그대로 두고 새 레코드로 반환)
+        return {**doc, '학력및경력': details}
+
+    if args.queue_worker:
+        return serve_queue(file_name, 'ys', args, collect_details)
+
     # 1단계: 부서 목록 수집
     departments = fetch_departments_new(dept_headers)
     
     if departments:
         # 2단계: 모든 부서의 의료진 목록을 먼저 수집
-        all_raw_doctors = []
         print(f"\n✅ 1단계 완료: 총 {len(departments)}개의 부서를 찾았습니다.")
         print("\n2단계: 각 부서별 의료진 목록 수집을 시작합니다...")
         
-        for i, dept in enumerate(departments):
-            print(f"  - ({i+1}/{len(departments)}) {dept['name']} ({dept['type']}) 의료진 목록 수집 중...")
+        def collect_department(dept):
             raw_doctors = fetch_doctors_by_department_new(dept, request_headers)
             # 각 의료진 정보에 부서 정보를 미리 추가
             for doc in raw_doctors:
                 doc['dept_type'] = dept['type']
                 doc['dept_name'] = dept['name']
-            all_raw_doctors.extend(raw_doctors)
+            return raw_doctors
+
+        results = run_stage("2단계", departments, collect_department, label=lambda d: f"{d['name']} ({d['type']})")
+        all_raw_doctors = [doc for raw_doctors in results if raw_doctors for doc in raw_doctors]
         
         print(f"\n✅ 2단계 완료: 총 {len(all_raw_doctors)}명의 의료진 목록을 수집했습니다.")
         print("\n3단계: 각 의료진의 상세 정보(학력/경력) 수집을 시작합니다... (시간이 많이 소요됩니다)")
 
         # 3단계: 각 의료진의 상세 정보 수집
-        all_doctors_final_list = []
-        for i, doc in enumerate(all_raw_doctors):
-            print(f"  - ({i+1}/{len(all_raw_doctors)}) {doc.get('nm', '이름없음')} 의료진 상세 정보 수집 중...")
-            
-            details = fetch_doctor_details(doc, request_headers)
-            
-            # 상세 정보가 담긴 딕셔너리를 통째로 저장
-            doc['학력및경력'] = details
-            all_doctors_final_list.append(doc)
-            time.sleep(0.3)
+        checkpoint = Checkpoint(file_name, args.resume)
+        output = open_output(file_name, args)
+        queue = open_queue(file_name, args)
+        worker = queue.wrap(collect_details, doctor_key, all_raw_doctors) if queue else collect_details
+        worker = defer_on_failure(worker)
+        worker = checkpoint.wrap(worker, doctor_key)
+        if output:
+            worker = output.wrap(worker, transform=to_output_record)
+        parquet = open_parquet(file_name, 'ys', args)
+        if parquet:
+            worker = parquet.wrap(worker, transform=to_output_record)
+        store = open_store('ys', args)
+        if store:
+            worker = store.wrap(worker, transform=to_output_record)
+        if output:
+            # 결과 레코드는 파일에만 남기고 메모리에는 모으지 않음
+            worker = drop_records(worker)
+        all_doctors_final_list = [doc for doc in run_stage("3단계", all_raw_doctors, worker, label=lambda d: d.get('nm', '이름없음')) if doc]
+
+        if state:
+            state.save()
+        details_once.report()
 
         print(f"\n✅ 3단계 완료: 최종적으로 {len(all_doctors_final_list)}명의 상세 정보를 수집했습니다.")
         
-        # 최종적으로 저장할 때 원하는 정보만 뽑아서 저장
-        final_clean_data = []
-        for doc in all_doctors_final_list:
-            final_clean_data.append({
-                '부서타입': doc.get('dept_type'),
-                '부서명': doc.get('dept_name'),
-                '이름': doc.get('nm'),
-                '영문이름': doc.get('nmEn'),
-                '직위': doc.get('ofcps'),
-                '진료분야': doc.get('clnicRealm'),
-                '이메일': doc.get('emailAdres'),
-                '블로그': doc.get('blog'),
-                '학력': doc.get('학력및경력', {}).get('학력'),
-                '경력': doc.get('학력및경력', {}).get('경력')
-            })
+        # 최종적으로 저장할 때 원하는 정보만 뽑아서 저장 (--jsonl이면 변환한 레코드가 이미 파일에 있음)
+        final_clean_data = output.path if output else [to_output_record(doc) for doc in all_doctors_final_list]
         
-        file_name = '세브란스병원(신촌)_ys'
-        save_to_json(final_clean_data, file_name)
+        if parquet:
+            parquet.close()
+        if store:
+            store.close()
+        if output:
+            finish_output(output, file_name, args)
+        else:
+            save_to_json(final_clean_data, file_name)
         
         save_to_excel(final_clean_data, file_name)
+        save_metrics(file_name, 'ys', args)
+        checkpoint.finish()
+        return len(all_doctors_final_list)
     else:
-        print("\n❌ 부서 목록 수집에 실패하여 프로그램을 종료합니다.")
\ No newline at end of file
+        print("\n❌ 부서 목록 수집에 실패하여 프로그램을 종료합니다.")
+        return 0
+
+
+if __name__ == "__main__":
+    main()